@@ -0,0 +1,114 @@
+import secrets
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query
+
+from app.core.config import settings
+from app.domain.summary import TrialSummary
+from app.llm.client import llm_client
+from app.llm.routing import model_router
+from app.services.http import breaker_stats
+from app.services.mirror import trial_mirror
+from app.services.prewarm import summary_prewarmer
+from app.services.search_cache import search_cache
+from app.services.singleflight import flight_stats
+from app.services.summaries import summary_output_stats
+from app.services.summary_store import summary_store
+from app.services.trial_cache import trial_cache
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    # fail closed: without ADMIN_TOKEN the admin endpoints do not exist
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+router = APIRouter(prefix="/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+@router.get("/cache/trials")
+async def trial_cache_stats():
+    """Trial cache hit, miss and eviction counters"""
+    return trial_cache.stats()
+
+@router.delete("/cache/trials")
+def purge_trial_cache():
+    """Drop every cached trial from memory and disk"""
+    trial_cache.clear()
+    return trial_cache.stats()
+
+@router.get("/cache/search")
+async def search_cache_stats():
+    """Search cache hit (fresh, stale, subset), miss, refresh and eviction counters"""
+    return search_cache.stats()
+
+@router.delete("/cache/search")
+async def purge_search_cache():
+    """Drop every cached search result"""
+    search_cache.clear()
+    return search_cache.stats()
+
+@router.get("/coalescing")
+async def coalescing_stats():
+    """Executed vs deduplicated calls per single-flight group"""
+    return flight_stats()
+
+@router.get("/llm")
+async def llm_client_stats():
+    """
+    Shared LLM client queue depth, wait times, retries and rate-limit hits, JSON repair / re-ask
+    rates, and per-route summary latency and hedge rates
+    """
+    return {**llm_client.stats(), "summary_output": summary_output_stats(), "routes": model_router.stats()}
+
+@router.get("/upstream")
+def upstream_stats():
+    """Circuit breaker state and call, failure, slow-call and rejection counters per upstream host"""
+    return breaker_stats()
+
+@router.get("/mirror")
+def mirror_stats():
+    """Local mirror size and last sync checkpoint"""
+    if settings.mirror_mode == "off":
+        return {"mode": "off"}
+    return {"mode": settings.mirror_mode, **trial_mirror.stats()}
+
+@router.get("/prewarm")
+def prewarm_status():
+    """Summary pre-warming progress, queue depth and the share of summary lookups served by pre-warmed entries"""
+    return summary_prewarmer.status()
+
+@router.post("/prewarm", status_code=202)
+async def start_prewarm(condition: Optional[List[str]] = Query(None, description="Conditions to warm instead of PREWARM_CONDITIONS")):
+    """Start a pre-warm run now"""
+    if not (condition or summary_prewarmer.conditions()):
+        raise HTTPException(status_code=422, detail="No conditions configured (PREWARM_CONDITIONS)")
+    if not summary_prewarmer.trigger(condition):
+        raise HTTPException(status_code=409, detail="A pre-warm run is already in progress")
+    return summary_prewarmer.status()
+
+@router.get("/summaries")
+def list_summaries(
+    nct_id: Optional[str] = Query(None, pattern=r"^NCT\d{8}$"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """Stored summaries with their cache key and hit counts"""
+    return {"stats": summary_store.stats(), "entries": summary_store.list_entries(nct_id, limit=limit, offset=offset)}
+
+@router.get("/summaries/{nct_id}", response_model=TrialSummary)
+def get_stored_summary(
+    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier")
+):
+    """Most recent stored summary for a trial"""
+    summary = summary_store.get_latest(nct_id)
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No stored summary")
+    return summary
+
+@router.delete("/summaries")
+def purge_summaries(
+    nct_id: Optional[str] = Query(None, pattern=r"^NCT\d{8}$"),
+    prompt_version: Optional[str] = Query(None),
+):
+    """Purge stored summaries, optionally for one trial and/or prompt version"""
+    return {"deleted": summary_store.purge(nct_id=nct_id, prompt_version=prompt_version)}
\ No newline at end of file
@@ -0,0 +1,227 @@
+"""
+Conditional GET and compression for record responses.
+
+A record version (trial: NCT ID + last update date; summary: store key +
+generation time) maps to its serialized body, a strong ETag over that version and
+the body hash, and lazily built gzip / brotli variants. Repeat requests for an
+unchanged record are answered from here: a 304 for a matching If-None-Match,
+otherwise the stored bytes, without serializing or compressing again.
+
+Responses built from a last known good record while upstream was failing are
+marked with Age and a Warning 110 by StaleFallbackMiddleware.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+
+from fastapi import Request, Response
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+from app.core.metrics import stage
+from app.domain.summary import TrialSummary
+from app.domain.trial import Trial
+from app.services import breaker
+from app.services.summary_store import SummaryKey
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+class Representation:
+    """
+    One serialized record version and its compressed variants
+    """
+
+    def __init__(self, version: Hashable, body: bytes):
+        self.version = version
+        self.body = body
+        digest = hashlib.sha256(repr(version).encode("utf-8") + b"\0" + body).hexdigest()[:32]
+        self.etag = f'"{digest}"'
+        self._encoded: Dict[str, bytes] = {}
+        # set by the RepresentationCache holding it, told the size of each new variant
+        self._on_grow: Optional[Callable[["Representation", int], None]] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(v) for v in self._encoded.values())
+
+    def etag_for(self, encoding: Optional[str]) -> str:
+        # each content coding is a different representation, so it gets its own strong ETag
+        return self.etag if encoding is None else f'{self.etag[:-1]}-{encoding}"'
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding is None:
+            return self.body
+        data = self._encoded.get(encoding)
+        if data is None:
+            with stage("compress"):
+                compressed = _compress(self.body, encoding)
+            # a concurrent request may have stored this variant first; only one is kept and counted
+            data = self._encoded.setdefault(encoding, compressed)
+            if data is compressed and self._on_grow is not None:
+                self._on_grow(self, len(data))
+        return data
+
+class RepresentationCache:
+    """
+    LRU of Representations bounded by total bytes (bodies plus compressed variants)
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Hashable, Representation]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, version: Optional[Hashable], build: Callable[[], bytes]) -> Representation:
+        """
+        Representation for a record version, serializing with build() only on a miss.
+        A None version (record without an update date) is never cached.
+        """
+        if version is not None:
+            with self._lock:
+                rep = self._items.get(version)
+                if rep is not None:
+                    self._items.move_to_end(version)
+                    self.hits += 1
+                    return rep
+                self.misses += 1
+        with stage("serialize"):
+            rep = Representation(version, build())
+        if version is not None and self.max_bytes > 0:
+            with self._lock:
+                old = self._items.pop(version, None)
+                if old is not None:
+                    self._bytes -= old.size
+                self._items[version] = rep
+                rep._on_grow = self._grown
+                self._bytes += rep.size
+                self._evict()
+        return rep
+
+    def _grown(self, rep: Representation, n: int) -> None:
+        with self._lock:
+            # a variant built after the representation was evicted or replaced is not counted
+            if self._items.get(rep.version) is rep:
+                self._bytes += n
+                self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._items) > 1:
+            _, rep = self._items.popitem(last=False)
+            self._bytes -= rep.size
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._items), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+body_cache = RepresentationCache(settings.http_body_cache_max_bytes)
+
+def _accepted(header: Optional[str]) -> List[str]:
+    """
+    Content codings accepted by the client (q > 0), in the order the server prefers them
+    """
+    accepted: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding:
+            accepted[coding.lower()] = q
+    wildcard = accepted.get("*", 0.0)
+    return [enc for enc in ENCODINGS if accepted.get(enc, wildcard) > 0]
+
+def _none_match(header: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match check using weak comparison, ignoring content-coding suffixes
+    """
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for candidate in header.split(","):
+        tag = candidate.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        for encoding in ("br", "gzip"):
+            if tag.endswith("-" + encoding):
+                tag = tag[: -len(encoding) - 1]
+        if tag == base:
+            return True
+    return False
+
+def conditional_response(request: Request, rep: Representation, max_age: int) -> Response:
+    encoding = None
+    if len(rep.body) >= settings.http_compress_min_bytes:
+        encoding = next(iter(_accepted(request.headers.get("accept-encoding"))), None)
+    headers = {
+        "ETag": rep.etag_for(encoding),
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if _none_match(request.headers.get("if-none-match"), rep.etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=rep.encoded(encoding), media_type="application/json", headers=headers)
+
+def trial_response(request: Request, trial: Trial) -> Response:
+    version: Optional[Tuple] = ("trial", trial.nct_id, trial.last_update_posted) if trial.last_update_posted else None
+    # sites are paged through /trials/{nct_id}/locations; the record carries the preview and count
+    rep = body_cache.get_or_build(version, lambda: trial.model_dump_json(exclude={"sites"}).encode("utf-8"))
+    return conditional_response(request, rep, settings.http_trial_max_age)
+
+def summary_response(request: Request, key: SummaryKey, summary: TrialSummary) -> Response:
+    version = ("summary", key.nct_id, key.model, key.prompt_version, key.payload_hash, summary.generated_at.isoformat())
+    rep = body_cache.get_or_build(version, lambda: summary.model_dump_json().encode("utf-8"))
+    return conditional_response(request, rep, settings.http_summary_max_age)
+
+class StaleFallbackMiddleware:
+    """
+    Marks responses that were (partly) built from a stale trial or search result
+    because upstream failed: Age is the age in seconds of the oldest record used,
+    plus a `110 Response is Stale` Warning, and no Cache-Control freshness.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        fallbacks = breaker.start_request()
+
+        async def send_marked(message):
+            if message["type"] == "http.response.start" and fallbacks:
+                headers = MutableHeaders(scope=message)
+                headers["Age"] = str(int(max(age for _, age in fallbacks)))
+                headers["Warning"] = '110 - "Response is Stale"'
+                headers["Cache-Control"] = "no-cache"
+            await send(message)
+
+        await self.app(scope, receive, send_marked)
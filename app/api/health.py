@@ -1,5 +1,7 @@
 from fastapi import APIRouter
-from app.llm.health import check_mistral_health
+from fastapi.responses import JSONResponse
+
+from app.llm.health import llm_health
 
 router = APIRouter(prefix="", tags=["health"])
 
@@ -9,6 +11,9 @@ async def health():
     return {"status": "ok"}
 
 @router.get("/health/llm")
-async def llm_health():
-    """LLM health check"""
-    return {"mistralResponse": check_mistral_health().model_dump()}
\ No newline at end of file
+async def llm_status():
+    """
+    Cached LLM health from the background probe and recent calls; 503 when the LLM is down
+    """
+    status = llm_health.status()
+    return JSONResponse(status, status_code=503 if status["status"] == "down" else 200)
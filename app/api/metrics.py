@@ -0,0 +1,157 @@
+import logging
+import random
+import time
+from pathlib import Path
+from typing import List
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+from app.core import metrics
+from app.api.caching import body_cache
+from app.llm.client import llm_client
+from app.llm.routing import model_router
+from app.services.eligibility import filter_stats
+from app.services.http import breaker_stats
+from app.services.prewarm import summary_prewarmer
+from app.services.search_cache import search_cache
+from app.services.trial_cache import trial_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="", tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Prometheus exposition of stage, request, upstream and LLM metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+def _service_metrics() -> List[str]:
+    lines = metrics.stats_lines(
+        "triallens_llm_client",
+        "Shared LLM client",
+        {"": llm_client.stats()},
+        counters=("calls", "retries", "rate_limited", "failed"),
+        gauges=("in_flight", "queue_depth", "max_queue_depth"),
+    )
+    routes = {route: {**stats, "latency_ms_p95": stats["attempts"]["latency_ms_p95"]} for route, stats in model_router.stats().items()}
+    lines += metrics.stats_lines(
+        "triallens_llm_route",
+        "Summary model route",
+        routes,
+        label="route",
+        counters=("calls", "hedged", "hedge_wins", "hedge_denied", "hedge_busy", "failed"),
+        gauges=("hedge_rate", "hedge_win_rate", "hedge_after_ms", "latency_ms_p95"),
+    )
+    lines += metrics.stats_lines(
+        "triallens_trial_cache",
+        "Trial cache",
+        {"": trial_cache.stats()},
+        counters=("memory_hits", "disk_hits", "misses", "evictions", "revalidated", "refreshed"),
+        gauges=("memory_entries", "memory_bytes", "max_entries", "max_bytes", "ttl_seconds", "hit_ratio"),
+    )
+    lines += metrics.stats_lines(
+        "triallens_search_cache",
+        "Search cache",
+        {"": search_cache.stats()},
+        counters=("hits", "subset_hits", "stale_hits", "misses", "expired", "evictions", "refreshes", "refresh_failures", "fallbacks"),
+        gauges=("entries", "bytes", "max_entries", "max_bytes", "soft_ttl", "hard_ttl", "hit_ratio"),
+    )
+    lines += metrics.stats_lines(
+        "triallens_eligibility_filter",
+        "Eligibility-filtered searches",
+        {"": filter_stats.stats()},
+        counters=("searches", "pages", "fetched", "returned", "short"),
+        gauges=("pages_per_search", "wasted_fetch_ratio"),
+        helps={"fetched": "studies fetched", "returned": "studies returned", "short": "searches that returned fewer than asked for"},
+    )
+    lines += metrics.stats_lines(
+        "triallens_upstream_breaker",
+        "Upstream circuit breaker",
+        breaker_stats(),
+        label="host",
+        # rejected calls and transitions are the triallens_upstream_breaker_*_total counters in app.services.breaker
+        counters=("calls", "failures", "slow", "opened"),
+        gauges=("state_value", "window_calls", "window_bad_rate"),
+        helps={"state_value": "state (0 closed, 1 half-open, 2 open)", "window_bad_rate": "failure rate in the window"},
+    )
+    lines += metrics.stats_lines(
+        "triallens_body_cache",
+        "Serialized trial and summary response cache",
+        {"": body_cache.stats()},
+        counters=("hits", "misses"),
+        gauges=("entries", "bytes"),
+    )
+    lines += metrics.stats_lines(
+        "triallens_prewarm",
+        "Summary pre-warming",
+        {"": summary_prewarmer.status()},
+        counters=("runs", "prewarmed_hits"),
+        gauges=("queue_depth", "prewarmed_entries", "prewarmed_hit_share"),
+    )
+    return lines
+
+metrics.register_collector(_service_metrics)
+
+def _profiler():
+    """A started pyinstrument profiler for a sampled request, or None"""
+    if settings.profile_sample_rate <= 0 or random.random() >= settings.profile_sample_rate:
+        return None
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        logger.warning("PROFILE_SAMPLE_RATE is set but pyinstrument is not installed; profiling disabled")
+        settings.profile_sample_rate = 0.0
+        return None
+    profiler = Profiler(async_mode="enabled")
+    profiler.start()
+    return profiler
+
+def _keep_profile(profiler, scope, elapsed: float) -> None:
+    profiler.stop()
+    if elapsed * 1000 < settings.profile_slow_ms:
+        return
+    out = Path(settings.profile_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(elapsed * 1000)}ms{scope['path'].replace('/', '_')}.html"
+    (out / name).write_text(profiler.output_html(), encoding="utf-8")
+    logger.info("slow request %s %s took %.0f ms, profile saved to %s", scope["method"], scope["path"], elapsed * 1000, out / name)
+
+class ServerTimingMiddleware:
+    """
+    Times every HTTP request, adds a Server-Timing header with the stages recorded
+    before the response started, and feeds the request latency histogram. Sampled
+    requests can be profiled with pyinstrument (PROFILE_SAMPLE_RATE) and the slow
+    ones written to PROFILE_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings = metrics.start_request()
+        status = {"code": 500}
+        profiler = _profiler()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", metrics.server_timing(timings, time.perf_counter() - started))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.http_request_seconds.observe(elapsed, method=scope["method"], route=route, status=str(status["code"]))
+            if profiler is not None:
+                _keep_profile(profiler, scope, elapsed)
@@ -1,18 +1,78 @@
 import json
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Path, Request
+from fastapi.responses import StreamingResponse
+import requests
 
-from app.domain.summary import TrialSummary
-from app.services.summaries import summarize_trial
+from app.core.config import settings
+from app.api.caching import summary_response
+from app.domain.summary import BatchSummaryRequest, TrialSummary
+from app.llm.client import LLMUnavailable
+from app.llm.repair import InvalidSummaryOutput
+from app.services.batch import summarize_batch
+from app.services.clinicaltrials import get_trial, get_trial_async, TrialNotFound
+from app.services.summaries import summary_for_trial, stream_trial_summary
 
 router = APIRouter(prefix="/trials", tags=["summaries"])
 
+async def _ndjson(events):
+    try:
+        async for event in events:
+            yield json.dumps(event, ensure_ascii=False) + "\n"
+    except Exception as e:
+        yield json.dumps({"event": "error", "detail": f"Failed to generate summary: {type(e).__name__}"}) + "\n"
+
+@router.post("/summaries:batch")
+async def batch_summaries(body: BatchSummaryRequest):
+    """
+    Summarize up to BATCH_MAX_ITEMS trials. Each summary (or per-trial error) is streamed
+    as an NDJSON line as soon as it completes, followed by a "done" line with throughput.
+    """
+    if len(body.nct_ids) > settings.batch_max_items:
+        raise HTTPException(status_code=422, detail=f"At most {settings.batch_max_items} NCT IDs per batch")
+    return StreamingResponse(
+        _ndjson(summarize_batch(body.nct_ids, concurrency=body.concurrency)),
+        media_type="application/x-ndjson",
+    )
+
 @router.get("/{nct_id}/summary", response_model=TrialSummary)
 def get_trial_summary(
-    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier")
+    request: Request,
+    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier"),
 ):
+    """
+    Patient-friendly summary, generated on first request and stored. The ETag changes
+    with the trial content, the model and PROMPT_VERSION; If-None-Match gets a 304.
+    """
     try:
-        return summarize_trial(nct_id)
-    except json.JSONDecodeError:
+        key, summary = summary_for_trial(get_trial(nct_id))
+    except TrialNotFound:
+        raise HTTPException(status_code=404, detail="Trial not found")
+    except LLMUnavailable as e:
+        headers = {"Retry-After": str(max(1, round(e.retry_after)))} if e.retry_after is not None else None
+        raise HTTPException(status_code=503, detail=str(e), headers=headers)
+    except (json.JSONDecodeError, InvalidSummaryOutput):
         raise HTTPException(status_code=502, detail="LLM returned invalid JSON")
     except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Failed to generate summary: {type(e).__name__}")
\ No newline at end of file
+        raise HTTPException(status_code=502, detail=f"Failed to generate summary: {type(e).__name__}")
+    return summary_response(request, key, summary)
+
+@router.get("/{nct_id}/summary/stream")
+async def stream_trial_summary_ndjson(
+    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier")
+):
+    """
+    Stream the summary as NDJSON: one "section" line per top-level field as soon as
+    it is complete, then a final "summary" line with the validated TrialSummary.
+    """
+    try:
+        trial = await get_trial_async(nct_id)
+    except TrialNotFound:
+        raise HTTPException(status_code=404, detail="Trial not found")
+    except requests.HTTPError as e:
+        if getattr(e.response, "status_code", 502) == 404:
+            raise HTTPException(status_code=404, detail="Trial not found")
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+    except requests.RequestException:
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+
+    return StreamingResponse(_ndjson(stream_trial_summary(trial)), media_type="application/x-ndjson")
\ No newline at end of file
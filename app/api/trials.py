@@ -1,9 +1,22 @@
-from fastapi import APIRouter, Query, HTTPException, Path
+from fastapi import APIRouter, Query, HTTPException, Path, Request
+from fastapi.responses import StreamingResponse
 from typing import Optional, List
+import json
 import requests
 
-from app.services.clinicaltrials import search_trial_cards, get_trial
-from app.domain.trial import Trial
+from app.core.config import settings
+from app.api.caching import trial_response
+from app.services.clinicaltrials import (
+    search_trial_cards_async,
+    search_trial_card_page_async,
+    iter_search_results,
+    search_nearby_sites,
+    get_trial_async,
+    trial_location_page,
+    TrialNotFound,
+)
+from app.services.eligibility import EligibilityFilter
+from app.domain.trial import NearbySite, Trial, TrialCardPage, TrialLocationPage
 
 router = APIRouter(prefix="/trials", tags=["trials"])
 
@@ -16,19 +29,115 @@ async def search(
         example=["RECRUITING", "NOT_YET_RECRUITING"],
     ),
     limit: int = Query(5, ge=1, le=50, description="Number of trials to return (1-50)"),
+    age: Optional[float] = Query(None, ge=0, le=130, description="Patient age in years"),
+    sex: Optional[str] = Query(None, pattern="(?i)^(female|male)$", description="Patient sex (FEMALE or MALE)"),
+    healthy_volunteers: Optional[bool] = Query(None, description="Only trials that do (true) or do not (false) accept healthy volunteers"),
 ):
-    return search_trial_cards(condition=condition, status=status, limit=limit)
+    """
+    Trial cards for a condition. Age, sex and healthy-volunteer filters are applied
+    server-side, fetching further result pages until `limit` trials match.
+    """
+    eligibility = EligibilityFilter(age=age, sex=sex.upper() if sex else None, healthy_volunteers=healthy_volunteers)
+    try:
+        return await search_trial_cards_async(condition=condition, status=status, limit=limit, eligibility=eligibility)
+    except requests.RequestException:
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+
+@router.get("/search/page", response_model=TrialCardPage)
+async def search_page(
+    condition: str = Query(..., description="Condition or disease"),
+    status: Optional[List[str]] = Query(None, description="Trial overall status filter"),
+    page_size: int = Query(50, ge=1, description="Trials per page"),
+    page_token: Optional[str] = Query(None, description="Cursor from a previous page's next_page_token"),
+):
+    """
+    Cursor-paginated search. Pass next_page_token back as page_token until it is null.
+    """
+    try:
+        return await search_trial_card_page_async(
+            condition, status, min(page_size, settings.search_page_max), page_token=page_token
+        )
+    except requests.RequestException:
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+
+@router.get("/export")
+async def export(
+    condition: str = Query(..., description="Condition or disease"),
+    status: Optional[List[str]] = Query(None, description="Trial overall status filter"),
+    format: str = Query("card", pattern="^(card|trial)$", description="'card' for TrialCard lines, 'trial' for full Trial lines"),
+):
+    """
+    Stream every matching trial as NDJSON, walking all upstream pages.
+    """
+    async def lines():
+        try:
+            async for item in iter_search_results(condition, status, as_cards=format == "card"):
+                # full trials leave out the columnar sites, as /trials/{nct_id} does
+                yield item.model_dump_json(exclude={"sites"}) + "\n"
+        except requests.RequestException:
+            yield json.dumps({"event": "error", "detail": "ClinicalTrials.gov request failed"}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.get("/nearby", response_model=List[NearbySite])
+def nearby(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude in decimal degrees"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude in decimal degrees"),
+    radius_km: float = Query(50, gt=0, le=1000, description="Search radius in kilometres"),
+    status: Optional[List[str]] = Query(["RECRUITING"], description="Site recruitment status filter"),
+    limit: int = Query(20, ge=1, le=200, description="Number of sites to return"),
+):
+    """
+    Trial sites nearest to a point, closest first. Served from the local mirror.
+    """
+    if settings.mirror_mode == "off":
+        raise HTTPException(status_code=503, detail="Nearby search needs the local mirror (MIRROR_MODE)")
+    return search_nearby_sites(lat, lon, radius_km, limit, status)
 
 @router.get("/{nct_id}", response_model=Trial)
-def get_by_id(
-    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier")
+async def get_by_id(
+    request: Request,
+    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier"),
 ):
+    """
+    Full trial record. Carries a strong ETag and Cache-Control, answers If-None-Match
+    with 304 and compresses large bodies.
+    """
     try:
-        return get_trial(nct_id)
+        trial = await get_trial_async(nct_id)
+    except TrialNotFound:
+        raise HTTPException(status_code=404, detail="Trial not found")
     except requests.HTTPError as e:
         status = getattr(e.response, "status_code", 502)
         if status == 404:
             raise HTTPException(status_code=404, detail="Trial not found")
         raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
     except requests.RequestException:
-        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
\ No newline at end of file
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+    return trial_response(request, trial)
+
+@router.get("/{nct_id}/locations", response_model=TrialLocationPage)
+async def locations(
+    nct_id: str = Path(..., pattern=r"^NCT\d{8}$", description="ClinicalTrials.gov NCT identifier"),
+    country: Optional[List[str]] = Query(None, description="Site country filter"),
+    state: Optional[List[str]] = Query(None, description="Site state / region filter"),
+    status: Optional[List[str]] = Query(None, description="Site recruitment status filter"),
+    page_size: int = Query(50, ge=1, le=500, description="Sites per page"),
+    page_token: Optional[str] = Query(None, description="Cursor from a previous page's next_page_token"),
+):
+    """
+    Every site of a trial, filtered and cursor-paginated. The trial record itself
+    only carries the first sites and location_count.
+    """
+    try:
+        trial = await get_trial_async(nct_id)
+    except TrialNotFound:
+        raise HTTPException(status_code=404, detail="Trial not found")
+    except requests.HTTPError as e:
+        status_code = getattr(e.response, "status_code", 502)
+        if status_code == 404:
+            raise HTTPException(status_code=404, detail="Trial not found")
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+    except requests.RequestException:
+        raise HTTPException(status_code=502, detail="ClinicalTrials.gov request failed")
+    return trial_location_page(trial, country or (), state or (), status or (), page_size, page_token)
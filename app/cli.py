@@ -0,0 +1,103 @@
+"""
+TrialLens command line entry points.
+
+    python -m app.cli summarize-batch NCT01234567 NCT07654321 > summaries.ndjson
+    python -m app.cli summarize-batch --file ids.txt --concurrency 8
+    python -m app.cli mirror-ingest ctg-studies.json.zip
+    python -m app.cli mirror-sync [--since 2025-01-01] [--condition "lung cancer"]
+    python -m app.cli prewarm [--once] [--condition asthma --condition "lung cancer"]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from typing import List, Optional
+
+def _read_ids(args: argparse.Namespace) -> List[str]:
+    ids = list(args.nct_ids)
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            ids += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    return ids
+
+def summarize_batch_command(args: argparse.Namespace) -> int:
+    from app.services.batch import summarize_batch
+
+    ids = _read_ids(args)
+    if not ids:
+        print("No NCT IDs given", file=sys.stderr)
+        return 2
+
+    async def run() -> int:
+        failed = 0
+        async for event in summarize_batch(ids, concurrency=args.concurrency, requests_per_minute=args.rpm):
+            if event["event"] == "done":
+                print(json.dumps(event), file=sys.stderr)
+                failed = event["failed"]
+            else:
+                print(json.dumps(event, ensure_ascii=False), flush=True)
+        return 1 if failed else 0
+
+    return asyncio.run(run())
+
+def mirror_ingest_command(args: argparse.Namespace) -> int:
+    from app.services.mirror import trial_mirror
+
+    print(json.dumps(trial_mirror.ingest_path(args.path)))
+    return 0
+
+def mirror_sync_command(args: argparse.Namespace) -> int:
+    from app.services.mirror import trial_mirror
+
+    print(json.dumps(trial_mirror.sync(since=args.since, condition=args.condition)))
+    return 0
+
+def prewarm_command(args: argparse.Namespace) -> int:
+    from app.core.config import settings
+    from app.services.prewarm import summary_prewarmer
+
+    conditions = args.condition or summary_prewarmer.conditions()
+    if not conditions:
+        print("No conditions given and PREWARM_CONDITIONS is empty", file=sys.stderr)
+        return 2
+
+    async def run() -> int:
+        while True:
+            progress = await summary_prewarmer.run_once(conditions)
+            print(json.dumps(progress), flush=True)
+            if args.once:
+                return 1 if progress["failed"] else 0
+            await asyncio.sleep(settings.prewarm_interval)
+
+    return asyncio.run(run())
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="TrialLens command line tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("summarize-batch", help="Summarize many trials, writing NDJSON to stdout")
+    batch.add_argument("nct_ids", nargs="*", help="NCT identifiers")
+    batch.add_argument("--file", help="File with one NCT ID per line")
+    batch.add_argument("--concurrency", type=int, default=None, help="Concurrent LLM calls")
+    batch.add_argument("--rpm", type=float, default=None, help="LLM requests per minute")
+    batch.set_defaults(func=summarize_batch_command)
+
+    ingest = sub.add_parser("mirror-ingest", help="Load a ClinicalTrials.gov bulk JSON download into the local mirror")
+    ingest.add_argument("path", help="Bulk zip, directory of study JSON files, or a JSON file")
+    ingest.set_defaults(func=mirror_ingest_command)
+
+    sync = sub.add_parser("mirror-sync", help="Pull studies updated since the last sync into the local mirror")
+    sync.add_argument("--since", help="YYYY-MM-DD; defaults to the last sync checkpoint")
+    sync.add_argument("--condition", help="Only mirror studies matching this condition")
+    sync.set_defaults(func=mirror_sync_command)
+
+    prewarm = sub.add_parser("prewarm", help="Pre-generate summaries for popular conditions, every PREWARM_INTERVAL seconds")
+    prewarm.add_argument("--condition", action="append", help="Condition to warm (repeatable); defaults to PREWARM_CONDITIONS")
+    prewarm.add_argument("--once", action="store_true", help="Run a single pass and exit")
+    prewarm.set_defaults(func=prewarm_command)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
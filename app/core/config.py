@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -9,11 +10,143 @@ class Settings(BaseSettings):
     # LLM
     mistral_api_key: str
     mistral_model: str
+    mistral_server_url: Optional[str] = None
+
+    # Shared LLM client: limits apply across every summary, stream and health call
+    llm_max_concurrency: int = 8
+    llm_queue_timeout: float = 60.0
+    llm_requests_per_minute: float = 120.0
+    llm_request_burst: int = 4
+    llm_tokens_per_minute: int = 500_000
+    llm_completion_tokens_estimate: int = 800
+    llm_max_retries: int = 4
+    llm_backoff_base: float = 0.5
+    llm_backoff_max: float = 20.0
+    llm_timeout_seconds: float = 120.0
+
+    # Summary output: provider JSON mode (json_schema | json_object | off) and re-ask of missing fields.
+    # After the provider rejects JSON mode, summaries go without it for this many seconds (0 = that call only)
+    llm_response_format: Literal["json_schema", "json_object", "off"] = "json_schema"
+    llm_response_format_retry_after: float = 600.0
+    summary_reask_enabled: bool = True
+
+    # Summary model routing: payloads up to LLM_SMALL_MODEL_MAX_TOKENS (estimated input tokens) go to
+    # LLM_SMALL_MODEL when set. A summary completion still running after LLM_HEDGE_AFTER seconds (0 = the
+    # route's recent p95, once LLM_HEDGE_MIN_SAMPLES calls are in) is hedged with one duplicate request;
+    # at most LLM_HEDGE_BUDGET hedges per call (0 = no hedging), and only while the LLM client has a free slot
+    llm_small_model: Optional[str] = None
+    llm_small_model_max_tokens: int = 1500
+    llm_hedge_after: float = 0.0
+    llm_hedge_budget: float = 0.05
+    llm_hedge_min_samples: int = 20
+
+    # LLM health: background probe (models | completion) and readiness thresholds
+    llm_health_probe: Literal["models", "completion"] = "models"
+    llm_health_interval: float = 30.0
+    llm_health_timeout: float = 5.0
+    llm_health_window_seconds: float = 300.0
+    llm_health_max_error_rate: float = 0.5
+
+    # Startup: eager loads the LLM client (mistralai) and starts its health probe during startup;
+    # lazy defers both to the first summary, for workers that only serve trials. STARTUP_WARMUP opens
+    # upstream connections and SQLite files before the first request is accepted
+    llm_startup: Literal["eager", "lazy"] = "eager"
+    startup_warmup: bool = True
 
     # External APIs
     clinical_trial_base_url: str
     clinical_trial_get_study_url: str
 
+    # Upstream HTTP client
+    upstream_pool_connections: int = 4
+    upstream_pool_maxsize: int = 32
+    upstream_max_per_host: int = 16
+    upstream_connect_timeout: float = 5.0
+    upstream_read_timeout: float = 20.0
+
+    # Upstream circuit breaker: opens once UPSTREAM_BREAKER_FAILURE_RATE of the last WINDOW calls
+    # (at least MIN_CALLS) failed or took SLOW_SECONDS or more, fails fast for OPEN_SECONDS, then
+    # lets HALF_OPEN_CALLS probes through. Cached trials and searches are served stale meanwhile.
+    upstream_breaker_enabled: bool = True
+    upstream_breaker_window: int = 50
+    upstream_breaker_min_calls: int = 10
+    upstream_breaker_failure_rate: float = 0.5
+    upstream_breaker_slow_seconds: float = 5.0
+    upstream_breaker_open_seconds: float = 30.0
+    upstream_breaker_half_open_calls: int = 1
+
+    # Search pagination / export
+    search_projection: bool = True
+    search_page_max: int = 1000
+    export_page_size: int = 200
+
+    # Search result cache: fresh until the soft TTL, then served stale while one background
+    # refresh runs; past the hard TTL only kept as a fallback for upstream outages
+    search_cache_enabled: bool = True
+    search_cache_soft_ttl: float = 300.0
+    search_cache_hard_ttl: float = 3600.0
+    search_cache_max_entries: int = 2000
+    search_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # Eligibility-filtered search (age / sex / healthy volunteers): upstream cannot filter on these,
+    # so pages are fetched and filtered here. The first page is FIRST_PAGE_FACTOR x limit studies, later
+    # pages are sized from the share that passed so far; pages are capped at ELIGIBILITY_PAGE_SIZE
+    # studies and searches at ELIGIBILITY_MAX_PAGES pages
+    eligibility_page_size: int = 100
+    eligibility_first_page_factor: float = 2.0
+    eligibility_max_pages: int = 10
+
+    # Trial cache
+    trial_cache_enabled: bool = True
+    trial_cache_max_entries: int = 5000
+    trial_cache_max_bytes: int = 64 * 1024 * 1024
+    trial_cache_ttl_seconds: float = 6 * 60 * 60
+    trial_cache_path: str = ".cache/trials.sqlite3"
+
+    # Summary store
+    summary_store_enabled: bool = True
+    summary_store_path: str = ".cache/summaries.sqlite3"
+
+    # Estimated token budget for the summary INPUT_JSON (0 = only restructure eligibility text)
+    summary_input_token_budget: int = 2000
+
+    # Local ClinicalTrials.gov mirror: off | prefer (mirror, then upstream) | only (no upstream)
+    mirror_mode: Literal["off", "prefer", "only"] = "off"
+    mirror_path: str = ".cache/mirror.sqlite3"
+    mirror_sync_page_size: int = 1000
+    mirror_sync_condition: Optional[str] = None
+
+    # Batch summarization
+    batch_max_items: int = 500
+    batch_concurrency: int = 8
+    batch_llm_requests_per_minute: float = 60.0
+
+    # HTTP caching for trial and summary responses: Cache-Control max-age, compression threshold
+    # and the in-process cache of serialized (and compressed) bodies
+    http_trial_max_age: int = 300
+    http_summary_max_age: int = 3600
+    http_compress_min_bytes: int = 1024
+    http_body_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # Background summary pre-warming: conditions and statuses are comma-separated; limits are per run
+    prewarm_enabled: bool = False
+    prewarm_conditions: str = ""
+    prewarm_statuses: str = "RECRUITING,NOT_YET_RECRUITING"
+    prewarm_trials_per_condition: int = 50
+    prewarm_interval: float = 6 * 60 * 60
+    prewarm_max_summaries: int = 200
+    prewarm_token_budget: int = 1_000_000
+    prewarm_concurrency: int = 2
+    prewarm_llm_requests_per_minute: float = 20.0
+
+    # Sampling profiler for slow requests (needs pyinstrument; 0 = off)
+    profile_sample_rate: float = 0.0
+    profile_slow_ms: float = 1000.0
+    profile_dir: str = ".cache/profiles"
+
+    # Admin endpoints: disabled (404) unless set, then the X-Admin-Token header must match
+    admin_token: Optional[str] = None
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
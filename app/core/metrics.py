@@ -0,0 +1,192 @@
+"""
+Low-overhead process metrics rendered in the Prometheus text format.
+
+Stage timers feed a latency histogram and, while a request is being served,
+that request's Server-Timing header. Observations are a perf_counter pair and
+a short locked update, cheap enough to leave on in production.
+"""
+from __future__ import annotations
+
+import abc
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+T = TypeVar("T")
+
+LabelValues = Tuple[str, ...]
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines of this metric, without HELP and TYPE"""
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {v}" for k, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: bucket counts (last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][i] += 1
+            entry[1][0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(counts), total[0]) for k, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="{}"'.format("+Inf" if bound == float("inf") else repr(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+def register_collector(fn: Callable[[], List[str]]) -> None:
+    """Add a callback returning ready-made exposition lines, evaluated at scrape time"""
+    _collectors.append(fn)
+
+def stats_lines(
+    prefix: str,
+    what: str,
+    stats: Dict[str, Dict[str, Any]],
+    label: str = "",
+    counters: Sequence[str] = (),
+    gauges: Sequence[str] = (),
+    helps: Optional[Dict[str, str]] = None,
+) -> List[str]:
+    """
+    Exposition lines for stats() dicts read at scrape time, one family per key:
+    `counters` become <prefix>_<key>_total counters, `gauges` <prefix>_<key> gauges.
+    `stats` maps a value of `label` (route, host, ...) to its stats; a single
+    unlabelled series is {"": stats}. None values are skipped.
+    """
+    lines: List[str] = []
+    labelnames = (label,) if label else ()
+    for keys, kind, suffix in ((counters, "counter", "_total"), (gauges, "gauge", "")):
+        for key in keys:
+            name = f"{prefix}_{key}{suffix}"
+            help = (helps or {}).get(key) or key.replace("_", " ")
+            lines += [f"# HELP {name} {what}: {help}", f"# TYPE {name} {kind}"]
+            for value, values in stats.items():
+                if values.get(key) is not None:
+                    lines.append(f"{name}{_labels(labelnames, (value,))} {values[key]}")
+    return lines
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines += metric.render()
+    for collector in _collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+stage_seconds = Histogram("triallens_stage_seconds", "Time spent in each hot-path stage", ["stage"])
+http_request_seconds = Histogram("triallens_http_request_seconds", "HTTP request latency", ["method", "route", "status"])
+upstream_response_bytes = Histogram("triallens_upstream_response_bytes", "ClinicalTrials.gov response body size", buckets=SIZE_BUCKETS)
+llm_tokens = Histogram("triallens_llm_tokens", "Tokens per LLM call as reported by the provider", ["kind"], buckets=TOKEN_BUCKETS)
+
+# (stage, seconds) pairs for the request being served, read by the Server-Timing middleware
+_request_timings: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("request_timings", default=None)
+
+def start_request() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+def record_stage(name: str, seconds: float) -> None:
+    stage_seconds.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+def timed(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator form of stage()"""
+    def wrap(fn: Callable[..., T]) -> Callable[..., T]:
+        @functools.wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> T:
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record_stage(name, time.perf_counter() - started)
+        return inner
+    return wrap
+
+def server_timing(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Server-Timing header value; repeated stages are summed in first-seen order"""
+    merged: Dict[str, float] = {}
+    for name, seconds in list(timings):
+        merged[name] = merged.get(name, 0.0) + seconds
+    if total is not None:
+        merged["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in merged.items())
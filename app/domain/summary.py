@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from datetime import datetime, timezone
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Annotated, List, Optional
 
 class EligibilityHighlights(BaseModel):
     """
@@ -31,7 +31,7 @@ class TrialSummary(BaseModel):
     """
     nct_id: str = Field(..., description="ClinicalTrials.gov NCT identifier.")
     source_url: str = Field(..., description="ClinicalTrials.gov study URL.")
-    generated_at: datetime = Field(default=datetime.now(timezone.utc), description="UTC timestamp when this summary was generated.")
+    generated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), description="UTC timestamp when this summary was generated.")
 
     plain_english_summary: str = Field(
         ...,
@@ -70,4 +70,11 @@ class TrialSummary(BaseModel):
     limitations: List[str] = Field(
         default_factory=list,
         description="Explicit notes about missing/uncertain info (e.g., 'Results not posted', 'Locations missing')."
-    )
\ No newline at end of file
+    )
+
+class BatchSummaryRequest(BaseModel):
+    """
+    NCT IDs to summarize in one batch; results stream back as NDJSON.
+    """
+    nct_ids: List[Annotated[str, Field(pattern=r"^NCT\d{8}$")]] = Field(..., min_length=1, description="ClinicalTrials.gov NCT identifiers.")
+    concurrency: Optional[int] = Field(default=None, ge=1, le=64, description="Concurrent LLM calls; defaults to the configured batch concurrency.")
\ No newline at end of file
@@ -1,6 +1,31 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, model_validator
+from pydantic.json_schema import SkipJsonSchema
+from typing import Iterable, Optional, List, Sequence
 from datetime import date
+import re
+
+# sites kept as TrialLocation objects on a Trial; all of them are in Trial.sites
+LOCATION_PREVIEW_LIMIT = 20
+
+_AGE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([A-Za-z]+)")
+_AGE_UNITS = {
+    "year": 1.0,
+    "month": 1 / 12,
+    "week": 7 / 365.25,
+    "day": 1 / 365.25,
+    "hour": 1 / 8766,
+    "minute": 1 / 525960,
+}
+
+def age_in_years(text: Optional[str]) -> Optional[float]:
+    """
+    A ClinicalTrials.gov age ("18 Years", "6 Months", "N/A") in years, or None when absent or unparseable
+    """
+    m = _AGE.match(text or "")
+    if not m:
+        return None
+    unit = _AGE_UNITS.get(m.group(2).lower().rstrip("s"))
+    return round(float(m.group(1)) * unit, 4) if unit is not None else None
 
 class TrialLocation(BaseModel):
     facility: Optional[str]
@@ -8,6 +33,59 @@ class TrialLocation(BaseModel):
     city: Optional[str]
     state: Optional[str]
     country: Optional[str]
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+
+class LocationColumns(BaseModel):
+    """
+    Every site of a trial stored column by column, one list per field, instead of
+    one object per site. Mapping, caching and (de)serializing a 2,000-site trial
+    stays cheap; TrialLocation objects are only built for the rows returned.
+    """
+    facility: List[Optional[str]] = []
+    status: List[Optional[str]] = []
+    city: List[Optional[str]] = []
+    state: List[Optional[str]] = []
+    country: List[Optional[str]] = []
+    lat: List[Optional[float]] = []
+    lon: List[Optional[float]] = []
+
+    def __len__(self) -> int:
+        return len(self.facility)
+
+    def row(self, i: int) -> TrialLocation:
+        return TrialLocation(
+            facility=self.facility[i],
+            status=self.status[i],
+            city=self.city[i],
+            state=self.state[i],
+            country=self.country[i],
+            lat=self.lat[i],
+            lon=self.lon[i],
+        )
+
+    def rows(self, indices: Iterable[int]) -> List[TrialLocation]:
+        return [self.row(i) for i in indices]
+
+    def select(self, countries: Sequence[str] = (), states: Sequence[str] = (), statuses: Sequence[str] = ()) -> List[int]:
+        """
+        Indices of the sites matching every given filter (case-insensitive, any value within a filter)
+        """
+        columns = [
+            (column, {v.casefold() for v in wanted})
+            for column, wanted in ((self.country, countries), (self.state, states), (self.status, statuses))
+            if wanted
+        ]
+        if not columns:
+            return list(range(len(self)))
+        return [
+            i for i in range(len(self))
+            if all(column[i] is not None and column[i].casefold() in wanted for column, wanted in columns)
+        ]
+
+    @classmethod
+    def from_locations(cls, locations: Sequence[TrialLocation]) -> "LocationColumns":
+        return cls(**{field: [getattr(loc, field) for loc in locations] for field in cls.model_fields})
 
 class TrialContact(BaseModel):
     name: Optional[str]
@@ -38,15 +116,50 @@ class Trial(BaseModel):
     enrollment_count: Optional[int] = None
     min_age: Optional[str] = None
     max_age: Optional[str] = None
+    # min_age / max_age in years, parsed at mapping time for eligibility filtering
+    min_age_years: Optional[float] = None
+    max_age_years: Optional[float] = None
     sex: Optional[str] = None
     healthy_volunteers: Optional[bool] = None
     eligibility_criteria: Optional[str] = None
     interventions: Optional[List[str]] = None
     primary_outcomes: Optional[List[TrialOutcome]] = None
+    # first LOCATION_PREVIEW_LIMIT sites; page through all of them with /trials/{nct_id}/locations
     locations: Optional[List[TrialLocation]] = None
+    location_count: Optional[int] = None
     contacts: Optional[List[TrialContact]] = None
     lead_sponsor: Optional[str] = None
     collaborators: Optional[List[str]] = None
+    # every site, columnar; kept in caches and the mirror, left out of API responses and their schema
+    sites: SkipJsonSchema[Optional[LocationColumns]] = None
+
+    @model_validator(mode="after")
+    def _compact_locations(self) -> "Trial":
+        # trials cached or mirrored before sites existed carry every site in `locations`
+        if self.sites is None and self.locations is not None:
+            self.sites = LocationColumns.from_locations(self.locations)
+            self.location_count = len(self.locations)
+            self.locations = self.locations[:LOCATION_PREVIEW_LIMIT]
+        return self
+
+    @model_validator(mode="after")
+    def _parse_ages(self) -> "Trial":
+        # trials cached or mirrored before the ages were parsed
+        if self.min_age_years is None and self.min_age:
+            self.min_age_years = age_in_years(self.min_age)
+        if self.max_age_years is None and self.max_age:
+            self.max_age_years = age_in_years(self.max_age)
+        return self
+
+    def location_preview(self, limit: int) -> Optional[List[TrialLocation]]:
+        """
+        The first `limit` sites, or None when the trial lists none
+        """
+        if self.locations is None:
+            return None
+        if limit <= len(self.locations) or self.sites is None:
+            return self.locations[:limit]
+        return self.sites.rows(range(min(limit, len(self.sites))))
 
 class TrialCard(BaseModel):
     nct_id: str
@@ -59,4 +172,24 @@ class TrialCard(BaseModel):
     lead_sponsor: Optional[str] = None
     last_update_posted: Optional[date] = None
     locations: Optional[List["TrialLocation"]] = None
-    location_count: Optional[int] = None
\ No newline at end of file
+    location_count: Optional[int] = None
+    min_age_years: Optional[float] = None
+    max_age_years: Optional[float] = None
+    sex: Optional[str] = None
+    healthy_volunteers: Optional[bool] = None
+
+class TrialCardPage(BaseModel):
+    trials: List[TrialCard]
+    next_page_token: Optional[str] = None
+    total_count: Optional[int] = None
+
+class TrialLocationPage(BaseModel):
+    nct_id: str
+    locations: List[TrialLocation]
+    total_count: int
+    next_page_token: Optional[str] = None
+
+class NearbySite(BaseModel):
+    distance_km: float
+    location: TrialLocation
+    trial: TrialCard
@@ -0,0 +1,146 @@
+import copy
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# rough chars-per-token ratio for English JSON with the Mistral tokenizer
+CHARS_PER_TOKEN = 4
+
+_HEADER = re.compile(r"^\W*(?:key\s+)?(inclusion|exclusion)\s+criteria\b\W*", re.IGNORECASE)
+_BULLET = re.compile(r"^(?:[*\-•·▪–]+|\(?\d{1,2}[.)]|\(?[a-z][.)](?=\s))\s*", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+def estimate_tokens(value: Any) -> int:
+    """Token estimate for a value as it appears inside the prompt's INPUT_JSON"""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def estimate_field_tokens(payload: Dict[str, Any]) -> Dict[str, int]:
+    """Token estimate per top-level field"""
+    return {k: estimate_tokens(v) for k, v in payload.items()}
+
+def compact_eligibility(text: Optional[str]) -> Optional[Dict[str, List[str]]]:
+    """
+    Split free-text criteria into de-duplicated inclusion / exclusion bullets.
+    Lines before the first header land in "other". Deterministic: same text, same output.
+    """
+    if not text:
+        return None
+    sections: Dict[str, List[str]] = {"inclusion": [], "exclusion": [], "other": []}
+    seen = set()
+    current = "other"
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        header = _HEADER.match(line)
+        if header:
+            current = header.group(1).lower()
+            line = line[header.end():]
+            if not line:
+                continue
+        line = _SPACE.sub(" ", _BULLET.sub("", line)).strip()
+        norm = line.casefold().rstrip(" .;,")
+        if not norm or norm in seen:
+            continue
+        seen.add(norm)
+        sections[current].append(line)
+    return {k: v for k, v in sections.items() if v} or None
+
+def _drop(name: str) -> Callable[[Dict[str, Any]], None]:
+    def step(payload: Dict[str, Any]) -> None:
+        payload.pop(name, None)
+    return step
+
+def _cap(name: str, n: int) -> Callable[[Dict[str, Any]], None]:
+    def step(payload: Dict[str, Any]) -> None:
+        if isinstance(payload.get(name), list):
+            payload[name] = payload[name][:n]
+    return step
+
+def _cap_bullets(n: int, max_chars: Optional[int] = None) -> Callable[[Dict[str, Any]], None]:
+    def step(payload: Dict[str, Any]) -> None:
+        crit = payload.get("eligibility_criteria")
+        if not isinstance(crit, dict):
+            return
+        for section, bullets in crit.items():
+            bullets = bullets[:n]
+            if max_chars:
+                bullets = [b if len(b) <= max_chars else b[:max_chars].rsplit(" ", 1)[0] + "..." for b in bullets]
+            crit[section] = bullets
+    return step
+
+def _drop_titles(payload: Dict[str, Any]) -> None:
+    # "title" already carries the official title, or the brief one when there is none
+    payload.pop("brief_title", None)
+    payload.pop("official_title", None)
+
+def _outcome_measures(payload: Dict[str, Any]) -> None:
+    outcomes = payload.get("primary_outcomes")
+    if isinstance(outcomes, list):
+        payload["primary_outcomes"] = [{"measure": o.get("measure"), "time_frame": o.get("time_frame")} for o in outcomes[:5]]
+
+# Applied in order until the payload fits: least useful for a patient-facing summary first
+TRIM_STEPS: List[Tuple[str, Callable[[Dict[str, Any]], None]]] = [
+    ("contacts", _drop("contacts")),
+    ("collaborators", _drop("collaborators")),
+    ("duplicate_titles", _drop_titles),
+    ("keywords", _drop("keywords")),
+    ("locations:3", _cap("locations", 3)),
+    ("outcome_descriptions", _outcome_measures),
+    ("eligibility:15", _cap_bullets(15)),
+    ("eligibility_chars:200", _cap_bullets(15, 200)),
+    ("interventions:5", _cap("interventions", 5)),
+    ("locations", _drop("locations")),
+    ("eligibility:8", _cap_bullets(8, 160)),
+]
+
+@dataclass
+class BudgetReport:
+    budget: int
+    original_tokens: int
+    compacted_tokens: int
+    trimmed: List[str] = field(default_factory=list)
+    # estimated tokens per field of the compacted payload
+    field_tokens: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def reduction(self) -> float:
+        return 1 - self.compacted_tokens / self.original_tokens if self.original_tokens else 0.0
+
+    @property
+    def fits(self) -> bool:
+        return not self.budget or self.compacted_tokens <= self.budget
+
+    def largest(self, n: int = 3) -> List[Tuple[str, int]]:
+        return sorted(self.field_tokens.items(), key=lambda kv: kv[1], reverse=True)[:n]
+
+def fit_to_budget(payload: Dict[str, Any], budget: int) -> Tuple[Dict[str, Any], BudgetReport]:
+    """
+    Compact a summary input so its estimated size fits `budget` tokens (0 = no limit).
+    Eligibility text is always restructured into bullets; fields are then trimmed
+    following TRIM_STEPS until the payload fits or there is nothing left to trim.
+    Only steps that shrank a field are reported as trimmed.
+    """
+    original = estimate_tokens(payload)
+    out = copy.deepcopy(payload)
+    if isinstance(out.get("eligibility_criteria"), str):
+        out["eligibility_criteria"] = compact_eligibility(out["eligibility_criteria"])
+
+    trimmed: List[str] = []
+    tokens = estimate_tokens(out)
+    sizes = estimate_field_tokens(out)
+    if budget:
+        for name, step in TRIM_STEPS:
+            if tokens <= budget:
+                break
+            step(out)
+            after = estimate_field_tokens(out)
+            if after != sizes:
+                trimmed.append(name)
+                sizes = after
+                tokens = estimate_tokens(out)
+    return out, BudgetReport(
+        budget=budget, original_tokens=original, compacted_tokens=tokens, trimmed=trimmed, field_tokens=sizes
+    )
@@ -0,0 +1,438 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import llm_tokens, record_stage
+from app.llm.budget import estimate_tokens
+
+if TYPE_CHECKING:
+    from mistralai import Mistral
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class LLMUnavailable(RuntimeError):
+    """
+    The LLM could not take the request: rate limited after every retry, or the wait queue timed out
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """
+    Reservation-based token bucket shared by threads and coroutines.
+
+    reserve(n) takes n tokens straight away, going into debt if needed, and returns
+    how long the caller must wait before using them, so waiters are served in
+    reservation order.
+    """
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(capacity, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, n: float = 1.0) -> float:
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+class _Waiter:
+    __slots__ = ("wake", "granted")
+
+    def __init__(self, wake: Callable[[], None]):
+        self.wake = wake
+        self.granted = False
+
+class ConcurrencyGate:
+    """
+    FIFO-fair concurrency limit for both threads (acquire) and coroutines (acquire_async),
+    recording queue depth and wait times
+    """
+
+    def __init__(self, limit: int, history: int = 1000):
+        self.limit = max(limit, 1)
+        self._active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._waits: Deque[float] = deque(maxlen=history)
+        self.max_queue_depth = 0
+        self.queued = 0
+
+    def _enter(self, waiter: _Waiter) -> bool:
+        # called with the lock held; True when a slot was free and is now taken
+        if self._active < self.limit and not self._waiters:
+            self._active += 1
+            return True
+        self._waiters.append(waiter)
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+        return False
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                return
+        self.release()
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        started = time.perf_counter()
+        event = threading.Event()
+        waiter = _Waiter(event.set)
+        with self._lock:
+            entered = self._enter(waiter)
+        if not entered and not event.wait(timeout):
+            self._abandon(waiter)
+            raise LLMUnavailable("Timed out waiting for an LLM slot")
+        self._waits.append(time.perf_counter() - started)
+
+    async def acquire_async(self, timeout: Optional[float] = None) -> None:
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+
+        def wake() -> None:
+            loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+
+        waiter = _Waiter(wake)
+        with self._lock:
+            entered = self._enter(waiter)
+        if not entered:
+            try:
+                await asyncio.wait_for(fut, timeout)
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+                raise LLMUnavailable("Timed out waiting for an LLM slot")
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+        self._waits.append(time.perf_counter() - started)
+
+    def has_capacity(self) -> bool:
+        """A slot is free and nobody is waiting for one"""
+        with self._lock:
+            return self._active < self.limit and not self._waiters
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._waiters:
+                self._active -= 1
+                return
+            # hand the slot straight to the next waiter; _active is unchanged
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        waiter.wake()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def pct(p: float) -> Optional[float]:
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 1) if waits else None
+
+        return {
+            "limit": self.limit,
+            "in_flight": self._active,
+            "queue_depth": len(self._waiters),
+            "max_queue_depth": self.max_queue_depth,
+            "queued": self.queued,
+            "wait_ms_p50": pct(0.50),
+            "wait_ms_p95": pct(0.95),
+            "wait_ms_max": round(waits[-1] * 1000, 1) if waits else None,
+        }
+
+class CallWindow:
+    """
+    Outcome and latency of LLM calls over the last `seconds`
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self._calls: Deque[tuple] = deque()
+        self._lock = threading.Lock()
+
+    def record(self, latency: float, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._calls.append((now, latency, ok))
+            self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - self.seconds:
+            self._calls.popleft()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._trim(time.monotonic())
+            calls = list(self._calls)
+        latencies = sorted(c[1] for c in calls if c[2])
+        errors = sum(1 for c in calls if not c[2])
+
+        def pct(p: float) -> Optional[float]:
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 1) if latencies else None
+
+        return {
+            "window_s": self.seconds,
+            "calls": len(calls),
+            "errors": errors,
+            "error_rate": round(errors / len(calls), 3) if calls else None,
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+        }
+
+def _status(e: Exception) -> Optional[int]:
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "raw_response", None), "status_code", None)
+    return status
+
+def retry_after(e: Exception) -> Optional[float]:
+    """Seconds from a Retry-After header (delta or HTTP date) on an SDK error, if any"""
+    headers = getattr(getattr(e, "raw_response", None), "headers", None) or getattr(e, "headers", None)
+    value = headers.get("retry-after") if headers is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """
+    Process-wide Mistral client.
+
+    One SDK instance (and so one keep-alive connection pool) is shared by every
+    caller. Each call passes through request and token buckets, then a bounded
+    concurrency gate, and is retried with jittered exponential backoff on 429,
+    5xx and transport errors, honouring Retry-After when the server sends it.
+
+    The SDK (mistralai and httpx, about half of the app's import time) is only
+    imported when the client is first used or load()ed, so workers that never
+    summarize never pay for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._client: Optional[Mistral] = None
+        self.requests = TokenBucket(settings.llm_requests_per_minute, settings.llm_request_burst)
+        self.tokens = TokenBucket(settings.llm_tokens_per_minute, settings.llm_tokens_per_minute)
+        self.gate = ConcurrencyGate(settings.llm_max_concurrency)
+        self.window = CallWindow(settings.llm_health_window_seconds)
+        self.counters = {"calls": 0, "attempts": 0, "retries": 0, "rate_limited": 0, "failed": 0, "throttled_s": 0.0}
+
+    @property
+    def loaded(self) -> bool:
+        return self._client is not None
+
+    def load(self) -> None:
+        """
+        Import the SDK and build its connection pools now instead of on the first call
+        """
+        self._sdk()
+
+    def _sdk(self) -> "Mistral":
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import httpx
+                    from mistralai import Mistral
+
+                    limits = httpx.Limits(
+                        max_connections=settings.llm_max_concurrency * 2,
+                        max_keepalive_connections=settings.llm_max_concurrency,
+                    )
+                    timeout = httpx.Timeout(settings.llm_timeout_seconds, connect=settings.upstream_connect_timeout)
+                    self._client = Mistral(
+                        api_key=settings.mistral_api_key,
+                        server_url=settings.mistral_server_url,
+                        client=httpx.Client(limits=limits, timeout=timeout),
+                        async_client=httpx.AsyncClient(limits=limits, timeout=timeout),
+                        retry_config=None,
+                    )
+        return self._client
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += amount
+
+    def _throttle(self, tokens: int) -> float:
+        delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        self._count("throttled_s", delay)
+        return delay
+
+    def _backoff(self, e: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying `e`, or None when it should not be retried"""
+        status = _status(e)
+        if status == 429:
+            self._count("rate_limited")
+        import httpx  # already loaded with the SDK that raised e
+
+        if status not in RETRY_STATUSES and not isinstance(e, httpx.TransportError):
+            return None
+        if attempt >= settings.llm_max_retries:
+            return None
+        delay = random.uniform(0, min(settings.llm_backoff_max, settings.llm_backoff_base * 2 ** attempt))
+        hinted = retry_after(e)
+        return max(delay, hinted) if hinted is not None else delay
+
+    def _record_usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        for kind in ("prompt_tokens", "completion_tokens"):
+            value = getattr(usage, kind, None)
+            if value:
+                llm_tokens.observe(value, kind=kind.split("_")[0])
+
+    def _record_failure(self, e: Exception, elapsed: float) -> None:
+        # a 429 means the service is up and pushing back; it is not a health signal
+        if _status(e) != 429:
+            self.window.record(elapsed, False)
+
+    def _give_up(self, e: Exception) -> Exception:
+        self._count("failed")
+        if _status(e) == 429:
+            return LLMUnavailable("LLM rate limit exceeded", retry_after(e))
+        return e
+
+    def _cost(self, messages: List[Dict[str, Any]]) -> int:
+        return sum(estimate_tokens(m.get("content") or "") for m in messages) + settings.llm_completion_tokens_estimate
+
+    def complete(self, model: str, messages: List[Dict[str, Any]], **kwargs: Any) -> Any:
+        """
+        Blocking chat completion; call from worker threads. The slot is given up
+        while waiting out a backoff and taken again for the retry.
+        """
+        self._count("calls")
+        cost = self._cost(messages)
+        queued = time.perf_counter()
+        self.gate.acquire(settings.llm_queue_timeout)
+        held = True
+        try:
+            attempt = 0
+            while True:
+                time.sleep(self._throttle(cost))
+                record_stage("llm_wait", time.perf_counter() - queued)
+                self._count("attempts")
+                started = time.perf_counter()
+                try:
+                    resp = self._sdk().chat.complete(model=model, messages=messages, **kwargs)
+                except Exception as e:
+                    record_stage("llm", time.perf_counter() - started)
+                    self._record_failure(e, time.perf_counter() - started)
+                    delay = self._backoff(e, attempt)
+                    if delay is None:
+                        raise self._give_up(e) from e
+                    self._count("retries")
+                    attempt += 1
+                    queued = time.perf_counter()
+                    self.gate.release()
+                    held = False
+                    time.sleep(delay)
+                    self.gate.acquire(settings.llm_queue_timeout)
+                    held = True
+                else:
+                    elapsed = time.perf_counter() - started
+                    record_stage("llm", elapsed)
+                    self.window.record(elapsed, True)
+                    self._record_usage(getattr(resp, "usage", None))
+                    return resp
+        finally:
+            if held:
+                self.gate.release()
+
+    async def stream(self, model: str, messages: List[Dict[str, Any]], **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Streaming chat completion. The slot is held until the stream is consumed,
+        except while waiting out a backoff; only opening the stream is retried,
+        never a partially received one.
+        """
+        self._count("calls")
+        cost = self._cost(messages)
+        queued = time.perf_counter()
+        await self.gate.acquire_async(settings.llm_queue_timeout)
+        held = True
+        try:
+            attempt = 0
+            while True:
+                await asyncio.sleep(self._throttle(cost))
+                record_stage("llm_wait", time.perf_counter() - queued)
+                self._count("attempts")
+                started = time.perf_counter()
+                try:
+                    events = await self._sdk().chat.stream_async(model=model, messages=messages, **kwargs)
+                    # time to first byte: stream length depends on the completion, not on LLM health
+                    self.window.record(time.perf_counter() - started, True)
+                    record_stage("llm_ttfb", time.perf_counter() - started)
+                    break
+                except Exception as e:
+                    self._record_failure(e, time.perf_counter() - started)
+                    delay = self._backoff(e, attempt)
+                    if delay is None:
+                        raise self._give_up(e) from e
+                    self._count("retries")
+                    attempt += 1
+                    queued = time.perf_counter()
+                    self.gate.release()
+                    held = False
+                    await asyncio.sleep(delay)
+                    await self.gate.acquire_async(settings.llm_queue_timeout)
+                    held = True
+            async for event in events:
+                self._record_usage(getattr(event.data, "usage", None))
+                yield event
+            record_stage("llm", time.perf_counter() - started)
+        finally:
+            if held:
+                self.gate.release()
+
+    def probe(self) -> None:
+        """
+        Cheap liveness call for the health checker. Bypasses the limiter and queue so
+        a saturated client still reports on the service itself.
+        """
+        timeout_ms = int(settings.llm_health_timeout * 1000)
+        if settings.llm_health_probe == "completion":
+            self._sdk().chat.complete(
+                model=settings.mistral_model,
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1,
+                timeout_ms=timeout_ms,
+            )
+        else:
+            self._sdk().models.list(timeout_ms=timeout_ms)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in counters.items()},
+            **self.gate.stats(),
+        }
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None:
+            client.sdk_configuration.client.close()
+            await client.sdk_configuration.async_client.aclose()
+
+llm_client = LLMClient()
@@ -1,20 +1,90 @@
-from mistralai import Mistral
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
 
 from app.core.config import settings
+from app.llm.client import llm_client
+
+class LLMHealth:
+    """
+    Background LLM health checker.
+
+    A cheap probe (list models, or a one-token completion) runs every
+    LLM_HEALTH_INTERVAL seconds; status() answers instantly from the last probe
+    plus the client's rolling window of real call latencies and errors.
+    """
+
+    def __init__(self):
+        self.checked_at: Optional[datetime] = None
+        self.latency_ms: Optional[float] = None
+        self.ok: Optional[bool] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
+        self.probes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def probe(self) -> bool:
+        started = time.perf_counter()
+        try:
+            llm_client.probe()
+        except Exception as e:
+            self.ok = False
+            self.last_error = f"{type(e).__name__}: {e}"[:500]
+            self.last_error_at = datetime.now(timezone.utc)
+        else:
+            self.ok = True
+        self.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.checked_at = datetime.now(timezone.utc)
+        self.probes += 1
+        return self.ok
+
+    async def _run(self) -> None:
+        while True:
+            # with LLM_STARTUP=lazy, probing would load the client on a worker that may never summarize
+            if settings.llm_startup == "eager" or llm_client.loaded:
+                await asyncio.to_thread(self.probe)
+            await asyncio.sleep(settings.llm_health_interval)
+
+    def start(self) -> None:
+        if self._task is None and settings.llm_health_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> Dict[str, Any]:
+        window = llm_client.window.stats()
+        error_rate = window["error_rate"] or 0.0
+        if self.ok is None:
+            state = "unknown"
+        elif not self.ok or (window["calls"] >= 5 and error_rate >= settings.llm_health_max_error_rate):
+            state = "down"
+        elif error_rate >= 0.1:
+            state = "degraded"
+        else:
+            state = "ok"
+        return {
+            "status": state,
+            "probe": settings.llm_health_probe,
+            "client_loaded": llm_client.loaded,
+            "checked_at": self.checked_at.isoformat() if self.checked_at else None,
+            "age_s": round((datetime.now(timezone.utc) - self.checked_at).total_seconds(), 1) if self.checked_at else None,
+            "latency_ms": self.latency_ms,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at.isoformat() if self.last_error_at else None,
+            "calls": window,
+        }
+
+    def ready(self) -> bool:
+        return self.status()["status"] != "down"
 
-def check_mistral_health() -> str:
-    try:
-        client = Mistral(api_key=settings.mistral_api_key)
-        
-        chat_response = client.chat.complete(
-            model=settings.mistral_model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": "What is the best French cheese?",
-                },
-            ]
-        )
-        return chat_response
-    except Exception as e:
-        raise Exception(f"Mistral health check failed: {str(e)}")
\ No newline at end of file
+llm_health = LLMHealth()
@@ -14,7 +14,7 @@ def build_summary_input(trial: Trial) -> Dict[str, Any]:
     # limit locations to prevent huge prompts
     locs = []
     if trial.locations:
-        for loc in trial.locations[:int(PAYLOAD_LOCATION_LIMIT)]:
+        for loc in trial.location_preview(int(PAYLOAD_LOCATION_LIMIT)):
             locs.append(
                 {
                     "facility": loc.facility,
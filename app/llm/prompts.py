@@ -1,7 +1,7 @@
 import json
-from typing import Any, Dict
+from typing import Any, Dict, List
 
-PROMPT_VERSION = "v1.0"
+PROMPT_VERSION = "v1.1"
 
 def build_summary_prompt(payload: Dict[str, Any]) -> str:
     """
@@ -55,4 +55,49 @@ Metadata:
 
 INPUT_JSON:
 {payload_json}
-""".strip()
\ No newline at end of file
+""".strip()
+
+# schema lines for each summary field, as shown in the main prompt
+FIELD_SCHEMAS = {
+    "nct_id": '"nct_id": "string"',
+    "source_url": '"source_url": "string"',
+    "plain_english_summary": '"plain_english_summary": "string"',
+    "key_facts": '"key_facts": ["string", ...]',
+    "eligibility": '''"eligibility": {
+    "likely_eligible_if": ["string", ...],
+    "likely_not_eligible_if": ["string", ...],
+    "unknown_or_unclear": ["string", ...]
+  }''',
+    "participation": '''"participation": {
+    "what_it_involves": ["string", ...],
+    "time_commitment": null,
+    "location_notes": null,
+    "costs_and_compensation": null
+  }''',
+    "questions_to_ask_your_doctor": '"questions_to_ask_your_doctor": ["string", ...]',
+    "limitations": '"limitations": ["string", ...]',
+}
+
+def build_reask_prompt(payload: Dict[str, Any], missing: List[str]) -> str:
+    """
+    Ask only for the summary fields a previous completion left out or got wrong.
+    """
+    payload_json = json.dumps(payload, ensure_ascii=False)
+    schema = ",\n  ".join(FIELD_SCHEMAS[f] for f in missing if f in FIELD_SCHEMAS)
+
+    return f"""
+You are TrialLens, a medical information assistant writing part of a patient-friendly,
+plain-English summary of a clinical trial record. INFORMATIONAL ONLY. Do NOT provide medical advice.
+
+Use ONLY the information in INPUT_JSON. Do not invent facts. Keep language simple.
+
+Return ONLY a valid single JSON object with exactly these fields and nothing else,
+no Markdown, no code fences, string newlines escaped as \\n:
+
+{{
+  {schema}
+}}
+
+INPUT_JSON:
+{payload_json}
+""".strip()
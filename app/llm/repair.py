@@ -0,0 +1,122 @@
+import json
+from typing import Any, Dict, List, Tuple
+
+from pydantic import ValidationError
+
+from app.domain.summary import TrialSummary
+
+# fields the prompt asks for; the rest (generated_at, safety_disclaimer) are filled in by the app
+SUMMARY_FIELDS = (
+    "nct_id",
+    "source_url",
+    "plain_english_summary",
+    "key_facts",
+    "eligibility",
+    "participation",
+    "questions_to_ask_your_doctor",
+    "limitations",
+)
+
+class InvalidSummaryOutput(ValueError):
+    """
+    The completion could not be turned into a TrialSummary, even after repair
+    """
+
+def _strip_fence(text: str) -> str:
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+        if text.rstrip().endswith("```"):
+            text = text.rstrip()[:-3]
+    return text
+
+def _balance(text: str) -> str:
+    """
+    Drop trailing commas and close whatever a truncated completion left open
+    (string, arrays, objects), leaving string contents untouched
+    """
+    out: List[str] = []
+    closers: List[str] = []
+    in_string = escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            j = len(out) - 1
+            while j >= 0 and out[j].isspace():
+                j -= 1
+            if j >= 0 and out[j] == ",":
+                del out[j]
+            if closers:
+                closers.pop()
+        out.append(ch)
+    if in_string:
+        out.append('"')
+    tail = "".join(out).rstrip()
+    if tail.endswith(","):
+        tail = tail[:-1]
+    elif tail.endswith(":"):
+        tail += " null"
+    return tail + "".join(reversed(closers))
+
+def repair_json(text: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Parse a completion that should be a single JSON object, fixing the usual
+    slips: code fences, prose around the object, literal newlines in strings,
+    trailing commas and truncation. Returns the object and the fixes applied.
+    """
+    fixes: List[str] = []
+    body = _strip_fence(text or "")
+    if body != (text or "").strip():
+        fixes.append("code_fence")
+    start = body.find("{")
+    if start == -1:
+        raise InvalidSummaryOutput("No JSON object in completion")
+    end = body.rfind("}")
+    if start > 0 or (end != -1 and body[end + 1:].strip()):
+        fixes.append("surrounding_text")
+    body = body[start:end + 1] if end > start else body[start:]
+
+    try:
+        return json.loads(body), fixes
+    except json.JSONDecodeError:
+        pass
+    try:
+        data = json.loads(body, strict=False)
+        return data, fixes + ["control_characters"]
+    except json.JSONDecodeError:
+        pass
+    balanced = _balance(body)
+    try:
+        data = json.loads(balanced, strict=False)
+    except json.JSONDecodeError as e:
+        raise InvalidSummaryOutput(f"Unrepairable JSON: {e.msg}") from e
+    if not isinstance(data, dict):
+        raise InvalidSummaryOutput("Completion is not a JSON object")
+    return data, fixes + ["balanced"]
+
+def partial_summary(data: Dict[str, Any], payload: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Keep the fields of `data` that validate against TrialSummary and list the
+    prompt fields still missing. nct_id and source_url come from the payload
+    when the model left them out.
+    """
+    fields = {k: v for k, v in data.items() if k in SUMMARY_FIELDS and v is not None}
+    fields.setdefault("nct_id", payload.get("nct_id"))
+    fields.setdefault("source_url", payload.get("source_url"))
+    try:
+        TrialSummary.model_validate(fields)
+    except ValidationError as e:
+        for error in e.errors():
+            if error["loc"]:
+                fields.pop(error["loc"][0], None)
+    return fields, [f for f in SUMMARY_FIELDS if f not in fields]
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.metrics import Histogram
+from app.llm.client import CallWindow, llm_client
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+ROUTES = ("small", "large")
+
+route_seconds = Histogram(
+    "triallens_llm_route_seconds", "Summary completion latency per model route, hedging included", ["route", "winner"]
+)
+
+class ModelRouter:
+    """
+    Picks the model for a summary from its input size and runs the completion,
+    hedging it when it runs long.
+
+    Payloads up to LLM_SMALL_MODEL_MAX_TOKENS (estimated) go to LLM_SMALL_MODEL
+    when one is set, everything else to MISTRAL_MODEL. A completion still running
+    after the route's hedge delay (LLM_HEDGE_AFTER, or the route's recent p95 when
+    that is 0) gets one duplicate request; the first valid result wins and the
+    other is left to finish in the background. Hedges per route are capped at
+    LLM_HEDGE_BUDGET times the route's calls. A hedge is only sent while the
+    shared client has a free slot: under saturation it would just queue behind
+    other calls and add load.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self.windows = {route: CallWindow(settings.llm_health_window_seconds) for route in ROUTES}
+        self.counters = {
+            route: {"calls": 0, "hedged": 0, "hedge_wins": 0, "hedge_denied": 0, "hedge_busy": 0, "failed": 0}
+            for route in ROUTES
+        }
+
+    def choose(self, input_tokens: int) -> str:
+        """
+        Model for a summary payload of `input_tokens` estimated tokens
+        """
+        if settings.llm_small_model and input_tokens <= settings.llm_small_model_max_tokens:
+            return settings.llm_small_model
+        return settings.mistral_model
+
+    def route_of(self, model: str) -> str:
+        if settings.llm_small_model and model == settings.llm_small_model and model != settings.mistral_model:
+            return "small"
+        return "large"
+
+    def hedge_after(self, route: str) -> Optional[float]:
+        """
+        Seconds to wait before hedging a call on this route, or None when it is not hedged
+        """
+        if settings.llm_hedge_budget <= 0:
+            return None
+        if settings.llm_hedge_after > 0:
+            return settings.llm_hedge_after
+        window = self.windows[route].stats()
+        if window["calls"] < settings.llm_hedge_min_samples or window["latency_ms_p95"] is None:
+            return None
+        return window["latency_ms_p95"] / 1000
+
+    def _executor(self) -> ThreadPoolExecutor:
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=settings.llm_max_concurrency * 4, thread_name_prefix="llm-hedge")
+        return self._pool
+
+    def _allow_hedge(self, route: str) -> bool:
+        with self._lock:
+            counters = self.counters[route]
+            if counters["hedged"] + 1 > settings.llm_hedge_budget * counters["calls"]:
+                counters["hedge_denied"] += 1
+                return False
+            if not llm_client.gate.has_capacity():
+                counters["hedge_busy"] += 1
+                return False
+            counters["hedged"] += 1
+            return True
+
+    def _attempt(self, route: str, fn: Callable[[], T]) -> T:
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception:
+            self.windows[route].record(time.perf_counter() - started, False)
+            raise
+        self.windows[route].record(time.perf_counter() - started, True)
+        return result
+
+    def _submit(self, route: str, fn: Callable[[], T]) -> "Future[T]":
+        # each attempt gets its own copy of the request context (stage timings)
+        return self._executor().submit(contextvars.copy_context().run, self._attempt, route, fn)
+
+    def run(self, model: str, fn: Callable[[], T]) -> T:
+        """
+        Run fn (one complete-and-validate attempt for `model`), hedging it when it
+        runs past the route's hedge delay. fn raising counts as an invalid result.
+        """
+        route = self.route_of(model)
+        with self._lock:
+            self.counters[route]["calls"] += 1
+        started = time.perf_counter()
+        winner = "primary"
+        try:
+            delay = self.hedge_after(route)
+            if delay is None:
+                return self._attempt(route, fn)
+            primary = self._submit(route, fn)
+            done, _ = wait([primary], timeout=delay)
+            if done or not self._allow_hedge(route):
+                return primary.result()
+            logger.info("%s route: completion still running after %.0f ms, sending a hedged request", route, delay * 1000)
+            hedge = self._submit(route, fn)
+            pending = {primary, hedge}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        error = error or future.exception()
+                        continue
+                    if future is hedge:
+                        winner = "hedge"
+                        with self._lock:
+                            self.counters[route]["hedge_wins"] += 1
+                    return future.result()
+            raise error
+        except Exception:
+            winner = "failed"
+            with self._lock:
+                self.counters[route]["failed"] += 1
+            raise
+        finally:
+            route_seconds.observe(time.perf_counter() - started, route=route, winner=winner)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for route in ROUTES:
+            with self._lock:
+                counters = dict(self.counters[route])
+            delay = self.hedge_after(route)
+            out[route] = {
+                "model": settings.llm_small_model if route == "small" else settings.mistral_model,
+                **counters,
+                "hedge_rate": round(counters["hedged"] / counters["calls"], 4) if counters["calls"] else None,
+                "hedge_win_rate": round(counters["hedge_wins"] / counters["hedged"], 4) if counters["hedged"] else None,
+                "hedge_after_ms": round(delay * 1000, 1) if delay is not None else None,
+                "attempts": self.windows[route].stats(),
+            }
+        return out
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+model_router = ModelRouter()
@@ -0,0 +1,64 @@
+import json
+from typing import Any, List, Tuple
+
+class TopLevelJSONStream:
+    """
+    Incrementally split a streamed JSON object into its top-level members.
+
+    Feed text chunks as they arrive; each call returns the (key, value) pairs
+    whose values became complete in that chunk. Anything before the opening
+    brace (e.g. a stray code fence) is ignored.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self._member_start = 0
+        self._pos = 0
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        self.text += chunk
+        members: List[Tuple[str, Any]] = []
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    members += self._member(self._pos)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                members += self._member(self._pos)
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return members
+
+    def _member(self, end: int) -> List[Tuple[str, Any]]:
+        fragment = self.text[self._member_start:end].strip()
+        if not fragment:
+            return []
+        try:
+            parsed = json.loads("{" + fragment + "}", strict=False)
+        except json.JSONDecodeError:
+            return []
+        return list(parsed.items())
@@ -1,12 +1,41 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
 from app.core.config import settings
 from app.api.trials import router as trials_router
 from app.api.health import router as health_router
 from app.api.summaries import router as summaries_router
+from app.api.admin import router as admin_router
+from app.api.caching import StaleFallbackMiddleware
+from app.api.metrics import ServerTimingMiddleware, router as metrics_router
+from app.llm.client import llm_client
+from app.llm.health import llm_health
+from app.llm.routing import model_router
+from app.services.http import close_upstream
+from app.services.prewarm import summary_prewarmer
+from app.services.warmup import warm_up
 
-app = FastAPI(title=settings.app_name, version=settings.app_version)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.startup_warmup:
+        await asyncio.to_thread(warm_up)
+    llm_health.start()
+    summary_prewarmer.start()
+    yield
+    await summary_prewarmer.stop()
+    await llm_health.stop()
+    close_upstream()
+    model_router.close()
+    await llm_client.aclose()
+
+app = FastAPI(title=settings.app_name, version=settings.app_version, lifespan=lifespan)
+
+app.add_middleware(StaleFallbackMiddleware)
+app.add_middleware(ServerTimingMiddleware)
 
 app.include_router(health_router)
+app.include_router(metrics_router)
 app.include_router(trials_router)
-app.include_router(summaries_router)
\ No newline at end of file
+app.include_router(summaries_router)
+app.include_router(admin_router)
\ No newline at end of file
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import requests
+
+from app.core.config import settings
+from app.llm.client import LLMUnavailable
+from app.services.clinicaltrials import TrialNotFound, get_trial_async
+from app.services.summaries import generate_summary, summary_request
+from app.services.summary_store import summary_store
+
+class RequestSpacer:
+    """
+    Spread calls evenly so at most `per_minute` start in any minute
+    """
+
+    def __init__(self, per_minute: float):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def _error(nct_id: str, e: Exception) -> Dict[str, Any]:
+    if isinstance(e, TrialNotFound) or (
+        isinstance(e, requests.HTTPError) and getattr(e.response, "status_code", None) == 404
+    ):
+        return {"event": "error", "nct_id": nct_id, "status": 404, "detail": "Trial not found"}
+    if isinstance(e, LLMUnavailable):
+        return {"event": "error", "nct_id": nct_id, "status": 503, "detail": str(e)}
+    if isinstance(e, requests.RequestException):
+        return {"event": "error", "nct_id": nct_id, "status": 502, "detail": "ClinicalTrials.gov request failed"}
+    return {"event": "error", "nct_id": nct_id, "status": 502, "detail": f"Failed to generate summary: {type(e).__name__}"}
+
+async def summarize_batch(
+    nct_ids: List[str],
+    concurrency: Optional[int] = None,
+    requests_per_minute: Optional[float] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Summarize many trials, yielding one event per trial in completion order and a
+    final "done" event with throughput. Trials are fetched concurrently through the
+    upstream pool; only LLM calls are bounded by concurrency and the rate limit,
+    summaries already in the store are returned straight away.
+    """
+    ids = list(dict.fromkeys(nct_ids))
+    llm_slots = asyncio.Semaphore(concurrency or settings.batch_concurrency)
+    spacer = RequestSpacer(requests_per_minute if requests_per_minute is not None else settings.batch_llm_requests_per_minute)
+    counts = {"succeeded": 0, "failed": 0, "generated": 0, "stored": 0}
+    started = time.perf_counter()
+
+    async def one(nct_id: str) -> Dict[str, Any]:
+        try:
+            trial = await get_trial_async(nct_id)
+            key, payload, report = await asyncio.to_thread(summary_request, trial)
+            summary = await asyncio.to_thread(summary_store.get, key)
+            if summary is not None:
+                counts["stored"] += 1
+            else:
+                async with llm_slots:
+                    await spacer.wait()
+                    summary = await asyncio.to_thread(generate_summary, key, payload, report)
+                counts["generated"] += 1
+        except Exception as e:
+            counts["failed"] += 1
+            return _error(nct_id, e)
+        counts["succeeded"] += 1
+        return {"event": "summary", "nct_id": nct_id, "data": summary.model_dump(mode="json")}
+
+    tasks = [asyncio.ensure_future(one(nct_id)) for nct_id in ids]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - started
+    yield {
+        "event": "done",
+        "requested": len(ids),
+        **counts,
+        "elapsed_s": round(elapsed, 3),
+        "summaries_per_minute": round(counts["succeeded"] / elapsed * 60, 2) if elapsed > 0 else None,
+    }
\ No newline at end of file
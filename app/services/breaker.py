@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import requests
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+breaker_transitions = Counter("triallens_upstream_breaker_transitions_total", "Circuit breaker state changes", ["host", "to"])
+breaker_rejected = Counter("triallens_upstream_breaker_rejected_total", "Calls failed fast while the circuit was open", ["host"])
+stale_fallbacks = Counter("triallens_stale_fallbacks_total", "Last known good records served because upstream failed", ["kind"])
+
+class CircuitOpen(requests.ConnectionError):
+    """
+    The upstream circuit is open; the call was not attempted
+    """
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one upstream.
+
+    Closed: calls go through and their outcome is kept for the last
+    UPSTREAM_BREAKER_WINDOW calls. Once at least UPSTREAM_BREAKER_MIN_CALLS are in
+    and the share of failed or slow (over UPSTREAM_BREAKER_SLOW_SECONDS) calls
+    reaches UPSTREAM_BREAKER_FAILURE_RATE, the circuit opens.
+    Open: calls fail at once with CircuitOpen for UPSTREAM_BREAKER_OPEN_SECONDS.
+    Half-open: up to UPSTREAM_BREAKER_HALF_OPEN_CALLS probe calls go through; if
+    they all succeed in time the circuit closes, one bad outcome reopens it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self._outcomes: Deque[bool] = deque(maxlen=settings.upstream_breaker_window)
+        self._probes = 0
+        self._probe_successes = 0
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "failures": 0, "slow": 0, "rejected": 0, "opened": 0}
+
+    def _transition(self, state: str) -> None:
+        # called with the lock held
+        logger.warning("upstream circuit %s: %s -> %s", self.name, self.state, state)
+        self.state = state
+        breaker_transitions.inc(host=self.name, to=state)
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+            self.counters["opened"] += 1
+        elif state == HALF_OPEN:
+            self._probes = self._probe_successes = 0
+        else:
+            self.opened_at = None
+            self._outcomes.clear()
+
+    def before(self) -> None:
+        """
+        Admit a call or raise CircuitOpen
+        """
+        if not settings.upstream_breaker_enabled:
+            return
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= settings.upstream_breaker_open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and self._probes < settings.upstream_breaker_half_open_calls:
+                self._probes += 1
+                return
+            if self.state == CLOSED:
+                return
+            self.counters["rejected"] += 1
+        breaker_rejected.inc(host=self.name)
+        raise CircuitOpen(f"Circuit open for {self.name}; failing fast")
+
+    def record(self, ok: bool, seconds: float) -> None:
+        """
+        Outcome of an admitted call
+        """
+        if not settings.upstream_breaker_enabled:
+            return
+        slow = seconds >= settings.upstream_breaker_slow_seconds
+        good = ok and not slow
+        with self._lock:
+            self.counters["calls"] += 1
+            self.counters["failures"] += not ok
+            self.counters["slow"] += slow
+            if self.state == HALF_OPEN:
+                if not good:
+                    self._transition(OPEN)
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= settings.upstream_breaker_half_open_calls:
+                    self._transition(CLOSED)
+                return
+            if self.state != CLOSED:
+                return
+            self._outcomes.append(good)
+            bad = self._outcomes.count(False)
+            if len(self._outcomes) >= settings.upstream_breaker_min_calls and bad / len(self._outcomes) >= settings.upstream_breaker_failure_rate:
+                self._transition(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            window = list(self._outcomes)
+            return {
+                "state": self.state,
+                "state_value": STATE_VALUES[self.state],
+                "open_for_s": round(time.monotonic() - self.opened_at, 1) if self.opened_at is not None else None,
+                "window_calls": len(window),
+                "window_bad_rate": round(window.count(False) / len(window), 3) if window else None,
+                **self.counters,
+            }
+
+def is_upstream_failure(e: BaseException) -> bool:
+    """
+    Errors that say the upstream is unhealthy. A 4xx (unknown NCT ID, bad query) is a
+    valid answer, not an outage, and is neither counted by the breaker nor masked by a fallback.
+    """
+    if isinstance(e, requests.HTTPError):
+        status = getattr(e.response, "status_code", None)
+        return status is None or status >= 500 or status == 429
+    return isinstance(e, requests.RequestException)
+
+# (kind, age in seconds) of every stale fallback served for the request being handled
+_request_fallbacks: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("request_fallbacks", default=None)
+
+def start_request() -> List[Tuple[str, float]]:
+    fallbacks: List[Tuple[str, float]] = []
+    _request_fallbacks.set(fallbacks)
+    return fallbacks
+
+def serve_stale(kind: str, age: float, error: BaseException) -> None:
+    """
+    Note that a last known good record is being served in place of a failed upstream call
+    """
+    logger.warning("serving stale %s (%.0f s old): %s: %s", kind, age, type(error).__name__, error)
+    stale_fallbacks.inc(kind=kind)
+    fallbacks = _request_fallbacks.get()
+    if fallbacks is not None:
+        fallbacks.append((kind, age))
@@ -1,52 +1,425 @@
 from __future__ import annotations
 
-import requests
-#using request as clintrials is fingerprinting httpx
+import asyncio
+import math
 from datetime import date
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import requests
 
 from app.core.config import settings
-from app.domain.trial import Trial, TrialCard, TrialLocation, TrialContact, TrialOutcome
+from app.core.metrics import stage, timed
+from app.services.breaker import is_upstream_failure, serve_stale
+from app.services.eligibility import EligibilityColumns, EligibilityFilter, filter_stats, healthy_volunteers_flag
+from app.services.http import get_json, run_upstream
+from app.services.mirror import trial_mirror
+from app.services.search_cache import Fetched, normalize_query, search_cache, status_param
+from app.services.singleflight import SingleFlight
+from app.services.trial_cache import CachedTrial, trial_cache
+from app.domain.trial import (
+    LOCATION_PREVIEW_LIMIT,
+    LocationColumns,
+    NearbySite,
+    Trial,
+    TrialCard,
+    TrialCardPage,
+    TrialContact,
+    TrialLocation,
+    TrialLocationPage,
+    TrialOutcome,
+    age_in_years,
+)
+
+trial_flight = SingleFlight("trial")
+
+class TrialNotFound(LookupError):
+    """
+    The trial is not in the local mirror and upstream lookups are disabled
+    """
+
+def _use_mirror() -> bool:
+    return settings.mirror_mode != "off"
 
-def search_trials_raw(condition: str, status: str, limit: int) -> Dict[str, Any]:
+def _mirror_answers(found: bool) -> bool:
     """
-    Search trials from ClinicalTrials.gov by condition
+    Whether a mirror search result stands. In prefer mode a search with no
+    matches goes upstream, since the mirror may be empty or partly ingested.
+    """
+    return found or settings.mirror_mode == "only"
+
+# ClinicalTrials.gov field pieces needed by map_study_to_card
+CARD_FIELDS = (
+    "NCTId",
+    "BriefTitle",
+    "Condition",
+    "OverallStatus",
+    "LastUpdateSubmitDate",
+    "Phase",
+    "StudyType",
+    "LeadSponsorName",
+    "LocationFacility",
+    "LocationStatus",
+    "LocationCity",
+    "LocationState",
+    "LocationCountry",
+    "LocationGeoPoint",
+    "MinimumAge",
+    "MaximumAge",
+    "Sex",
+    "HealthyVolunteers",
+)
+
+def _card_fields() -> Optional[Sequence[str]]:
+    return CARD_FIELDS if settings.search_projection else None
+
+def search_trials_raw(
+    condition: str,
+    status: str,
+    limit: int,
+    page_token: Optional[str] = None,
+    count_total: bool = False,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Search trials from ClinicalTrials.gov by condition.
+    The response carries "nextPageToken" when more pages are available;
+    `fields` restricts the payload to the given field paths.
     """
     params = {"query.cond": condition, "filter.overallStatus": status,"pageSize": limit}
-    resp = requests.get(settings.clinical_trial_base_url, params=params, timeout=20)
-    resp.raise_for_status()
-    return resp.json()
+    if fields:
+        params["fields"] = ",".join(fields)
+    if page_token:
+        params["pageToken"] = page_token
+    if count_total:
+        params["countTotal"] = "true"
+    return get_json(settings.clinical_trial_base_url, params=params)
 
 def search_trials(condition: str, status: str, limit: int) -> List[Trial]:
     """
     Search and normalize trials by condition
     """
+    if _use_mirror():
+        trials = trial_mirror.search_page(condition, status, limit)[0]
+        if _mirror_answers(bool(trials)):
+            return trials
     raw = search_trials_raw(condition, status, limit)
     studies = raw.get("studies", []) or []
     return [map_study_to_trial(s) for s in studies if isinstance(s, dict)]
 
-def search_trial_cards(condition: str, status: str, limit: int, max_locations: int = 20) -> List[TrialCard]:
+def search_trial_cards(
+    condition: str,
+    status: str,
+    limit: int,
+    max_locations: int = 20,
+    eligibility: Optional[EligibilityFilter] = None,
+) -> List[TrialCard]:
+    """
+    Search, normalize and summarize trials by condition.
+    Only the card fields are requested and mapped; the full Trial is never built.
+    With an active eligibility filter, pages are fetched until `limit` trials pass it.
+    """
+    if eligibility is not None and not eligibility.active:
+        eligibility = None
+    if _use_mirror():
+        if eligibility is not None:
+            cards = _search_filtered_cards_mirror(condition, status, limit, max_locations, eligibility)[0]
+        else:
+            cards = [to_trial_card(t, max_locations=max_locations) for t in trial_mirror.search_page(condition, status, limit)[0]]
+        if _mirror_answers(bool(cards)):
+            return cards
+    if not settings.search_cache_enabled:
+        if eligibility is not None:
+            return _search_filtered_cards_upstream(condition, status, limit, max_locations, eligibility)[0]
+        return _search_trial_cards_upstream(condition, status, limit, max_locations)
+    condition, statuses = normalize_query(condition, status)
+    if eligibility is not None:
+        cards = search_cache.get_or_fetch(
+            ("filtered", condition, statuses, max_locations, eligibility),
+            limit,
+            lambda n: Fetched(*_search_filtered_cards_upstream(condition, status_param(statuses), n, max_locations, eligibility)),
+        )
+        return cards[:limit]
+    cards = search_cache.get_or_fetch(
+        ("cards", condition, statuses, max_locations),
+        limit,
+        lambda n: _search_trial_cards_upstream(condition, status_param(statuses), n, max_locations),
+    )
+    return cards[:limit]
+
+def _search_trial_cards_upstream(condition: str, status: Optional[str], limit: int, max_locations: int) -> List[TrialCard]:
+    raw = search_trials_raw(condition, status, limit, fields=_card_fields())
+    return _map_studies(raw.get("studies", []) or [], True, max_locations)
+
+def _filter_page_size(remaining: int, passed: int, fetched: int, previous: int) -> int:
+    """
+    Studies to fetch for the next filtered page: ELIGIBILITY_FIRST_PAGE_FACTOR times
+    the results still wanted at first, then enough for them at the share that has
+    passed so far (double the last page when none has), capped at ELIGIBILITY_PAGE_SIZE
+    """
+    if not fetched:
+        size = math.ceil(remaining * settings.eligibility_first_page_factor)
+    elif passed:
+        size = math.ceil(remaining * fetched / passed * 1.2)
+    else:
+        size = previous * 2
+    return max(1, min(settings.eligibility_page_size, max(size, remaining)))
+
+@timed("filtered_search")
+def _filtered_cards(
+    fetch_page: Callable[[Optional[str], int], Tuple[List[Any], Optional[str]]],
+    columns: Callable[[List[Any]], EligibilityColumns],
+    to_cards: Callable[[List[Any]], List[TrialCard]],
+    limit: int,
+    eligibility: EligibilityFilter,
+) -> Tuple[List[TrialCard], bool]:
+    """
+    Over-fetch pages until `limit` records pass the filter, the results run out or
+    ELIGIBILITY_MAX_PAGES is reached. Pages are sized from `limit` and the pass
+    rate seen so far (_filter_page_size). Each page is filtered in one columnar
+    pass and only the matches are mapped to cards. Returns the cards and whether
+    the results ran out, i.e. whether they are every match.
+    """
+    cards: List[TrialCard] = []
+    token: Optional[str] = None
+    exhausted = False
+    pages = fetched = passed = size = 0
+    while len(cards) < limit and pages < settings.eligibility_max_pages:
+        size = _filter_page_size(limit - len(cards), passed, fetched, size)
+        records, token = fetch_page(token, size)
+        pages += 1
+        fetched += len(records)
+        with stage("filter"):
+            mask = columns(records).mask(eligibility)
+        matches = [r for r, ok in zip(records, mask) if ok]
+        passed += len(matches)
+        cards += to_cards(matches[:limit - len(cards)])
+        if not token:
+            exhausted = True
+            break
+    filter_stats.record(pages, fetched, len(cards), limit)
+    return cards, exhausted
+
+def _search_filtered_cards_upstream(
+    condition: str, status: Optional[str], limit: int, max_locations: int, eligibility: EligibilityFilter
+) -> Tuple[List[TrialCard], bool]:
+    # ClinicalTrials.gov's condition/status query cannot express patient age, sex or healthy-volunteer
+    # constraints, so pages are fetched and filtered here
+    def fetch_page(token: Optional[str], size: int) -> Tuple[List[Any], Optional[str]]:
+        raw = search_trials_raw(condition, status, size, page_token=token, fields=_card_fields())
+        return [s for s in raw.get("studies", []) or [] if isinstance(s, dict)], raw.get("nextPageToken")
+
+    return _filtered_cards(
+        fetch_page,
+        EligibilityColumns.from_studies,
+        lambda studies: _map_studies(studies, True, max_locations),
+        limit,
+        eligibility,
+    )
+
+def _search_filtered_cards_mirror(
+    condition: str, status: Optional[str], limit: int, max_locations: int, eligibility: EligibilityFilter
+) -> Tuple[List[TrialCard], bool]:
+    def fetch_page(token: Optional[str], size: int) -> Tuple[List[Any], Optional[str]]:
+        offset = int(token) if token and token.isdigit() else 0
+        trials, next_offset, _ = trial_mirror.search_page(condition, status, size, offset)
+        return trials, str(next_offset) if next_offset is not None else None
+
+    return _filtered_cards(
+        fetch_page,
+        EligibilityColumns.from_records,
+        lambda trials: [to_trial_card(t, max_locations=max_locations) for t in trials],
+        limit,
+        eligibility,
+    )
+
+async def search_trial_cards_async(
+    condition: str,
+    status: str,
+    limit: int,
+    max_locations: int = 20,
+    eligibility: Optional[EligibilityFilter] = None,
+) -> List[TrialCard]:
     """
-    Search, normalize and summarize trials by condition
+    Non-blocking search_trial_cards for async handlers
     """
-    trials = search_trials(condition, status, limit) 
-    return [to_trial_card(t, max_locations=max_locations) for t in trials]
+    return await run_upstream(search_trial_cards, condition, status, limit, max_locations=max_locations, eligibility=eligibility)
+
+def _map_studies(studies: List[Any], as_cards: bool, max_locations: int) -> List[Union[Trial, TrialCard]]:
+    with stage("map"):
+        if as_cards:
+            return [map_study_to_card(s, max_locations=max_locations) for s in studies if isinstance(s, dict)]
+        return [map_study_to_trial(s) for s in studies if isinstance(s, dict)]
+
+def search_trial_card_page(
+    condition: str,
+    status: str,
+    page_size: int,
+    page_token: Optional[str] = None,
+    max_locations: int = 20,
+) -> TrialCardPage:
+    """
+    One page of trial cards plus the cursor for the next page. Mirror cursors are
+    offsets; in prefer mode a first page without matches (and every page after
+    it) comes from upstream, whose cursors are opaque.
+    """
+    if _use_mirror() and (settings.mirror_mode == "only" or not page_token or page_token.isdigit()):
+        offset = int(page_token) if page_token and page_token.isdigit() else 0
+        trials, next_offset, total = trial_mirror.search_page(condition, status, page_size, offset)
+        if _mirror_answers(bool(trials) or page_token is not None):
+            return TrialCardPage(
+                trials=[to_trial_card(t, max_locations=max_locations) for t in trials],
+                next_page_token=str(next_offset) if next_offset is not None else None,
+                total_count=total,
+            )
+    if not settings.search_cache_enabled:
+        return _search_trial_card_page_upstream(condition, status, page_size, page_token, max_locations)
+    condition, statuses = normalize_query(condition, status)
+    return search_cache.get_or_fetch(
+        ("page", condition, statuses, page_size, page_token, max_locations),
+        0,
+        lambda _: _search_trial_card_page_upstream(condition, status_param(statuses), page_size, page_token, max_locations),
+    )
+
+def _search_trial_card_page_upstream(
+    condition: str, status: Optional[str], page_size: int, page_token: Optional[str], max_locations: int
+) -> TrialCardPage:
+    raw = search_trials_raw(
+        condition, status, page_size, page_token=page_token, count_total=page_token is None, fields=_card_fields()
+    )
+    return TrialCardPage(
+        trials=_map_studies(raw.get("studies", []) or [], True, max_locations),
+        next_page_token=raw.get("nextPageToken"),
+        total_count=raw.get("totalCount"),
+    )
+
+async def search_trial_card_page_async(
+    condition: str,
+    status: str,
+    page_size: int,
+    page_token: Optional[str] = None,
+    max_locations: int = 20,
+) -> TrialCardPage:
+    """
+    Non-blocking search_trial_card_page for async handlers
+    """
+    return await run_upstream(search_trial_card_page, condition, status, page_size, page_token, max_locations)
+
+async def iter_search_results(
+    condition: str,
+    status: str,
+    as_cards: bool = True,
+    max_locations: int = 20,
+) -> AsyncIterator[Union[Trial, TrialCard]]:
+    """
+    Walk every upstream page of a search. The next page is fetched while the
+    current one is mapped and consumed, and at most two pages are held at once.
+    """
+    page_size = settings.export_page_size
+    if _use_mirror():
+        offset: Optional[int] = 0
+        found = False
+        while offset is not None:
+            trials, offset, _ = await run_upstream(trial_mirror.search_page, condition, status, page_size, offset)
+            found = found or bool(trials)
+            for t in trials:
+                yield to_trial_card(t, max_locations=max_locations) if as_cards else t
+        if _mirror_answers(found):
+            return
+
+    fields = _card_fields() if as_cards else None
+    fetch = asyncio.ensure_future(run_upstream(search_trials_raw, condition, status, page_size, fields=fields))
+    try:
+        while fetch is not None:
+            raw = await fetch
+            token = raw.get("nextPageToken")
+            fetch = None
+            if token:
+                fetch = asyncio.ensure_future(
+                    run_upstream(search_trials_raw, condition, status, page_size, page_token=token, fields=fields)
+                )
+            items = await run_upstream(_map_studies, raw.get("studies", []) or [], as_cards, max_locations)
+            del raw
+            for item in items:
+                yield item
+    finally:
+        if fetch is not None:
+            fetch.cancel()
+
+def search_nearby_sites(
+    lat: float, lon: float, radius_km: float, limit: int, status: Optional[Sequence[str]] = None
+) -> List[NearbySite]:
+    """
+    Trial sites nearest to a point, from the local mirror's spatial index
+    """
+    return [
+        NearbySite(distance_km=distance, location=location, trial=to_trial_card(trial, max_locations=0))
+        for distance, trial, location in trial_mirror.nearby(lat, lon, radius_km, limit, status or ())
+    ]
 
 def get_trial_raw(nct_id: str) -> Dict[str, Any]:
     """
     Fetch a single study from ClinicalTrials.gov by NCTID
     """
     url = settings.clinical_trial_base_url + "/" + nct_id
-    resp = requests.get(url, timeout=20)
-    resp.raise_for_status()
-    return resp.json()
+    return get_json(url)
 
-def get_trial(nct_id: str) -> Trial:
+def get_last_update_posted(nct_id: str) -> Optional[date]:
     """
-    Fetch and normalize a single trial by NCTID
+    Fetch only the last update date of a study, used to revalidate cached trials
     """
+    url = settings.clinical_trial_base_url + "/" + nct_id
+    raw = get_json(url, params={"fields": "LastUpdateSubmitDate"})
+    return _parse_date_struct(raw.get("protocolSection", {}) or {}, "statusModule", "lastUpdateSubmitDate")
+
+def get_trial(nct_id: str, coalesce: bool = True) -> Trial:
+    """
+    Fetch and normalize a single trial by NCTID, going through the trial cache.
+    Concurrent misses for the same NCTID share one upstream call (coalesce=False
+    is for callers that already coalesce, like get_trial_async).
+    With the local mirror enabled it is consulted first. When upstream is down
+    (or its circuit open), an expired cached copy is served instead.
+    """
+    if _use_mirror():
+        trial = trial_mirror.get(nct_id)
+        if trial is not None:
+            return trial
+        if settings.mirror_mode == "only":
+            raise TrialNotFound(nct_id)
+
+    cached = None
+    if settings.trial_cache_enabled:
+        cached = trial_cache.get(nct_id)
+        if cached is not None and trial_cache.is_fresh(cached):
+            return cached.trial
+    try:
+        if not coalesce:
+            return _load_trial(nct_id, cached)
+        return trial_flight.do(nct_id, lambda: _load_trial(nct_id, cached))
+    except requests.RequestException as e:
+        if cached is None or not is_upstream_failure(e):
+            raise
+        serve_stale("trial", cached.age(), e)
+        return cached.trial
+
+def _load_trial(nct_id: str, cached: Optional[CachedTrial]) -> Trial:
+    if cached is not None:
+        known = cached.trial.last_update_posted
+        if known is not None and get_last_update_posted(nct_id) == known:
+            trial_cache.touch(cached)
+            return cached.trial
+
     raw = get_trial_raw(nct_id)
-    return map_study_to_trial(raw)
+    with stage("map"):
+        trial = map_study_to_trial(raw)
+    if settings.trial_cache_enabled:
+        trial_cache.put(trial)
+    return trial
+
+async def get_trial_async(nct_id: str) -> Trial:
+    """
+    Non-blocking get_trial for async handlers
+    """
+    return await trial_flight.do_async(nct_id, lambda: run_upstream(get_trial, nct_id, coalesce=False))
 
 def _get(d: Dict[str, Any], *path: str, default=None):
     cur: Any = d
@@ -80,6 +453,49 @@ def _parse_date_struct(study: Dict[str, Any], *path: str) -> Optional[date]:
     return None
 
 
+def _phase(design_mod: Dict[str, Any]) -> Optional[str]:
+    phases = design_mod.get("phases")
+    phase = None
+    if isinstance(phases, list) and phases:
+        phase = phases[0]
+    if phase == "NA":
+        phase = None
+    return phase
+
+def _facility(loc: Dict[str, Any]) -> Optional[str]:
+    fac = loc.get("facility")
+    if isinstance(fac, dict):
+        return fac.get("name")
+    return fac if isinstance(fac, str) else None
+
+def _map_location(loc: Dict[str, Any]) -> TrialLocation:
+    lat = lon = None
+    geo = loc.get("geoPoint")
+    if isinstance(geo, dict):
+        lat, lon = geo.get("lat"), geo.get("lon")
+
+    return TrialLocation(
+        facility=_facility(loc),
+        city=loc.get("city"),
+        state=loc.get("state"),
+        country=loc.get("country"),
+        status=loc.get("status"),
+        lat=lat,
+        lon=lon,
+    )
+
+def _location_columns(locs: List[Dict[str, Any]]) -> LocationColumns:
+    geo = [loc.get("geoPoint") if isinstance(loc.get("geoPoint"), dict) else {} for loc in locs]
+    return LocationColumns(
+        facility=[_facility(loc) for loc in locs],
+        status=[loc.get("status") for loc in locs],
+        city=[loc.get("city") for loc in locs],
+        state=[loc.get("state") for loc in locs],
+        country=[loc.get("country") for loc in locs],
+        lat=[g.get("lat") for g in geo],
+        lon=[g.get("lon") for g in geo],
+    )
+
 def map_study_to_trial(study: Dict[str, Any]) -> Trial:
     """
     Convert a ClinicalTrials.gov study payload into a Trial domain model.
@@ -110,12 +526,7 @@ def map_study_to_trial(study: Dict[str, Any]) -> Trial:
     primary_completion_date = _parse_date_struct(proto, "statusModule", "primaryCompletionDateStruct")
     completion_date = _parse_date_struct(proto, "statusModule", "completionDateStruct")
     last_update_posted = _parse_date_struct(proto, "statusModule", "lastUpdateSubmitDate")
-    phases = design_mod.get("phases")
-    phase = None
-    if isinstance(phases, list) and phases:
-        phase = phases[0]
-    if phase == "NA":
-        phase = None
+    phase = _phase(design_mod)
     primary_purpose = design_mod.get("primaryPurpose")
     enrollment_count = None
     enrollment = design_mod.get("enrollmentInfo")
@@ -129,16 +540,7 @@ def map_study_to_trial(study: Dict[str, Any]) -> Trial:
     max_age = elig_mod.get("maximumAge")
     sex = elig_mod.get("sex")
     eligibility_criteria = elig_mod.get("eligibilityCriteria")
-    healthy_volunteers = None
-    hv = elig_mod.get("healthyVolunteers")
-    if isinstance(hv, bool):
-        healthy_volunteers = hv
-    elif isinstance(hv, str):
-        hv_upper = hv.upper()
-        if "ACCEPT" in hv_upper or hv_upper in {"YES", "Y", "TRUE"}:
-            healthy_volunteers = True
-        elif hv_upper in {"NO", "N", "FALSE"}:
-            healthy_volunteers = False
+    healthy_volunteers = healthy_volunteers_flag(elig_mod.get("healthyVolunteers"))
     interventions_list: Optional[List[str]] = None
     interventions = arms_mod.get("interventions")
     if isinstance(interventions, list) and interventions:
@@ -170,30 +572,13 @@ def map_study_to_trial(study: Dict[str, Any]) -> Trial:
                 )
             )
         primary_outcomes = out_objs or None
-    locations: Optional[List[TrialLocation]] = None
+    # sites stay columnar; only the preview becomes TrialLocation objects
+    sites: Optional[LocationColumns] = None
     locs = contacts_mod.get("locations")
     if isinstance(locs, list) and locs:
-        loc_objs: List[TrialLocation] = []
-        for loc in locs:
-            if not isinstance(loc, dict):
-                continue
-            facility = None
-            fac = loc.get("facility")
-            if isinstance(fac, dict):
-                facility = fac.get("name")
-            elif isinstance(fac, str):
-                facility = fac
-
-            loc_objs.append(
-                TrialLocation(
-                    facility=facility,
-                    city=loc.get("city"),
-                    state=loc.get("state"),
-                    country=loc.get("country"),
-                    status=loc.get("status")
-                )
-            )
-        locations = loc_objs or None
+        loc_dicts = [loc for loc in locs if isinstance(loc, dict)]
+        if loc_dicts:
+            sites = _location_columns(loc_dicts)
     contacts: Optional[List[TrialContact]] = None
     central = contacts_mod.get("centralContacts")
     if isinstance(central, list) and central:
@@ -237,20 +622,22 @@ def map_study_to_trial(study: Dict[str, Any]) -> Trial:
         enrollment_count=enrollment_count,
         min_age=min_age,
         max_age=max_age,
+        min_age_years=age_in_years(min_age),
+        max_age_years=age_in_years(max_age),
         sex=sex,
         healthy_volunteers=healthy_volunteers,
         eligibility_criteria=eligibility_criteria,
         interventions=interventions_list,
         primary_outcomes=primary_outcomes,
-        locations=locations,
+        locations=sites.rows(range(min(len(sites), LOCATION_PREVIEW_LIMIT))) if sites else None,
+        location_count=len(sites) if sites else None,
         contacts=contacts,
         lead_sponsor=lead_sponsor,
         collaborators=collaborators,
+        sites=sites,
     )
 
 def to_trial_card(trial: Trial, max_locations: int = 5) -> TrialCard:
-    locs = trial.locations or []
-    loc_preview = locs[:max_locations] if locs else None
     return TrialCard(
         nct_id=trial.nct_id,
         brief_title=trial.brief_title,
@@ -260,7 +647,85 @@ def to_trial_card(trial: Trial, max_locations: int = 5) -> TrialCard:
         study_type=trial.study_type,
         lead_sponsor=trial.lead_sponsor,
         last_update_posted=trial.last_update_posted,
-        locations=loc_preview,
-        location_count=len(locs) if trial.locations is not None else None,
+        locations=trial.location_preview(max_locations),
+        location_count=trial.location_count,
+        min_age_years=trial.min_age_years,
+        max_age_years=trial.max_age_years,
+        sex=trial.sex,
+        healthy_volunteers=trial.healthy_volunteers,
         url=trial.url,
+    )
+
+def trial_location_page(
+    trial: Trial,
+    countries: Sequence[str] = (),
+    states: Sequence[str] = (),
+    statuses: Sequence[str] = (),
+    page_size: int = 50,
+    page_token: Optional[str] = None,
+) -> TrialLocationPage:
+    """
+    One page of a trial's sites matching the filters; the cursor is an offset into the matches
+    """
+    offset = int(page_token) if page_token and page_token.isdigit() else 0
+    if trial.sites is None:
+        return TrialLocationPage(nct_id=trial.nct_id, locations=[], total_count=0)
+    matches = trial.sites.select(countries, states, statuses)
+    end = offset + page_size
+    return TrialLocationPage(
+        nct_id=trial.nct_id,
+        locations=trial.sites.rows(matches[offset:end]),
+        total_count=len(matches),
+        next_page_token=str(end) if end < len(matches) else None,
+    )
+
+def map_study_to_card(study: Dict[str, Any], max_locations: int = 5) -> TrialCard:
+    """
+    Build a TrialCard straight from a (possibly projected) study payload,
+    without materializing the full Trial. Equivalent to
+    to_trial_card(map_study_to_trial(study), max_locations).
+    """
+    proto = study.get("protocolSection", {}) or {}
+    ident = proto.get("identificationModule", {}) or {}
+    status_mod = proto.get("statusModule", {}) or {}
+    cond_mod = proto.get("conditionsModule", {}) or {}
+    design_mod = proto.get("designModule", {}) or {}
+    contacts_mod = proto.get("contactsLocationsModule", {}) or {}
+    sponsor_mod = proto.get("sponsorCollaboratorsModule", {}) or {}
+    elig_mod = proto.get("eligibilityModule", {}) or {}
+    nct_id = ident.get("nctId")
+    if not nct_id:
+        raise ValueError("Missing nctId in study.identificationModule")
+
+    conditions = cond_mod.get("conditions") or []
+    if not isinstance(conditions, list):
+        conditions = []
+    location_count = None
+    loc_preview = None
+    locs = contacts_mod.get("locations")
+    if isinstance(locs, list) and locs:
+        loc_dicts = [loc for loc in locs if isinstance(loc, dict)]
+        if loc_dicts:
+            location_count = len(loc_dicts)
+            loc_preview = [_map_location(loc) for loc in loc_dicts[:max_locations]]
+    lead_sponsor = None
+    ls = sponsor_mod.get("leadSponsor")
+    if isinstance(ls, dict):
+        lead_sponsor = ls.get("name")
+    return TrialCard(
+        nct_id=nct_id,
+        brief_title=ident.get("briefTitle") or "",
+        conditions=conditions,
+        status=status_mod.get("overallStatus"),
+        phase=_phase(design_mod),
+        study_type=design_mod.get("studyType"),
+        lead_sponsor=lead_sponsor,
+        last_update_posted=_parse_date_struct(proto, "statusModule", "lastUpdateSubmitDate"),
+        locations=loc_preview,
+        location_count=location_count,
+        min_age_years=age_in_years(elig_mod.get("minimumAge")),
+        max_age_years=age_in_years(elig_mod.get("maximumAge")),
+        sex=elig_mod.get("sex"),
+        healthy_volunteers=healthy_volunteers_flag(elig_mod.get("healthyVolunteers")),
+        url=settings.clinical_trial_get_study_url + "/" + nct_id,
     )
\ No newline at end of file
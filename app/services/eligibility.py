@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from app.domain.trial import Trial, TrialCard, age_in_years
+
+def healthy_volunteers_flag(value: Any) -> Optional[bool]:
+    """
+    eligibilityModule.healthyVolunteers as a bool; older records spell it "Accepts Healthy Volunteers" / "No"
+    """
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        upper = value.upper()
+        if "ACCEPT" in upper or upper in {"YES", "Y", "TRUE"}:
+            return True
+        if upper in {"NO", "N", "FALSE"}:
+            return False
+    return None
+
+@dataclass(frozen=True)
+class EligibilityFilter:
+    """
+    Patient-side search filters: age in years, sex (FEMALE / MALE) and whether
+    the trial must (True) or must not (False) accept healthy volunteers
+    """
+    age: Optional[float] = None
+    sex: Optional[str] = None
+    healthy_volunteers: Optional[bool] = None
+
+    @property
+    def active(self) -> bool:
+        return self.age is not None or self.sex is not None or self.healthy_volunteers is not None
+
+@dataclass
+class EligibilityColumns:
+    """
+    Eligibility fields of a page of studies, one list per field, so a filter is
+    evaluated column by column over the whole page
+    """
+    min_age: List[Optional[float]]
+    max_age: List[Optional[float]]
+    sex: List[Optional[str]]
+    healthy_volunteers: List[Optional[bool]]
+
+    @classmethod
+    def from_studies(cls, studies: Sequence[Dict[str, Any]]) -> "EligibilityColumns":
+        """
+        Columns straight from (possibly projected) study payloads, before anything is mapped
+        """
+        mods = [(s.get("protocolSection") or {}).get("eligibilityModule") or {} for s in studies]
+        return cls(
+            min_age=[age_in_years(m.get("minimumAge")) for m in mods],
+            max_age=[age_in_years(m.get("maximumAge")) for m in mods],
+            sex=[m.get("sex") for m in mods],
+            healthy_volunteers=[healthy_volunteers_flag(m.get("healthyVolunteers")) for m in mods],
+        )
+
+    @classmethod
+    def from_records(cls, records: Sequence[Union[Trial, TrialCard]]) -> "EligibilityColumns":
+        return cls(
+            min_age=[r.min_age_years for r in records],
+            max_age=[r.max_age_years for r in records],
+            sex=[r.sex for r in records],
+            healthy_volunteers=[r.healthy_volunteers for r in records],
+        )
+
+    def mask(self, flt: EligibilityFilter) -> List[bool]:
+        """
+        Whether each row passes the filter. A missing age bound or sex does not
+        exclude a trial; an unknown healthy-volunteer flag does when that filter is set.
+        """
+        checks: List[List[bool]] = []
+        if flt.age is not None:
+            age = flt.age
+            checks.append([(lo is None or lo <= age) and (hi is None or age <= hi) for lo, hi in zip(self.min_age, self.max_age)])
+        if flt.sex is not None:
+            wanted = flt.sex.upper()
+            checks.append([s is None or s.upper() in ("ALL", wanted) for s in self.sex])
+        if flt.healthy_volunteers is not None:
+            checks.append([hv is flt.healthy_volunteers for hv in self.healthy_volunteers])
+        if not checks:
+            return [True] * len(self.sex)
+        return [all(row) for row in zip(*checks)]
+
+class FilterStats:
+    """
+    Counters for filtered searches: how many studies were fetched to find the ones returned
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.pages = 0
+        self.fetched = 0
+        self.returned = 0
+        self.short = 0
+
+    def record(self, pages: int, fetched: int, returned: int, limit: int) -> None:
+        with self._lock:
+            self.searches += 1
+            self.pages += pages
+            self.fetched += fetched
+            self.returned += returned
+            self.short += returned < limit
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "searches": self.searches,
+                "pages": self.pages,
+                "fetched": self.fetched,
+                "returned": self.returned,
+                # searches that ran out of results or pages before reaching `limit`
+                "short": self.short,
+            }
+        out["pages_per_search"] = round(out["pages"] / out["searches"], 3) if out["searches"] else None
+        out["wasted_fetch_ratio"] = round(1 - out["returned"] / out["fetched"], 4) if out["fetched"] else None
+        return out
+
+filter_stats = FilterStats()
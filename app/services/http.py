@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+#using request as clintrials is fingerprinting httpx
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+from app.core.metrics import stage, upstream_response_bytes
+from app.services.breaker import CircuitBreaker, is_upstream_failure
+
+T = TypeVar("T")
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_executor: Optional[ThreadPoolExecutor] = None
+_host_limits: Dict[str, threading.BoundedSemaphore] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_session() -> requests.Session:
+    """
+    Shared keep-alive session; connections are pooled per host
+    """
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.upstream_pool_connections,
+                    pool_maxsize=settings.upstream_pool_maxsize,
+                    pool_block=True,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    sem = _host_limits.get(host)
+    if sem is None:
+        with _lock:
+            sem = _host_limits.setdefault(host, threading.BoundedSemaphore(settings.upstream_max_per_host))
+    return sem
+
+def _breaker(url: str) -> CircuitBreaker:
+    host = urlsplit(url).netloc
+    breaker = _breakers.get(host)
+    if breaker is None:
+        with _lock:
+            breaker = _breakers.setdefault(host, CircuitBreaker(host))
+    return breaker
+
+def breaker_stats() -> Dict[str, Dict[str, Any]]:
+    return {host: breaker.stats() for host, breaker in list(_breakers.items())}
+
+def get_json(url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+    """
+    GET a JSON document over the pooled session, behind the host's circuit breaker
+    (raises CircuitOpen at once while it is open)
+    """
+    breaker = _breaker(url)
+    breaker.before()
+    started = time.perf_counter()
+    try:
+        data = _get_json(url, params)
+    except Exception as e:
+        breaker.record(not is_upstream_failure(e), time.perf_counter() - started)
+        raise
+    breaker.record(True, time.perf_counter() - started)
+    return data
+
+def _get_json(url: str, params: Optional[Dict[str, Any]]) -> Any:
+    """
+    The GET itself, bounded by the per-host concurrency limit
+    """
+    sem = _host_limit(url)
+    if not sem.acquire(timeout=settings.upstream_read_timeout):
+        raise requests.ConnectionError(f"Upstream concurrency limit reached for {urlsplit(url).netloc}")
+    try:
+        with stage("upstream"):
+            resp = get_session().get(
+                url,
+                params=params,
+                timeout=(settings.upstream_connect_timeout, settings.upstream_read_timeout),
+            )
+    finally:
+        sem.release()
+    upstream_response_bytes.observe(len(resp.content))
+    resp.raise_for_status()
+    with stage("upstream_decode"):
+        return resp.json()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.upstream_pool_maxsize,
+                    thread_name_prefix="upstream",
+                )
+    return _executor
+
+async def run_upstream(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Await a blocking upstream call on the dedicated upstream thread pool,
+    keeping the event loop free while the request is in flight.
+    """
+    loop = asyncio.get_running_loop()
+    # carry the request context (stage timings) into the worker thread
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_get_executor(), functools.partial(ctx.run, fn, *args, **kwargs))
+
+def submit_upstream(fn: Callable[..., Any], *args: Any) -> None:
+    """
+    Run a blocking upstream call in the background on the upstream thread pool
+    """
+    _get_executor().submit(fn, *args)
+
+def warm_upstream() -> None:
+    """
+    Build the session and worker pool and open a keep-alive connection to
+    ClinicalTrials.gov, so the first request does not pay for the TCP / TLS handshake
+    """
+    _get_executor()
+    _host_limit(settings.clinical_trial_base_url)
+    timeout = (settings.upstream_connect_timeout, settings.upstream_connect_timeout)
+    get_session().head(settings.clinical_trial_base_url, timeout=timeout)
+
+def close_upstream() -> None:
+    """
+    Release pooled connections and worker threads
+    """
+    global _session, _executor
+    with _lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
\ No newline at end of file
@@ -0,0 +1,318 @@
+from __future__ import annotations
+
+import heapq
+import json
+import re
+import time
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.domain.trial import Trial, TrialLocation
+from app.services.geo import bounding_boxes, haversine_km
+from app.services.http import get_json
+from app.services.sqlite import SQLiteFile
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    nct_id TEXT NOT NULL UNIQUE,
+    status TEXT,
+    last_update_posted TEXT,
+    body TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trials_status ON trials (status);
+CREATE VIRTUAL TABLE IF NOT EXISTS trials_fts USING fts5(text);
+CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS sites (
+    id INTEGER PRIMARY KEY,
+    trial_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    status TEXT,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sites_trial ON sites (trial_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS sites_rtree USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+
+# first radius tried by nearby(); it grows until enough sites are found
+_NEARBY_START_KM = 5.0
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+def _match_query(condition: str) -> Optional[str]:
+    words = _WORD.findall(condition or "")
+    return " ".join(f'"{w}"' for w in words) or None
+
+def _search_text(trial: Trial) -> str:
+    parts: List[str] = [trial.brief_title, trial.official_title or ""]
+    parts += trial.conditions or []
+    parts += trial.keywords or []
+    return " ".join(parts)
+
+def _statuses(status: Any) -> List[str]:
+    if not status:
+        return []
+    if isinstance(status, str):
+        return [s for s in status.split(",") if s]
+    return list(status)
+
+class TrialMirror:
+    """
+    Local, indexed copy of mapped ClinicalTrials.gov records.
+
+    Trials are stored as Trial JSON keyed by NCT ID, with an FTS5 index over
+    titles, conditions and keywords for condition search. Data arrives either
+    from a bulk JSON download (ingest_path) or by paging the API for studies
+    updated since the last checkpoint (sync).
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._file = SQLiteFile(path, _SCHEMA)
+
+    def _db(self):
+        db = self._file.conn()
+        if db is None:
+            raise RuntimeError("Trial mirror has no path configured")
+        return db
+
+    def warm(self) -> None:
+        """
+        Open the SQLite file before the first lookup
+        """
+        self._db()
+
+    @timed("mirror")
+    def get(self, nct_id: str) -> Optional[Trial]:
+        row = self._db().execute("SELECT body FROM trials WHERE nct_id = ?", (nct_id,)).fetchone()
+        return Trial.model_validate_json(row[0]) if row else None
+
+    @timed("mirror")
+    def search_page(
+        self, condition: str, status: Any, limit: int, offset: int = 0
+    ) -> Tuple[List[Trial], Optional[int], int]:
+        """
+        Trials matching every word of `condition`, best match first.
+        Returns the page, the offset of the next page (or None) and the total match count.
+        """
+        match = _match_query(condition)
+        if match is None:
+            return [], None, 0
+        statuses = _statuses(status)
+        # materialize the full-text matches first so SQLite never re-runs MATCH per row
+        matches = "WITH m AS MATERIALIZED (SELECT rowid AS id, rank FROM trials_fts WHERE trials_fts MATCH ?) "
+        where = ""
+        params: List[Any] = [match]
+        if statuses:
+            where = f" WHERE t.status IN ({','.join('?' * len(statuses))})"
+            params += statuses
+        db = self._db()
+        total = db.execute(f"{matches}SELECT COUNT(*) FROM m JOIN trials t ON t.id = m.id{where}", params).fetchone()[0]
+        rows = db.execute(
+            f"{matches}SELECT t.body FROM m JOIN trials t ON t.id = m.id{where} ORDER BY m.rank LIMIT ? OFFSET ?",
+            params + [limit, offset],
+        ).fetchall()
+        trials = [Trial.model_validate_json(r[0]) for r in rows]
+        next_offset = offset + len(trials) if offset + len(trials) < total else None
+        return trials, next_offset, total
+
+    def upsert(self, trials: Iterable[Trial]) -> int:
+        db = self._db()
+        count = 0
+        now = time.time()
+        with db:
+            db.execute("BEGIN")
+            for trial in trials:
+                row_id = db.execute(
+                    "INSERT INTO trials (nct_id, status, last_update_posted, body, synced_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(nct_id) DO UPDATE SET status = excluded.status, "
+                    "last_update_posted = excluded.last_update_posted, body = excluded.body, synced_at = excluded.synced_at "
+                    "RETURNING id",
+                    (
+                        trial.nct_id,
+                        trial.status,
+                        trial.last_update_posted.isoformat() if trial.last_update_posted else None,
+                        trial.model_dump_json(),
+                        now,
+                    ),
+                ).fetchone()[0]
+                db.execute("DELETE FROM trials_fts WHERE rowid = ?", (row_id,))
+                db.execute("INSERT INTO trials_fts (rowid, text) VALUES (?, ?)", (row_id, _search_text(trial)))
+                self._index_sites(db, row_id, trial)
+                count += 1
+        return count
+
+    @staticmethod
+    def _index_sites(db, row_id: int, trial: Trial) -> None:
+        db.execute("DELETE FROM sites_rtree WHERE id IN (SELECT id FROM sites WHERE trial_id = ?)", (row_id,))
+        db.execute("DELETE FROM sites WHERE trial_id = ?", (row_id,))
+        if trial.sites is None:
+            return
+        for position, (status, lat, lon) in enumerate(zip(trial.sites.status, trial.sites.lat, trial.sites.lon)):
+            if lat is None or lon is None:
+                continue
+            site_id = db.execute(
+                "INSERT INTO sites (trial_id, position, status, lat, lon) VALUES (?, ?, ?, ?, ?)",
+                (row_id, position, status, lat, lon),
+            ).lastrowid
+            db.execute(
+                "INSERT INTO sites_rtree (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                (site_id, lat, lat, lon, lon),
+            )
+
+    @timed("mirror")
+    def nearby(
+        self, lat: float, lon: float, radius_km: float, limit: int, statuses: Sequence[str] = ()
+    ) -> List[Tuple[float, Trial, TrialLocation]]:
+        """
+        The `limit` sites closest to (lat, lon) within radius_km, nearest first, as
+        (distance_km, trial, location). Candidates come from the R*Tree by bounding
+        box; the box starts small and grows so dense areas stay cheap.
+        """
+        db = self._db()
+        where = ""
+        if statuses:
+            where = f" AND s.status IN ({','.join('?' * len(statuses))})"
+        radius = min(radius_km, _NEARBY_START_KM)
+        while True:
+            hits: List[Tuple[float, int, int]] = []
+            for box in bounding_boxes(lat, lon, radius):
+                rows = db.execute(
+                    "SELECT s.trial_id, s.position, s.lat, s.lon FROM sites_rtree r JOIN sites s ON s.id = r.id "
+                    "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?" + where,
+                    (*box, *statuses),
+                )
+                for trial_id, position, site_lat, site_lon in rows:
+                    distance = haversine_km(lat, lon, site_lat, site_lon)
+                    if distance <= radius:
+                        hits.append((distance, trial_id, position))
+            if len(hits) >= limit or radius >= radius_km:
+                break
+            radius = min(radius_km, radius * 4)
+
+        nearest = heapq.nsmallest(limit, hits)
+        trial_ids = sorted({trial_id for _, trial_id, _ in nearest})
+        trials: Dict[int, Trial] = {}
+        if trial_ids:
+            rows = db.execute(f"SELECT id, body FROM trials WHERE id IN ({','.join('?' * len(trial_ids))})", trial_ids)
+            trials = {row[0]: Trial.model_validate_json(row[1]) for row in rows}
+        out = []
+        for distance, trial_id, position in nearest:
+            trial = trials.get(trial_id)
+            if trial is not None and trial.sites is not None and position < len(trial.sites):
+                out.append((round(distance, 3), trial, trial.sites.row(position)))
+        return out
+
+    def upsert_studies(self, studies: Iterable[Dict[str, Any]], batch_size: int = 500) -> Dict[str, int]:
+        """
+        Map raw study payloads and store them in batches; unmappable studies are skipped
+        """
+        from app.services.clinicaltrials import map_study_to_trial
+
+        stored = skipped = 0
+        batch: List[Trial] = []
+        for study in studies:
+            try:
+                batch.append(map_study_to_trial(study))
+            except (ValueError, TypeError, AttributeError):
+                skipped += 1
+                continue
+            if len(batch) >= batch_size:
+                stored += self.upsert(batch)
+                batch = []
+        if batch:
+            stored += self.upsert(batch)
+        return {"stored": stored, "skipped": skipped}
+
+    def ingest_path(self, path: str) -> Dict[str, int]:
+        """
+        Load a bulk download: the ClinicalTrials.gov JSON zip, a directory of study
+        JSON files, or a single JSON file holding a study, a list or {"studies": [...]}
+        """
+        return self.upsert_studies(_iter_bulk(Path(path)))
+
+    def checkpoint(self) -> Optional[str]:
+        row = self._db().execute("SELECT value FROM sync_state WHERE key = 'last_sync'").fetchone()
+        return row[0] if row else None
+
+    def _set_checkpoint(self, value: str) -> None:
+        self._db().execute(
+            "INSERT INTO sync_state (key, value) VALUES ('last_sync', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (value,),
+        )
+
+    def sync(self, since: Optional[str] = None, condition: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Page through studies updated since `since` (default: the last checkpoint; a
+        full pull when there is none) and upsert them. The checkpoint advances to the
+        date the sync started, so the next run re-reads at most one day of overlap.
+        """
+        started = datetime.now(timezone.utc)
+        since = since or self.checkpoint()
+        params: Dict[str, Any] = {"pageSize": settings.mirror_sync_page_size, "sort": "LastUpdatePostDate"}
+        if since:
+            params["filter.advanced"] = f"AREA[LastUpdatePostDate]RANGE[{since},MAX]"
+        condition = condition or settings.mirror_sync_condition
+        if condition:
+            params["query.cond"] = condition
+
+        totals = {"pages": 0, "stored": 0, "skipped": 0}
+        for studies in _iter_pages(params):
+            result = self.upsert_studies(studies)
+            totals["pages"] += 1
+            totals["stored"] += result["stored"]
+            totals["skipped"] += result["skipped"]
+
+        self._set_checkpoint(started.date().isoformat())
+        return {
+            "since": since,
+            "checkpoint": started.date().isoformat(),
+            "elapsed_s": round((datetime.now(timezone.utc) - started).total_seconds(), 3),
+            **totals,
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._db()
+        return {
+            "trials": db.execute("SELECT COUNT(*) FROM trials").fetchone()[0],
+            "sites": db.execute("SELECT COUNT(*) FROM sites").fetchone()[0],
+            "last_sync": self.checkpoint(),
+        }
+
+def _iter_pages(params: Dict[str, Any]) -> Iterator[Sequence[Dict[str, Any]]]:
+    token = None
+    while True:
+        page_params = dict(params, pageToken=token) if token else params
+        raw = get_json(settings.clinical_trial_base_url, params=page_params)
+        yield [s for s in raw.get("studies", []) or [] if isinstance(s, dict)]
+        token = raw.get("nextPageToken")
+        if not token:
+            return
+
+def _studies_in(doc: Any) -> Iterator[Dict[str, Any]]:
+    if isinstance(doc, dict) and isinstance(doc.get("studies"), list):
+        doc = doc["studies"]
+    if isinstance(doc, list):
+        yield from (s for s in doc if isinstance(s, dict))
+    elif isinstance(doc, dict):
+        yield doc
+
+def _iter_bulk(path: Path) -> Iterator[Dict[str, Any]]:
+    if path.is_dir():
+        for child in sorted(path.rglob("*.json")):
+            yield from _studies_in(json.loads(child.read_text(encoding="utf-8")))
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    yield from _studies_in(json.loads(archive.read(name)))
+    else:
+        yield from _studies_in(json.loads(path.read_text(encoding="utf-8")))
+
+trial_mirror = TrialMirror(settings.mirror_path)
\ No newline at end of file
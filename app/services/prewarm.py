@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.domain.trial import Trial
+from app.llm.budget import BudgetReport, estimate_tokens
+from app.llm.health import llm_health
+from app.llm.prompts import build_summary_prompt
+from app.services.batch import RequestSpacer
+from app.services.clinicaltrials import search_trials
+from app.services.http import run_upstream
+from app.services.summaries import generate_summary, summary_request
+from app.services.summary_store import SummaryKey, summary_store
+from app.services.trial_cache import trial_cache
+
+logger = logging.getLogger(__name__)
+
+QueueItem = Tuple[SummaryKey, Dict[str, Any], BudgetReport]
+
+def _split(value: str) -> List[str]:
+    return [part.strip() for part in (value or "").split(",") if part.strip()]
+
+def _interleave(groups: Sequence[List[Trial]]) -> List[Trial]:
+    """
+    Round-robin over per-condition results so no single condition takes the whole budget
+    """
+    out: List[Trial] = []
+    for i in range(max((len(g) for g in groups), default=0)):
+        out += [g[i] for g in groups if i < len(g)]
+    return out
+
+class SummaryPrewarmer:
+    """
+    Background job that keeps summaries warm for the trials users ask about most.
+
+    Each run searches PREWARM_CONDITIONS x PREWARM_STATUSES and queues every trial
+    whose current summary key is not in the store yet: new trials, trials whose
+    content changed, and everything after a model or PROMPT_VERSION change.
+    Summaries are then generated in relevance order until PREWARM_MAX_SUMMARIES or
+    the estimated PREWARM_TOKEN_BUDGET is spent; the rest waits for the next run.
+    LLM calls are spaced to PREWARM_LLM_REQUESTS_PER_MINUTE on top of the shared
+    client limits, leaving most of the capacity to user requests.
+    """
+
+    def __init__(self):
+        self.runs = 0
+        self.running = False
+        self.progress: Dict[str, Any] = {}
+        self.last_run: Optional[Dict[str, Any]] = None
+        self.next_run_at: Optional[datetime] = None
+        self._queue: Deque[QueueItem] = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._manual: Optional[asyncio.Task] = None
+
+    def conditions(self) -> List[str]:
+        return _split(settings.prewarm_conditions)
+
+    async def _collect(self, conditions: List[str], progress: Dict[str, Any]) -> List[Trial]:
+        statuses = ",".join(_split(settings.prewarm_statuses)) or None
+        groups: List[List[Trial]] = []
+        for condition in conditions:
+            try:
+                groups.append(await run_upstream(search_trials, condition, statuses, settings.prewarm_trials_per_condition))
+            except Exception as e:
+                progress["search_failed"] += 1
+                logger.warning("prewarm: search for %r failed: %s", condition, e)
+            progress["conditions_done"] += 1
+        return _interleave(groups)
+
+    def _plan(self, trials: List[Trial], progress: Dict[str, Any]) -> None:
+        """
+        Queue the trials without a current summary, within the run's count and token budget
+        """
+        seen = set()
+        for trial in trials:
+            if trial.nct_id in seen:
+                continue
+            seen.add(trial.nct_id)
+            progress["trials_scanned"] += 1
+            if settings.trial_cache_enabled:
+                trial_cache.put(trial)
+            key, payload, report = summary_request(trial)
+            if summary_store.contains(key):
+                progress["already_warm"] += 1
+                continue
+            cost = estimate_tokens(build_summary_prompt(payload)) + settings.llm_completion_tokens_estimate
+            if len(self._queue) >= settings.prewarm_max_summaries or progress["tokens_planned"] + cost > settings.prewarm_token_budget:
+                progress["deferred"] += 1
+                continue
+            progress["tokens_planned"] += cost
+            self._queue.append((key, payload, report))
+        progress["queued"] = len(self._queue)
+
+    async def _drain(self, progress: Dict[str, Any]) -> None:
+        spacer = RequestSpacer(settings.prewarm_llm_requests_per_minute)
+
+        async def worker() -> None:
+            while self._queue:
+                key, payload, report = self._queue.popleft()
+                await spacer.wait()
+                try:
+                    await asyncio.to_thread(generate_summary, key, payload, report, True)
+                except Exception as e:
+                    progress["failed"] += 1
+                    logger.warning("prewarm: summary for %s failed: %s: %s", key.nct_id, type(e).__name__, e)
+                else:
+                    progress["generated"] += 1
+
+        await asyncio.gather(*(worker() for _ in range(max(1, settings.prewarm_concurrency))))
+
+    async def run_once(self, conditions: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        One pre-warm pass; returns its progress counters
+        """
+        if self.running:
+            return self.progress
+        conditions = conditions or self.conditions()
+        self.running = True
+        progress = self.progress = {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "finished_at": None,
+            "conditions": len(conditions),
+            "conditions_done": 0,
+            "search_failed": 0,
+            "trials_scanned": 0,
+            "already_warm": 0,
+            "queued": 0,
+            "deferred": 0,
+            "generated": 0,
+            "failed": 0,
+            "tokens_planned": 0,
+            "token_budget": settings.prewarm_token_budget,
+        }
+        try:
+            trials = await self._collect(conditions, progress)
+            await asyncio.to_thread(self._plan, trials, progress)
+            if self._queue and not llm_health.ready():
+                logger.warning("prewarm: LLM is down, skipping %d summaries until the next run", len(self._queue))
+                progress["deferred"] += len(self._queue)
+                self._queue.clear()
+            await self._drain(progress)
+        finally:
+            self._queue.clear()
+            self.running = False
+            self.runs += 1
+            progress["finished_at"] = datetime.now(timezone.utc).isoformat()
+            self.last_run = progress
+        logger.info(
+            "prewarm: %d trials scanned, %d already warm, %d generated, %d failed, %d deferred",
+            progress["trials_scanned"], progress["already_warm"], progress["generated"], progress["failed"], progress["deferred"],
+        )
+        return progress
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.run_once()
+            except Exception:
+                logger.exception("prewarm run failed")
+            self.next_run_at = datetime.now(timezone.utc) + timedelta(seconds=settings.prewarm_interval)
+            await asyncio.sleep(settings.prewarm_interval)
+
+    def start(self) -> None:
+        if self._task is None and settings.prewarm_enabled and self.conditions():
+            self._task = asyncio.create_task(self.run_forever())
+
+    def trigger(self, conditions: Optional[List[str]] = None) -> bool:
+        """
+        Start a run now in the background; False when one is already in progress
+        """
+        if self.running:
+            return False
+        self._manual = asyncio.create_task(self.run_once(conditions))
+        return True
+
+    async def stop(self) -> None:
+        for task in (self._task, self._manual):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._manual = None
+
+    def status(self) -> Dict[str, Any]:
+        store = summary_store.stats()
+        return {
+            "enabled": settings.prewarm_enabled,
+            "conditions": self.conditions(),
+            "statuses": _split(settings.prewarm_statuses),
+            "running": self.running,
+            "runs": self.runs,
+            "next_run_at": self.next_run_at.isoformat() if self.next_run_at else None,
+            "queue_depth": len(self._queue),
+            "progress": self.progress if self.running else None,
+            "last_run": self.last_run,
+            "prewarmed_entries": store["prewarmed_entries"],
+            "prewarmed_hits": store["prewarmed_hits"],
+            "prewarmed_hit_share": store["prewarmed_hit_share"],
+        }
+
+summary_prewarmer = SummaryPrewarmer()
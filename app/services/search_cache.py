@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.domain.trial import TrialCardPage
+from app.services.breaker import is_upstream_failure, serve_stale
+from app.services.http import submit_upstream
+from app.services.singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+search_flight = SingleFlight("search")
+
+_SPACES = re.compile(r"\s+")
+
+def normalize_query(condition: str, status: Union[str, Iterable[str], None]) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Case- and whitespace-insensitive condition plus the sorted, de-duplicated status set
+    """
+    if isinstance(status, str):
+        status = status.split(",")
+    statuses = tuple(sorted({s.strip().upper() for s in status or () if s and s.strip()}))
+    return _SPACES.sub(" ", (condition or "").strip()).lower(), statuses
+
+def status_param(statuses: Tuple[str, ...]) -> Optional[str]:
+    return ",".join(statuses) or None
+
+@dataclass
+class CachedSearch:
+    value: Any
+    # results asked for upstream; 0 for pages, which are only served for the same page
+    limit: int
+    # every match is held: fewer results than asked for came back, or the fetch said so (Fetched)
+    complete: bool
+    fetched_at: float
+    size: int
+    refreshing: bool = False
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def covers(self, limit: int) -> bool:
+        return self.complete or self.limit >= limit
+
+@dataclass
+class Fetched:
+    """
+    A fetch result that says itself whether it holds every match, for fetches that
+    can stop short of `limit` before the results run out
+    """
+    value: Any
+    complete: bool
+
+def _size(value: Any) -> int:
+    if isinstance(value, TrialCardPage):
+        return len(value.model_dump_json())
+    return sum(len(card.model_dump_json()) for card in value)
+
+class SearchCache:
+    """
+    In-process cache of search results keyed by normalized query.
+
+    Fresh entries are served until the soft TTL; after that they are still
+    served while a single background refresh replaces them, and past the hard
+    TTL the caller waits for upstream; the expired entry is only kept as the
+    last known good result, served when upstream fails. Card lists are kept
+    for the largest limit fetched, so a cached limit=50 search also answers
+    limit=5 for the same query. Bounded by entry count and serialized bytes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, soft_ttl: float, hard_ttl: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self._entries: "OrderedDict[Hashable, CachedSearch]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "hits": 0,
+            "subset_hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+            "fallbacks": 0,
+        }
+
+    def _store(self, key: Hashable, value: Any, limit: int) -> Any:
+        if isinstance(value, Fetched):
+            value, complete = value.value, value.complete
+        else:
+            complete = limit == 0 or len(value) < limit
+        entry = CachedSearch(value=value, limit=limit, complete=complete, fetched_at=time.time(), size=_size(value))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._counters["evictions"] += 1
+        return value
+
+    def _lookup(self, key: Hashable, limit: int) -> Tuple[Optional[CachedSearch], bool]:
+        """
+        The entry covering `limit`, if any, and whether this caller should start its refresh
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters["misses"] += 1
+                return None, False
+            if entry.age() >= self.hard_ttl:
+                # kept (until evicted or replaced) as the last known good result for _fallback
+                self._counters["expired"] += 1
+                self._counters["misses"] += 1
+                return None, False
+            if not entry.covers(limit):
+                self._counters["misses"] += 1
+                return None, False
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            if limit and limit < len(entry.value):
+                self._counters["subset_hits"] += 1
+            refresh = False
+            if entry.age() >= self.soft_ttl:
+                self._counters["stale_hits"] += 1
+                refresh, entry.refreshing = not entry.refreshing, True
+            return entry, refresh
+
+    def _fallback(self, key: Hashable, limit: int, error: BaseException) -> Any:
+        """
+        The last stored result covering `limit`, whatever its age, in place of a failed
+        upstream call; re-raises when there is none or the failure is not an outage
+        """
+        if not is_upstream_failure(error):
+            raise error
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or not entry.covers(limit):
+                raise error
+            self._counters["fallbacks"] += 1
+        serve_stale("search", entry.age(), error)
+        return entry.value
+
+    def _refresh(self, key: Hashable, entry: CachedSearch, fetch: Callable[[int], Any]) -> None:
+        def run() -> None:
+            try:
+                self._store(key, fetch(entry.limit), entry.limit)
+            except Exception as e:
+                logger.warning("search cache refresh failed for %s: %s", key, e)
+                with self._lock:
+                    self._counters["refresh_failures"] += 1
+                    current = self._entries.get(key)
+                    if current is not None:
+                        current.refreshing = False
+            else:
+                with self._lock:
+                    self._counters["refreshes"] += 1
+
+        submit_upstream(run)
+
+    @timed("search_cache")
+    def get_or_fetch(self, key: Hashable, limit: int, fetch: Callable[[int], Any]) -> Any:
+        """
+        Cached value for key (covering `limit` results), or fetch(limit) on a miss.
+        fetch may return a Fetched to say whether its value holds every match.
+        Concurrent misses for the same key and limit share one upstream call.
+        If that call fails because upstream is down, an expired entry is served instead.
+        """
+        entry, refresh = self._lookup(key, limit)
+        if entry is not None:
+            if refresh:
+                self._refresh(key, entry, fetch)
+            return entry.value
+
+        def load() -> Any:
+            return self._store(key, fetch(limit), limit)
+
+        try:
+            return search_flight.do((key, limit), load)
+        except Exception as e:
+            return self._fallback(key, limit, e)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            counters.update(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                soft_ttl=self.soft_ttl,
+                hard_ttl=self.hard_ttl,
+            )
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else None
+        return counters
+
+search_cache = SearchCache(
+    max_entries=settings.search_cache_max_entries,
+    max_bytes=settings.search_cache_max_bytes,
+    soft_ttl=settings.search_cache_soft_ttl,
+    hard_ttl=settings.search_cache_hard_ttl,
+)
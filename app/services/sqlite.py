@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+class SQLiteFile:
+    """
+    Lazily opened SQLite file with one connection per thread.
+
+    WAL mode lets every uvicorn worker on the host read while another writes.
+    """
+
+    def __init__(self, path: Optional[str], schema: str):
+        self.path = path or None
+        self.schema = schema
+        self._local = threading.local()
+
+    def conn(self) -> Optional[sqlite3.Connection]:
+        if not self.path:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
\ No newline at end of file
@@ -1,28 +1,262 @@
-import json
-from mistralai import Mistral
+import asyncio
+import functools
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
 
 from app.core.config import settings
+from app.core.metrics import stage, timed
 from app.domain.summary import TrialSummary
+from app.domain.trial import Trial
 from app.services.clinicaltrials import get_trial
+from app.services.singleflight import SingleFlight
+from app.services.summary_store import SummaryKey, hash_payload, summary_store
+from app.llm.client import llm_client
+from app.llm.budget import BudgetReport, estimate_tokens, fit_to_budget
 from app.llm.input_builders import build_summary_input
-from app.llm.prompts import build_summary_prompt
+from app.llm.prompts import PROMPT_VERSION, build_reask_prompt, build_summary_prompt
+from app.llm.repair import SUMMARY_FIELDS, InvalidSummaryOutput, partial_summary, repair_json
+from app.llm.routing import model_router
+from app.llm.streaming import TopLevelJSONStream
 
-def summarize_trial(nct_id: str) -> TrialSummary:
-    trial = get_trial(nct_id)
-    payload = build_summary_input(trial)
-    prompt = build_summary_prompt(payload)
+logger = logging.getLogger(__name__)
+
+summary_flight = SingleFlight("summary")
+
+# until when (time.monotonic) calls skip response_format after the provider rejected it
+_structured_output = {"off_until": 0.0}
+
+output_counters = {"completions": 0, "clean": 0, "repaired": 0, "reasked": 0, "reask_recovered": 0, "failed": 0}
+
+def summary_output_stats() -> Dict[str, Any]:
+    n = output_counters["completions"]
+    return {
+        **output_counters,
+        "structured_output": settings.llm_response_format if _structured_output_on() else "off",
+        "repair_rate": round(output_counters["repaired"] / n, 3) if n else None,
+        "reask_rate": round(output_counters["reasked"] / n, 3) if n else None,
+    }
+
+@functools.lru_cache(maxsize=1)
+def _summary_schema() -> Dict[str, Any]:
+    schema = TrialSummary.model_json_schema()
+    schema["properties"] = {k: v for k, v in schema["properties"].items() if k in SUMMARY_FIELDS}
+    schema["required"] = [f for f in schema.get("required", []) if f in SUMMARY_FIELDS]
+    return schema
+
+def _structured_output_on() -> bool:
+    return time.monotonic() >= _structured_output["off_until"]
 
-    client = Mistral(api_key=settings.mistral_api_key)
+def _format_kwargs(schema: bool = True) -> Dict[str, Any]:
+    mode = settings.llm_response_format
+    if mode == "off" or not _structured_output_on():
+        return {}
+    if mode == "json_schema" and schema:
+        return {"response_format": {"type": "json_schema", "json_schema": {"name": "trial_summary", "schema": _summary_schema()}}}
+    return {"response_format": {"type": "json_object"}}
 
-    resp = client.chat.complete(
-        model=settings.mistral_model,
-        messages=[{"role": "user", "content": prompt}],
+def _format_rejected(e: Exception) -> bool:
+    """
+    Whether `e` is the provider refusing response_format: a 400/422 whose message names
+    it or the schema. Calls then go without it for LLM_RESPONSE_FORMAT_RETRY_AFTER seconds.
+    """
+    if getattr(e, "status_code", None) not in (400, 422):
+        return False
+    detail = f"{e} {getattr(e, 'body', None) or ''}".lower()
+    if "response_format" not in detail and "schema" not in detail:
+        return False
+    logger.warning(
+        "LLM rejected response_format, falling back to prompt-only JSON for %.0f s: %s",
+        settings.llm_response_format_retry_after,
+        e,
+    )
+    _structured_output["off_until"] = time.monotonic() + settings.llm_response_format_retry_after
+    return True
+
+def _complete(model: str, prompt: str, schema: bool = True) -> str:
+    kwargs = _format_kwargs(schema)
+    messages = [{"role": "user", "content": prompt}]
+    try:
         #Low temperature for deterministic, factual responses and prevent hallucinations
-        temperature=0.2,
+        resp = llm_client.complete(model=model, messages=messages, temperature=0.2, **kwargs)
+    except Exception as e:
+        if not kwargs or not _format_rejected(e):
+            raise
+        resp = llm_client.complete(model=model, messages=messages, temperature=0.2)
+    return resp.choices[0].message.content or ""
+
+async def _stream_completion(model: str, prompt: str) -> AsyncIterator[Any]:
+    kwargs = _format_kwargs()
+    messages = [{"role": "user", "content": prompt}]
+    try:
+        async for event in llm_client.stream(model=model, messages=messages, temperature=0.2, **kwargs):
+            yield event
+    except Exception as e:
+        # a rejected response_format fails when the stream opens, before any event
+        if not kwargs or not _format_rejected(e):
+            raise
+        async for event in llm_client.stream(model=model, messages=messages, temperature=0.2):
+            yield event
+
+@timed("validate")
+def finalize_summary(text: str, key: SummaryKey, payload: Dict[str, Any]) -> TrialSummary:
+    """
+    Turn a completion into a TrialSummary: repair the JSON locally, keep the fields
+    that validate and re-ask the model for only the missing or invalid ones.
+    """
+    output_counters["completions"] += 1
+    try:
+        data, fixes = repair_json(text)
+    except InvalidSummaryOutput:
+        output_counters["failed"] += 1
+        raise
+    fields, missing = partial_summary(data, payload)
+    if fixes:
+        output_counters["repaired"] += 1
+    if not fixes and not missing:
+        output_counters["clean"] += 1
+
+    if missing and settings.summary_reask_enabled:
+        output_counters["reasked"] += 1
+        logger.info("summary %s: re-asking for %s (fixes: %s)", key.nct_id, ",".join(missing), ",".join(fixes) or "-")
+        try:
+            extra, _ = repair_json(_complete(key.model, build_reask_prompt(payload, missing), schema=False))
+        except InvalidSummaryOutput:
+            extra = {}
+        fields, missing = partial_summary({**fields, **{k: v for k, v in extra.items() if k in missing}}, payload)
+        if not missing:
+            output_counters["reask_recovered"] += 1
+
+    try:
+        return TrialSummary.model_validate(fields)
+    except ValueError as e:
+        output_counters["failed"] += 1
+        raise InvalidSummaryOutput(f"Summary missing {', '.join(missing)}") from e
+
+@timed("summary_input")
+def summary_request(trial: Trial) -> Tuple[SummaryKey, Dict[str, Any], BudgetReport]:
+    """
+    Build the token-budgeted LLM payload for a trial and the store key it is cached under
+    """
+    payload, report = fit_to_budget(build_summary_input(trial), settings.summary_input_token_budget)
+    key = SummaryKey(
+        nct_id=trial.nct_id,
+        model=model_router.choose(report.compacted_tokens),
+        prompt_version=PROMPT_VERSION,
+        payload_hash=hash_payload(payload),
     )
+    return key, payload, report
+
+def _log_completion(key: SummaryKey, prompt: str, report: Optional[BudgetReport], elapsed: float) -> None:
+    tokens = estimate_tokens(prompt)
+    if report is None:
+        logger.info("summary %s: prompt ~%d tokens, llm %.0f ms", key.nct_id, tokens, elapsed * 1000)
+        return
+    logger.info(
+        "summary %s: prompt ~%d tokens, input %d -> %d tokens (-%.0f%%, budget %d%s), trimmed=%s, largest=%s, "
+        "llm %.0f ms (%.0f ms/1k prompt tokens)",
+        key.nct_id,
+        tokens,
+        report.original_tokens,
+        report.compacted_tokens,
+        report.reduction * 100,
+        report.budget,
+        "" if report.fits else ", over",
+        ",".join(report.trimmed) or "-",
+        ",".join(f"{name}:{n}" for name, n in report.largest()) or "-",
+        elapsed * 1000,
+        elapsed * 1000 / max(tokens, 1) * 1000,
+    )
+
+def summarize_trial(nct_id: str) -> TrialSummary:
+    return summarize_loaded_trial(get_trial(nct_id))
+
+def summarize_loaded_trial(trial: Trial) -> TrialSummary:
+    return summary_for_trial(trial)[1]
+
+def summary_for_trial(trial: Trial) -> Tuple[SummaryKey, TrialSummary]:
+    """
+    Stored or freshly generated summary for a trial, with the key it is stored under
+    """
+    key, payload, report = summary_request(trial)
+    stored = summary_store.get(key)
+    if stored is not None:
+        return key, stored
+    return key, generate_summary(key, payload, report)
+
+def generate_summary(
+    key: SummaryKey, payload: Dict[str, Any], report: Optional[BudgetReport] = None, prewarmed: bool = False
+) -> TrialSummary:
+    """
+    Run the completion for a payload; identical concurrent requests share a single call
+    """
+    return summary_flight.do(key, lambda: _generate_summary(key, payload, report, prewarmed))
+
+def _generate_summary(key: SummaryKey, payload: Dict[str, Any], report: Optional[BudgetReport], prewarmed: bool) -> TrialSummary:
+    # a caller that missed the store just as the previous flight for this key finished finds its result here
+    stored = summary_store.get(key, count=False)
+    if stored is not None:
+        return stored
+    with stage("prompt"):
+        prompt = build_summary_prompt(payload)
+
+    def attempt() -> TrialSummary:
+        started = time.perf_counter()
+        text = _complete(key.model, prompt)
+        _log_completion(key, prompt, report, time.perf_counter() - started)
+        return finalize_summary(text, key, payload)
+
+    summary = model_router.run(key.model, attempt)
+    summary_store.put(key, summary, prewarmed=prewarmed)
+    return summary
+
+async def stream_trial_summary(trial: Trial) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Yield summary events as the completion streams in:
+      {"event": "section", "key": ..., "value": ...} for each summary field once complete
+      (again if repair or a re-ask changed it), then the app's safety_disclaimer,
+      then {"event": "summary", "data": ...} with the validated TrialSummary,
+      or {"event": "error", "detail": ...} if the completion cannot be validated.
+    """
+    started = time.perf_counter()
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1000, 1)
+
+    # budgeting and the SQLite store are blocking work, kept off the event loop
+    key, payload, report = await asyncio.to_thread(summary_request, trial)
 
-    text = resp.choices[0].message.content
+    summary = await asyncio.to_thread(summary_store.get, key)
+    if summary is None:
+        with stage("prompt"):
+            prompt = build_summary_prompt(payload)
+        parser = TopLevelJSONStream()
+        sent: Dict[str, Any] = {}
+        async for event in _stream_completion(key.model, prompt):
+            delta = event.data.choices[0].delta.content if event.data.choices else None
+            if not isinstance(delta, str):
+                continue
+            for name, value in parser.feed(delta):
+                # generated_at and safety_disclaimer are the app's, whatever the model wrote
+                if name not in SUMMARY_FIELDS:
+                    continue
+                sent[name] = value
+                yield {"event": "section", "key": name, "value": value, "elapsed_ms": elapsed_ms()}
+        _log_completion(key, prompt, report, time.perf_counter() - started)
 
-    data = json.loads(text)
+        try:
+            summary = await asyncio.to_thread(finalize_summary, parser.text, key, payload)
+        except ValueError as e:
+            yield {"event": "error", "detail": f"LLM returned an invalid summary: {type(e).__name__}", "elapsed_ms": elapsed_ms()}
+            return
+        # sections recovered or changed by repair, re-ask or validation
+        for name, value in summary.model_dump(mode="json", include=set(SUMMARY_FIELDS)).items():
+            if name not in sent or sent[name] != value:
+                yield {"event": "section", "key": name, "value": value, "elapsed_ms": elapsed_ms()}
+        await asyncio.to_thread(summary_store.put, key, summary)
+    else:
+        for name, value in summary.model_dump(mode="json", include=set(SUMMARY_FIELDS)).items():
+            yield {"event": "section", "key": name, "value": value, "elapsed_ms": elapsed_ms()}
 
-    return TrialSummary.model_validate(data)
\ No newline at end of file
+    yield {"event": "section", "key": "safety_disclaimer", "value": summary.safety_disclaimer, "elapsed_ms": elapsed_ms()}
+    yield {"event": "summary", "data": summary.model_dump(mode="json"), "elapsed_ms": elapsed_ms()}
\ No newline at end of file
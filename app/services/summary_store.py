@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.domain.summary import TrialSummary
+from app.services.sqlite import SQLiteFile
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    nct_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    payload_hash TEXT NOT NULL,
+    body TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_hit_at REAL,
+    PRIMARY KEY (nct_id, model, prompt_version, payload_hash)
+);
+-- summaries written by the background pre-warmer rather than a user request
+CREATE TABLE IF NOT EXISTS prewarmed (
+    nct_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt_version TEXT NOT NULL,
+    payload_hash TEXT NOT NULL,
+    PRIMARY KEY (nct_id, model, prompt_version, payload_hash)
+);
+"""
+
+_KEY_WHERE = "nct_id = ? AND model = ? AND prompt_version = ? AND payload_hash = ?"
+
+def hash_payload(payload: Dict[str, Any]) -> str:
+    """
+    Stable hash of a build_summary_input payload
+    """
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+@dataclass(frozen=True)
+class SummaryKey:
+    nct_id: str
+    model: str
+    prompt_version: str
+    payload_hash: str
+
+def _key_params(key: SummaryKey) -> Tuple[str, str, str, str]:
+    return (key.nct_id, key.model, key.prompt_version, key.payload_hash)
+
+class SummaryStore:
+    """
+    Durable LLM summaries keyed by NCT ID, model, prompt version and payload hash.
+
+    A summary is reused until the trial content (payload hash), the model or
+    PROMPT_VERSION changes; older generations for the same trial and model are
+    dropped when a new one is written. Entries written by the pre-warmer are
+    flagged so hits on them can be counted separately.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self._file = SQLiteFile(path, _SCHEMA)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "prewarmed_hits": 0, "misses": 0, "writes": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def warm(self) -> None:
+        """
+        Open the SQLite file (creating its schema) before the first lookup
+        """
+        self._file.conn()
+
+    @timed("summary_store")
+    def get(self, key: SummaryKey, count: bool = True) -> Optional[TrialSummary]:
+        """
+        Stored summary for key; count=False re-checks without counting a second lookup
+        """
+        db = self._file.conn()
+        row = None
+        if db is not None:
+            row = db.execute(
+                "SELECT body, EXISTS (SELECT 1 FROM prewarmed WHERE " + _KEY_WHERE + ") FROM summaries WHERE " + _KEY_WHERE,
+                _key_params(key) * 2,
+            ).fetchone()
+        if not count:
+            return TrialSummary.model_validate_json(row[0]) if row is not None else None
+        if row is None:
+            self._count("misses")
+            return None
+        db.execute("UPDATE summaries SET hits = hits + 1, last_hit_at = ? WHERE " + _KEY_WHERE, (time.time(), *_key_params(key)))
+        self._count("hits")
+        if row[1]:
+            self._count("prewarmed_hits")
+        return TrialSummary.model_validate_json(row[0])
+
+    def contains(self, key: SummaryKey) -> bool:
+        """
+        Whether a summary is stored under key, without counting a lookup
+        """
+        db = self._file.conn()
+        if db is None:
+            return False
+        return db.execute("SELECT 1 FROM summaries WHERE " + _KEY_WHERE, _key_params(key)).fetchone() is not None
+
+    @timed("summary_store")
+    def put(self, key: SummaryKey, summary: TrialSummary, prewarmed: bool = False) -> None:
+        db = self._file.conn()
+        if db is None:
+            return
+        with db:
+            db.execute("BEGIN")
+            db.execute("DELETE FROM summaries WHERE nct_id = ? AND model = ?", (key.nct_id, key.model))
+            db.execute("DELETE FROM prewarmed WHERE nct_id = ? AND model = ?", (key.nct_id, key.model))
+            db.execute(
+                "INSERT INTO summaries (nct_id, model, prompt_version, payload_hash, body, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*_key_params(key), summary.model_dump_json(), time.time()),
+            )
+            if prewarmed:
+                db.execute("INSERT INTO prewarmed (nct_id, model, prompt_version, payload_hash) VALUES (?, ?, ?, ?)", _key_params(key))
+        self._count("writes")
+
+    def list_entries(self, nct_id: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        db = self._file.conn()
+        if db is None:
+            return []
+        sql = (
+            "SELECT s.nct_id, s.model, s.prompt_version, s.payload_hash, s.created_at, s.hits, s.last_hit_at, "
+            "p.nct_id IS NOT NULL FROM summaries s LEFT JOIN prewarmed p USING (nct_id, model, prompt_version, payload_hash)"
+        )
+        params: List[Any] = []
+        if nct_id:
+            sql += " WHERE s.nct_id = ?"
+            params.append(nct_id)
+        sql += " ORDER BY s.created_at DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        cols = ["nct_id", "model", "prompt_version", "payload_hash", "created_at", "hits", "last_hit_at", "prewarmed"]
+        return [{**dict(zip(cols, row)), "prewarmed": bool(row[-1])} for row in db.execute(sql, params)]
+
+    def get_latest(self, nct_id: str) -> Optional[TrialSummary]:
+        db = self._file.conn()
+        if db is None:
+            return None
+        row = db.execute(
+            "SELECT body FROM summaries WHERE nct_id = ? ORDER BY created_at DESC LIMIT 1", (nct_id,)
+        ).fetchone()
+        return TrialSummary.model_validate_json(row[0]) if row else None
+
+    def purge(self, nct_id: Optional[str] = None, prompt_version: Optional[str] = None) -> int:
+        """
+        Delete entries, optionally restricted to one trial and/or prompt version; returns the count removed
+        """
+        db = self._file.conn()
+        if db is None:
+            return 0
+        clauses, params = [], []
+        if nct_id:
+            clauses.append("nct_id = ?")
+            params.append(nct_id)
+        if prompt_version:
+            clauses.append("prompt_version = ?")
+            params.append(prompt_version)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        with db:
+            db.execute("BEGIN")
+            db.execute("DELETE FROM prewarmed" + where, params)
+            return db.execute("DELETE FROM summaries" + where, params).rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+        db = self._file.conn()
+        counters["entries"] = db.execute("SELECT COUNT(*) FROM summaries").fetchone()[0] if db is not None else 0
+        counters["prewarmed_entries"] = db.execute("SELECT COUNT(*) FROM prewarmed").fetchone()[0] if db is not None else 0
+        lookups = counters["hits"] + counters["misses"]
+        counters["hit_ratio"] = round(counters["hits"] / lookups, 4) if lookups else None
+        # share of all summary lookups answered by a pre-warmed entry
+        counters["prewarmed_hit_share"] = round(counters["prewarmed_hits"] / lookups, 4) if lookups else None
+        return counters
+
+summary_store = SummaryStore(settings.summary_store_path if settings.summary_store_enabled else None)
\ No newline at end of file
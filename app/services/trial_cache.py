@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import timed
+from app.domain.trial import Trial
+from app.services.sqlite import SQLiteFile
+
+@dataclass
+class CachedTrial:
+    trial: Trial
+    stored_at: float
+    size: int
+
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+class TrialCache:
+    """
+    Two-tier cache of normalized trials keyed by NCT ID.
+
+    Tier 1 is an in-process LRU bounded by entry count and serialized bytes.
+    Tier 2 is a SQLite file shared by every worker on the host; entries evicted
+    from memory (or written by another worker) are promoted back on read.
+    Entries older than the TTL are still returned so the caller can revalidate
+    them instead of refetching the whole record.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl_seconds: float, path: Optional[str]):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._file = SQLiteFile(
+            path,
+            "CREATE TABLE IF NOT EXISTS trials ("
+            " nct_id TEXT PRIMARY KEY,"
+            " body TEXT NOT NULL,"
+            " last_update_posted TEXT,"
+            " stored_at REAL NOT NULL)",
+        )
+        self._entries: "OrderedDict[str, CachedTrial]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "revalidated": 0,
+            "refreshed": 0,
+        }
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        return self._file.conn()
+
+    def warm(self) -> None:
+        """
+        Open the SQLite file (creating its schema) before the first lookup
+        """
+        self._db()
+
+    def is_fresh(self, entry: CachedTrial) -> bool:
+        return entry.age() < self.ttl_seconds
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _remember(self, nct_id: str, entry: CachedTrial) -> None:
+        with self._lock:
+            old = self._entries.pop(nct_id, None)
+            if old is not None:
+                self._bytes -= old.size
+            self._entries[nct_id] = entry
+            self._bytes += entry.size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._counters["evictions"] += 1
+
+    @timed("trial_cache")
+    def get(self, nct_id: str) -> Optional[CachedTrial]:
+        with self._lock:
+            entry = self._entries.get(nct_id)
+            if entry is not None:
+                self._entries.move_to_end(nct_id)
+                self._counters["memory_hits"] += 1
+                return entry
+
+        db = self._db()
+        row = None
+        if db is not None:
+            row = db.execute("SELECT body, stored_at FROM trials WHERE nct_id = ?", (nct_id,)).fetchone()
+        if row is None:
+            self._count("misses")
+            return None
+
+        body, stored_at = row
+        entry = CachedTrial(trial=Trial.model_validate_json(body), stored_at=stored_at, size=len(body))
+        self._remember(nct_id, entry)
+        self._count("disk_hits")
+        return entry
+
+    def put(self, trial: Trial) -> CachedTrial:
+        body = trial.model_dump_json()
+        entry = CachedTrial(trial=trial, stored_at=time.time(), size=len(body))
+        self._remember(trial.nct_id, entry)
+        db = self._db()
+        if db is not None:
+            db.execute(
+                "INSERT OR REPLACE INTO trials (nct_id, body, last_update_posted, stored_at) VALUES (?, ?, ?, ?)",
+                (
+                    trial.nct_id,
+                    body,
+                    trial.last_update_posted.isoformat() if trial.last_update_posted else None,
+                    entry.stored_at,
+                ),
+            )
+        self._count("refreshed")
+        return entry
+
+    def touch(self, entry: CachedTrial) -> None:
+        """
+        Restart the TTL of an entry confirmed unchanged upstream
+        """
+        entry.stored_at = time.time()
+        db = self._db()
+        if db is not None:
+            db.execute("UPDATE trials SET stored_at = ? WHERE nct_id = ?", (entry.stored_at, entry.trial.nct_id))
+        self._count("revalidated")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        db = self._db()
+        if db is not None:
+            db.execute("DELETE FROM trials")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            counters.update(
+                memory_entries=len(self._entries),
+                memory_bytes=self._bytes,
+                max_entries=self.max_entries,
+                max_bytes=self.max_bytes,
+                ttl_seconds=self.ttl_seconds,
+            )
+        lookups = counters["memory_hits"] + counters["disk_hits"] + counters["misses"]
+        counters["hit_ratio"] = round((lookups - counters["misses"]) / lookups, 4) if lookups else None
+        return counters
+
+trial_cache = TrialCache(
+    max_entries=settings.trial_cache_max_entries,
+    max_bytes=settings.trial_cache_max_bytes,
+    ttl_seconds=settings.trial_cache_ttl_seconds,
+    path=settings.trial_cache_path,
+)
\ No newline at end of file
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+
+from app.core.config import settings
+from app.llm.client import llm_client
+from app.services.http import warm_upstream
+from app.services.mirror import trial_mirror
+from app.services.summary_store import summary_store
+from app.services.trial_cache import trial_cache
+
+logger = logging.getLogger(__name__)
+
+def _steps() -> List[Tuple[str, Callable[[], None]]]:
+    steps: List[Tuple[str, Callable[[], None]]] = []
+    if settings.mirror_mode != "only":
+        steps.append(("upstream", warm_upstream))
+    if settings.trial_cache_enabled:
+        steps.append(("trial_cache", trial_cache.warm))
+    if settings.mirror_mode != "off":
+        steps.append(("mirror", trial_mirror.warm))
+    if settings.llm_startup == "eager":
+        steps += [("summary_store", summary_store.warm), ("llm_client", llm_client.load)]
+    return steps
+
+def warm_up() -> Dict[str, float]:
+    """
+    Open upstream connections, SQLite files and (with LLM_STARTUP=eager) the LLM
+    client before the first request. A failing step is logged and skipped; the
+    first request then does that work itself. Returns milliseconds per step.
+    """
+    timings: Dict[str, float] = {}
+    for name, step in _steps():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            logger.warning("warm-up step %s failed: %s: %s", name, type(e).__name__, e)
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("warm-up done: %s", ", ".join(f"{name} {ms:.0f} ms" for name, ms in timings.items()))
+    return timings
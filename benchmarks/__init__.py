@@ -0,0 +1,45 @@
+"""
+Offline benchmarks for TrialLens.
+
+Settings are required at import time, so provide harmless defaults for the
+benchmarks. Variables already set in the environment take precedence.
+"""
+import os
+import subprocess
+from pathlib import Path
+from typing import List
+
+for _key, _value in {
+    "APP_NAME": "TrialLens",
+    "APP_ENV": "bench",
+    "APP_VERSION": "bench",
+    "MISTRAL_API_KEY": "bench",
+    "MISTRAL_MODEL": "mistral-small-latest",
+    "CLINICAL_TRIAL_BASE_URL": "http://127.0.0.1:8765/api/v2/studies",
+    "CLINICAL_TRIAL_GET_STUDY_URL": "https://clinicaltrials.gov/study/",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+def percentile(values: List[float], pct: float) -> float:
+    """
+    Nearest-rank percentile; 0.0 for an empty sample
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def git_commit() -> str:
+    """
+    Short HEAD commit, suffixed with -dirty when tracked files are modified
+    """
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
@@ -0,0 +1,214 @@
+"""
+Cold-start cost of a new worker: import time, startup (lifespan warm-up) and first requests.
+
+    python -m benchmarks.cold_start                      # run, save benchmarks/results/cold-start-<commit>.json
+    python -m benchmarks.cold_start --compare benchmarks/results/cold-start-abc1234.json --fail-on-regression
+    python -m benchmarks.cold_start --max-import-ms 600 --max-first-request-ms 150
+
+Each run is a fresh interpreter serving app.main on uvicorn against the local
+stand-ins, with empty caches, once per LLM_STARTUP mode. A run times
+`import app.main`, startup until uvicorn accepts connections, the first and a
+second trial detail, and the first summary. The LLM SDK modules loaded at each
+point are recorded too. With LLM_STARTUP=lazy, loading mistralai before the
+first summary fails the benchmark, as does exceeding a --max-* budget or, with
+--fail-on-regression, a median slower than the compared run by more than --threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from benchmarks import RESULTS_DIR, git_commit, percentile
+
+MODES = ("eager", "lazy")
+LLM_MODULES = ("mistralai", "httpx")
+METRICS = ("import_ms", "startup_ms", "first_trial_ms", "second_trial_ms", "first_summary_ms")
+
+def _llm_modules() -> List[str]:
+    return [m for m in LLM_MODULES if m in sys.modules]
+
+def _get(url: str) -> float:
+    from urllib.request import urlopen
+
+    started = time.perf_counter()
+    with urlopen(url, timeout=60) as resp:
+        resp.read()
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def child(port: int) -> Dict[str, Any]:
+    """
+    One cold worker; settings come from the environment set by run()
+    """
+    import threading
+
+    import uvicorn
+
+    out: Dict[str, Any] = {}
+    started = time.perf_counter()
+    from app.main import app
+    out["import_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    out["llm_after_import"] = _llm_modules()
+
+    started = time.perf_counter()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"uvicorn failed to start on port {port}")
+        time.sleep(0.001)
+    out["startup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    out["llm_after_startup"] = _llm_modules()
+
+    base = f"http://127.0.0.1:{port}"
+    try:
+        out["first_trial_ms"] = _get(f"{base}/trials/NCT00000001")
+        out["second_trial_ms"] = _get(f"{base}/trials/NCT00000002")
+        out["llm_after_trials"] = _llm_modules()
+        out["first_summary_ms"] = _get(f"{base}/trials/NCT00000003/summary")
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+    return out
+
+def run(mode: str, port: int, env: Dict[str, str]) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory(prefix="triallens-cold-") as cache_dir:
+        child_env = {
+            **os.environ,
+            **env,
+            "LLM_STARTUP": mode,
+            "TRIAL_CACHE_PATH": str(Path(cache_dir) / "trials.sqlite3"),
+            "SUMMARY_STORE_PATH": str(Path(cache_dir) / "summaries.sqlite3"),
+            "PREWARM_CONDITIONS": "",
+        }
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.cold_start", "--child", "--port", str(port)],
+            env=child_env,
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+    if proc.returncode != 0:
+        raise RuntimeError(f"cold-start run ({mode}) failed:\n{proc.stderr}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for metric in METRICS:
+        values = [r[metric] for r in runs]
+        out[metric] = round(percentile(values, 50), 1)
+        out[f"{metric}_max"] = round(max(values), 1)
+    for point in ("llm_after_import", "llm_after_startup", "llm_after_trials"):
+        out[point] = sorted({m for r in runs for m in r[point]})
+    return out
+
+def check(results: Dict[str, Dict[str, Any]], args: argparse.Namespace) -> List[str]:
+    """
+    Invariants and budgets that fail the run
+    """
+    failures = []
+    lazy = results.get("lazy")
+    if lazy is not None and "mistralai" in lazy["llm_after_trials"]:
+        failures.append("LLM_STARTUP=lazy loaded mistralai before the first summary")
+    for mode, result in results.items():
+        if args.max_import_ms and result["import_ms"] > args.max_import_ms:
+            failures.append(f"{mode}: import {result['import_ms']} ms > {args.max_import_ms} ms")
+        if args.max_first_request_ms and result["first_trial_ms"] > args.max_first_request_ms:
+            failures.append(f"{mode}: first trial request {result['first_trial_ms']} ms > {args.max_first_request_ms} ms")
+    return failures
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Print median deltas against a saved run and return the metrics that regressed beyond threshold
+    """
+    regressions = []
+    print(f"\ncompared with {baseline['meta']['commit']} (threshold {threshold:.0%} on medians)")
+    for mode, result in current["results"].items():
+        old = baseline["results"].get(mode)
+        if not old:
+            continue
+        for metric in METRICS:
+            before, after = old.get(metric), result[metric]
+            if not before:
+                continue
+            delta = after / before - 1
+            flag = ""
+            if delta > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{mode}/{metric}")
+            print(f"{mode:8}{metric:>18}{before:>12}{after:>12}{delta:>+9.1%}{flag}")
+    return regressions
+
+def report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'mode':8}" + "".join(f"{m:>18}" for m in METRICS) + "   LLM modules after import / startup / trials")
+    for mode, r in results.items():
+        loaded = " / ".join(",".join(r[p]) or "-" for p in ("llm_after_import", "llm_after_startup", "llm_after_trials"))
+        print(f"{mode:8}" + "".join(f"{r[m]:>18}" for m in METRICS) + f"   {loaded}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh workers per mode")
+    parser.add_argument("--mode", choices=MODES, action="append", help="LLM_STARTUP modes to run (default both)")
+    parser.add_argument("--port", type=int, default=8797, help="Worker port; the stand-ins use the next two")
+    parser.add_argument("--max-import-ms", type=float, default=0.0, help="Fail when the median import takes longer (0 = no budget)")
+    parser.add_argument("--max-first-request-ms", type=float, default=0.0, help="Fail when the median first trial request takes longer")
+    parser.add_argument("--output", help="Where to save results (default benchmarks/results/cold-start-<commit>.json)")
+    parser.add_argument("--compare", help="Saved results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Relative median slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child(args.port)))
+        return 0
+
+    from benchmarks import ctgov_stub, mistral_stub
+
+    ctgov = ctgov_stub.serve(args.port + 1, ctgov_stub.StubConfig())
+    llm = mistral_stub.serve(args.port + 2, mistral_stub.LLMStubConfig())
+    env = {"CLINICAL_TRIAL_BASE_URL": ctgov_stub.base_url(ctgov), "MISTRAL_SERVER_URL": mistral_stub.server_url(llm)}
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        for mode in args.mode or MODES:
+            results[mode] = summarize([run(mode, args.port, env) for _ in range(args.runs)])
+    finally:
+        ctgov.shutdown()
+        llm.shutdown()
+
+    report(results)
+    commit = git_commit()
+    run_record = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "runs": args.runs,
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"cold-start-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run_record, indent=2), encoding="utf-8")
+    print(f"\nsaved {output}")
+
+    failures = check(results, args)
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(run_record, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            failures += [f"regression: {name}" for name in regressions]
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
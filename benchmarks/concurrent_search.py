@@ -0,0 +1,79 @@
+"""
+Concurrent search latency against the local ClinicalTrials.gov stand-in.
+
+    python -m benchmarks.concurrent_search --requests 200 --concurrency 50
+
+Every ``--slow-every``-th upstream call is delayed by ``--slow-delay``. With the
+pooled async path the p99 tracks the slow call itself; ``--mode blocking``
+reproduces the old behaviour where searches ran on the event loop and queued
+behind each other. The search cache is off, so every request goes upstream.
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from benchmarks import percentile
+from benchmarks.ctgov_stub import StubConfig, base_url, serve
+from app.core.config import settings
+from app.services.clinicaltrials import search_trial_cards, search_trial_cards_async
+
+async def _search(mode: str, latencies: List[float]) -> None:
+    start = time.perf_counter()
+    if mode == "blocking":
+        search_trial_cards("condition", None, 10)
+    else:
+        await search_trial_cards_async("condition", None, 10)
+    latencies.append(time.perf_counter() - start)
+
+async def _loop_lag(stop: asyncio.Event, lags: List[float], interval: float = 0.01) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+async def run(args: argparse.Namespace) -> None:
+    latencies: List[float] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_loop_lag(stop, lags))
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def bounded() -> None:
+        async with sem:
+            await _search(args.mode, latencies)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(bounded() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+
+    print(f"mode={args.mode} requests={args.requests} concurrency={args.concurrency}")
+    print(f"throughput: {args.requests / elapsed:.1f} req/s")
+    for pct in (50, 90, 99):
+        print(f"p{pct}: {percentile(latencies, pct) * 1000:.1f} ms")
+    print(f"max event loop lag: {max(lags, default=0.0) * 1000:.1f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["async", "blocking"], default="async")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="Upstream latency in seconds")
+    parser.add_argument("--slow-every", type=int, default=20)
+    parser.add_argument("--slow-delay", type=float, default=1.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = serve(args.port, StubConfig(delay=args.delay, slow_every=args.slow_every, slow_delay=args.slow_delay))
+    settings.clinical_trial_base_url = base_url(server)
+    # every request repeats one query; with the search cache on all but the first would be hits
+    settings.search_cache_enabled = False
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
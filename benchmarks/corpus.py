@@ -0,0 +1,62 @@
+"""
+Study JSON corpus for offline benchmarks.
+
+Every ``benchmarks/fixtures/*.json`` file is one ClinicalTrials.gov v2 study
+payload. ``small`` and ``typical`` ship with the repo; a ``huge`` multi-site
+trial is derived from ``typical`` by replicating its sites. Real studies can
+be recorded into the corpus with:
+
+    python -m benchmarks.corpus NCT04368728 NCT04470427
+"""
+import copy
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+HUGE_SITES = 2500
+
+LIVE_BASE_URL = "https://clinicaltrials.gov/api/v2/studies"
+
+def expand_sites(study: Dict[str, Any], sites: int) -> Dict[str, Any]:
+    """
+    Copy of a study with its location list grown to `sites` distinct entries
+    """
+    study = copy.deepcopy(study)
+    module = study["protocolSection"]["contactsLocationsModule"]
+    base = module.get("locations") or []
+    locations = []
+    for i in range(sites):
+        loc = copy.deepcopy(base[i % len(base)])
+        loc["facility"] = f"{loc.get('facility')} (site {i + 1})"
+        geo = loc.get("geoPoint")
+        if geo:
+            geo["lat"] = round(geo["lat"] + ((i * 0.013) % 1.0) - 0.5, 5)
+            geo["lon"] = round(geo["lon"] + ((i * 0.029) % 1.0) - 0.5, 5)
+        locations.append(loc)
+    module["locations"] = locations
+    return study
+
+def load_corpus(huge_sites: int = HUGE_SITES) -> Dict[str, Dict[str, Any]]:
+    corpus = {path.stem: json.loads(path.read_text(encoding="utf-8")) for path in sorted(FIXTURES_DIR.glob("*.json"))}
+    if "typical" in corpus and huge_sites:
+        corpus["huge"] = expand_sites(corpus["typical"], huge_sites)
+    return corpus
+
+def record(nct_ids: List[str]) -> None:
+    """
+    Fetch live studies from ClinicalTrials.gov into the fixtures directory
+    """
+    from app.core.config import settings
+    from app.services.clinicaltrials import get_trial_raw
+
+    settings.clinical_trial_base_url = LIVE_BASE_URL
+    for nct_id in nct_ids:
+        path = FIXTURES_DIR / f"{nct_id}.json"
+        path.write_text(json.dumps(get_trial_raw(nct_id), indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"recorded {path}")
+
+if __name__ == "__main__":
+    record(sys.argv[1:])
\ No newline at end of file
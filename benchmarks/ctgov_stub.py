@@ -0,0 +1,320 @@
+"""
+Local stand-in for the ClinicalTrials.gov v2 studies API.
+
+Serves synthetic study payloads shaped like the real API so the services
+layer can be exercised without touching the upstream. Recorded studies from
+the benchmark corpus can be served instead (re-keyed to the requested NCT ID),
+and latency, jitter and upstream errors can be injected for load tests.
+Every study has its own last-update date, searches honour
+`filter.advanced=AREA[LastUpdatePostDate]RANGE[from,to]`, and StubConfig.touch()
+marks studies as updated, so incremental mirror syncs can be exercised.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import random
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+API_PATH = "/api/v2/studies"
+
+_UPDATE_RANGE = re.compile(r"AREA\[LastUpdatePostDate\]RANGE\[([^,\]]*),([^\]]*)\]")
+
+def update_date(nct_id: str) -> str:
+    """
+    Last-update date of a synthetic study: spread over the two years up to 2025-03-14
+    """
+    n = int(nct_id[3:]) if nct_id[3:].isdigit() else 0
+    return (date(2025, 3, 14) - timedelta(days=(n * 37) % 730)).isoformat()
+
+def make_study(nct_id: str, locations: int = 3, outcomes: int = 2, updated: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build a synthetic study payload with the modules map_study_to_trial reads
+    """
+    n = int(nct_id[3:]) if nct_id[3:].isdigit() else 0
+    updated = updated or update_date(nct_id)
+    seed = n * 101
+    # eligibility varies with the NCT ID so filtered searches reject a realistic share of studies
+    min_age, max_age = (("18 Years", "75 Years"), ("6 Months", "17 Years"), ("65 Years", None), ("18 Years", "45 Years"))[n % 4]
+    return {
+        "protocolSection": {
+            "identificationModule": {
+                "nctId": nct_id,
+                "briefTitle": f"Study of Drug X in Condition ({nct_id})",
+                "officialTitle": f"A Randomized, Double-Blind Study of Drug X in Adults With Condition ({nct_id})",
+            },
+            "statusModule": {
+                "overallStatus": "RECRUITING",
+                "startDateStruct": {"date": "2024-01-10", "type": "ACTUAL"},
+                "primaryCompletionDateStruct": {"date": "2026-06-30", "type": "ESTIMATED"},
+                "completionDateStruct": {"date": "2027-01-31", "type": "ESTIMATED"},
+                "lastUpdateSubmitDate": updated,
+                "lastUpdatePostDateStruct": {"date": updated, "type": "ACTUAL"},
+            },
+            "conditionsModule": {"conditions": ["Condition"], "keywords": ["drug x", "condition"]},
+            "designModule": {
+                "studyType": "INTERVENTIONAL",
+                "phases": ["PHASE3"],
+                "designInfo": {"primaryPurpose": "TREATMENT"},
+                "primaryPurpose": "TREATMENT",
+                "enrollmentInfo": {"count": 40 * max(locations, 1), "type": "ESTIMATED"},
+            },
+            "eligibilityModule": {
+                "eligibilityCriteria": (
+                    "Inclusion Criteria:\n\n* Age 18 years or older\n* Confirmed diagnosis of condition\n"
+                    "* Adequate organ function\n\nExclusion Criteria:\n\n* Pregnancy or breastfeeding\n"
+                    "* Prior treatment with Drug X\n* Active infection"
+                ),
+                "healthyVolunteers": n % 5 == 0,
+                "sex": ("ALL", "ALL", "FEMALE", "ALL", "MALE")[n % 5],
+                "minimumAge": min_age,
+                **({"maximumAge": max_age} if max_age else {}),
+            },
+            "armsInterventionsModule": {
+                "interventions": [
+                    {"type": "DRUG", "name": "Drug X"},
+                    {"type": "DRUG", "name": "Placebo"},
+                ]
+            },
+            "outcomesModule": {
+                "primaryOutcomes": [
+                    {"measure": f"Outcome {i + 1}", "timeFrame": "52 weeks", "description": "Change from baseline"}
+                    for i in range(outcomes)
+                ]
+            },
+            "contactsLocationsModule": {
+                "centralContacts": [
+                    {"name": "Study Team", "role": "CONTACT", "phone": "555-0100", "email": "study@example.org"}
+                ],
+                "locations": [
+                    {
+                        "facility": f"Site {i + 1} Medical Center",
+                        "status": "RECRUITING" if i % 3 else "NOT_YET_RECRUITING",
+                        "city": f"City {i % 97}",
+                        "state": f"State {i % 13}",
+                        "country": ("United States", "France", "Germany", "Japan")[i % 4],
+                        "geoPoint": {"lat": -60 + ((seed + i) * 7.31) % 120, "lon": -170 + ((seed + i) * 13.7) % 340},
+                    }
+                    for i in range(locations)
+                ],
+            },
+            "sponsorCollaboratorsModule": {
+                "leadSponsor": {"name": "Example Pharma", "class": "INDUSTRY"},
+                "collaborators": [{"name": "Example University", "class": "OTHER"}],
+            },
+        }
+    }
+
+# ClinicalTrials.gov field piece names understood by project()
+PIECES = {
+    "NCTId": "protocolSection.identificationModule.nctId",
+    "BriefTitle": "protocolSection.identificationModule.briefTitle",
+    "Condition": "protocolSection.conditionsModule.conditions",
+    "OverallStatus": "protocolSection.statusModule.overallStatus",
+    "LastUpdateSubmitDate": "protocolSection.statusModule.lastUpdateSubmitDate",
+    "Phase": "protocolSection.designModule.phases",
+    "StudyType": "protocolSection.designModule.studyType",
+    "LeadSponsorName": "protocolSection.sponsorCollaboratorsModule.leadSponsor.name",
+    "LocationFacility": "protocolSection.contactsLocationsModule.locations.facility",
+    "LocationStatus": "protocolSection.contactsLocationsModule.locations.status",
+    "LocationCity": "protocolSection.contactsLocationsModule.locations.city",
+    "LocationState": "protocolSection.contactsLocationsModule.locations.state",
+    "LocationCountry": "protocolSection.contactsLocationsModule.locations.country",
+    "LocationGeoPoint": "protocolSection.contactsLocationsModule.locations.geoPoint",
+    "MinimumAge": "protocolSection.eligibilityModule.minimumAge",
+    "MaximumAge": "protocolSection.eligibilityModule.maximumAge",
+    "Sex": "protocolSection.eligibilityModule.sex",
+    "HealthyVolunteers": "protocolSection.eligibilityModule.healthyVolunteers",
+}
+
+def _pick(src: Any, keys: List[str]) -> Any:
+    if not keys:
+        return src
+    if isinstance(src, list):
+        return [_pick(item, keys) for item in src]
+    if not isinstance(src, dict) or keys[0] not in src:
+        return None
+    value = _pick(src[keys[0]], keys[1:])
+    return None if value is None else {keys[0]: value}
+
+def _merge(a: Any, b: Any) -> Any:
+    if isinstance(a, dict) and isinstance(b, dict):
+        out = dict(a)
+        for key, value in b.items():
+            out[key] = _merge(out[key], value) if key in out else value
+        return out
+    if isinstance(a, list) and isinstance(b, list):
+        return [_merge(x, y) for x, y in zip(a, b)]
+    return b
+
+def project(study: Dict[str, Any], fields: Sequence[str]) -> Dict[str, Any]:
+    """
+    Keep only the given fields (piece names or dotted paths), like the API's `fields` parameter
+    """
+    out: Dict[str, Any] = {}
+    for field in fields:
+        picked = _pick(study, PIECES.get(field, field).split("."))
+        if picked is not None:
+            out = _merge(out, picked)
+    return out
+
+def nct_id_for(i: int) -> str:
+    return f"NCT{i:08d}"
+
+def update_range(query: Dict[str, List[str]]) -> Optional[Tuple[str, str]]:
+    """
+    (from, to) ISO dates of a LastUpdatePostDate range in filter.advanced; MIN / MAX are open bounds
+    """
+    match = _UPDATE_RANGE.search((query.get("filter.advanced") or [""])[0])
+    if match is None:
+        return None
+    low, high = (bound.strip() for bound in match.groups())
+    return ("" if low.upper() == "MIN" else low), ("9999-12-31" if high.upper() == "MAX" else high)
+
+class StubConfig:
+    """
+    Mutable knobs shared by all handler threads
+    """
+    def __init__(
+        self,
+        delay: float = 0.0,
+        slow_every: int = 0,
+        slow_delay: float = 0.0,
+        locations: int = 3,
+        total_studies: int = 0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        recorded: Optional[Sequence[Dict[str, Any]]] = None,
+    ):
+        self.delay = delay
+        self.slow_every = slow_every
+        self.slow_delay = slow_delay
+        self.locations = locations
+        # when set, searches page through this many studies using nextPageToken
+        self.total_studies = total_studies
+        # extra uniform random latency on top of delay
+        self.jitter = jitter
+        # fraction of requests answered with error_status instead of data
+        self.error_rate = error_rate
+        self.error_status = error_status
+        # recorded study payloads served in place of make_study(), picked by NCT ID
+        self.recorded = list(recorded or [])
+        # NCT ID -> last-update date overriding the generated one, see touch()
+        self.updated: Dict[str, str] = {}
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def next_delay(self) -> float:
+        with self._lock:
+            self.requests += 1
+            n = self.requests
+        if self.slow_every and n % self.slow_every == 0:
+            return self.slow_delay
+        return self.delay + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+    def inject_error(self) -> bool:
+        if not self.error_rate or random.random() >= self.error_rate:
+            return False
+        with self._lock:
+            self.errors += 1
+        return True
+
+    def touch(self, nct_ids: Sequence[str], on: Optional[str] = None) -> None:
+        """
+        Mark studies as updated on `on` (default today)
+        """
+        on = on or date.today().isoformat()
+        with self._lock:
+            self.updated.update((nct_id, on) for nct_id in nct_ids)
+
+    def update_date(self, nct_id: str) -> str:
+        return self.updated.get(nct_id) or update_date(nct_id)
+
+    def study(self, nct_id: str) -> Dict[str, Any]:
+        updated = self.update_date(nct_id)
+        if not self.recorded:
+            return make_study(nct_id, locations=self.locations, updated=updated)
+        n = int(nct_id[3:]) if nct_id[3:].isdigit() else 0
+        study = copy.deepcopy(self.recorded[n % len(self.recorded)])
+        study["protocolSection"]["identificationModule"]["nctId"] = nct_id
+        status_mod = study["protocolSection"].setdefault("statusModule", {})
+        status_mod["lastUpdateSubmitDate"] = updated
+        status_mod["lastUpdatePostDateStruct"] = {"date": updated, "type": "ACTUAL"}
+        return study
+
+def _handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: Any) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            time.sleep(config.next_delay())
+            if config.inject_error():
+                self._send(config.error_status, {"message": "injected upstream error"})
+                return
+            parts = urlsplit(self.path)
+            if parts.path.rstrip("/") == API_PATH:
+                query = parse_qs(parts.query)
+                size = int((query.get("pageSize") or ["10"])[0])
+                offset = int((query.get("pageToken") or ["0"])[0])
+                matching = range(1, (config.total_studies or offset + size) + 1)
+                window = update_range(query)
+                if window is not None:
+                    matching = [i for i in matching if window[0] <= config.update_date(nct_id_for(i)) <= window[1]]
+                end = offset + size
+                if config.total_studies:
+                    end = min(end, len(matching))
+                studies = [config.study(nct_id_for(i)) for i in matching[offset:end]]
+                if query.get("fields"):
+                    fields = query["fields"][0].split(",")
+                    studies = [project(study, fields) for study in studies]
+                body: Dict[str, Any] = {"studies": studies}
+                if config.total_studies:
+                    if end < len(matching):
+                        body["nextPageToken"] = str(end)
+                    if query.get("countTotal") == ["true"]:
+                        body["totalCount"] = len(matching)
+                self._send(200, body)
+                return
+            if parts.path.startswith(API_PATH + "/NCT"):
+                nct_id = parts.path.rsplit("/", 1)[-1]
+                study = config.study(nct_id)
+                query = parse_qs(parts.query)
+                if query.get("fields"):
+                    study = project(study, query["fields"][0].split(","))
+                self._send(200, study)
+                return
+            self._send(404, {"message": "not found"})
+
+    return Handler
+
+def serve(port: int = 8765, config: Optional[StubConfig] = None) -> ThreadingHTTPServer:
+    """
+    Start the stand-in on a daemon thread and return the server
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}{API_PATH}"
\ No newline at end of file
@@ -0,0 +1,81 @@
+"""
+Burst of chat completions against the local Mistral stand-in.
+
+    python -m benchmarks.llm_client --requests 100 --threads 50 --server-concurrency 8 --server-rps 20
+
+The stand-in answers 429 with Retry-After once its limits are exceeded.
+``--mode shared`` goes through app.llm.client (limiter, queue, retries);
+``--mode naive`` reproduces the old behaviour of a fresh client per call with
+no retries, where every 429 surfaces as a failure.
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from benchmarks import percentile
+from benchmarks.mistral_stub import LLMStubConfig, serve, server_url
+from app.core.config import settings
+
+PROMPT = 'Summarize INPUT_JSON: {"nct_id": "NCT00000001"}'
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["shared", "naive"], default="shared")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=0.05, help="Stand-in latency per completion")
+    parser.add_argument("--server-concurrency", type=int, default=8)
+    parser.add_argument("--server-rps", type=float, default=20.0)
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    config = LLMStubConfig(delay=args.delay, max_concurrent=args.server_concurrency, requests_per_second=args.server_rps, retry_after=0.2)
+    server = serve(args.port, config)
+    settings.mistral_server_url = server_url(server)
+    settings.llm_max_concurrency = args.server_concurrency
+    settings.llm_requests_per_minute = args.server_rps * 60
+    settings.llm_max_retries = 8
+
+    from app.llm.client import LLMClient
+    client = LLMClient()
+
+    def call_shared() -> None:
+        client.complete(model=settings.mistral_model, messages=[{"role": "user", "content": PROMPT}])
+
+    def call_naive() -> None:
+        from mistralai import Mistral
+        Mistral(api_key=settings.mistral_api_key, server_url=settings.mistral_server_url).chat.complete(
+            model=settings.mistral_model, messages=[{"role": "user", "content": PROMPT}]
+        )
+
+    call = call_shared if args.mode == "shared" else call_naive
+    latencies: List[float] = []
+    failures = 0
+
+    def one(_: int) -> None:
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            call()
+        except Exception:
+            failures += 1
+            return
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.threads) as pool:
+        list(pool.map(one, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"mode={args.mode} requests={args.requests} threads={args.threads}")
+    print(f"succeeded {len(latencies)}  failed {failures}  in {elapsed:.2f} s")
+    print(f"stand-in: {config.requests} requests, {config.rejected} answered 429, peak concurrency {config.peak_active}")
+    for pct in (50, 90, 99):
+        print(f"p{pct}: {percentile(latencies, pct) * 1000:.1f} ms")
+    if args.mode == "shared":
+        print(f"client: {client.stats()}")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
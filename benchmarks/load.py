@@ -0,0 +1,343 @@
+"""
+Open-loop load test of the API against local stand-ins for ClinicalTrials.gov and Mistral.
+
+    python -m benchmarks.load --rps 50 --duration 30 --mix search=6,detail=3,summary=1
+    python -m benchmarks.load --rps 20 --duration 30 --mix search=3,filtered=3
+    python -m benchmarks.load --recorded --ctgov-error-rate 0.02 --compare benchmarks/results/load-abc1234.json
+    python -m benchmarks.load --url http://127.0.0.1:8000 --rps 20   # an instance you started yourself
+
+By default both stand-ins and the app (uvicorn, in this process) are started
+on local ports, with the trial cache and summary store in a fresh temporary
+directory. Requests are fired on a fixed schedule at ``--rps`` whatever the
+response times, so a slow server shows up as latency and errors rather than
+as a lower offered load. Trials are drawn from a pool of ``--trials`` NCT IDs
+so caches see a realistic mix of hits and misses.
+
+Reports throughput, latency percentiles, error rates and the mean Server-Timing
+stages per endpoint, and saves the run under benchmarks/results/load-<commit>.json.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks import RESULTS_DIR, git_commit, percentile
+from benchmarks import ctgov_stub, mistral_stub
+from benchmarks.corpus import load_corpus
+
+CONDITIONS = ("diabetes", "asthma", "breast cancer", "melanoma", "heart failure", "covid-19")
+
+ENDPOINTS = ("search", "filtered", "detail", "summary")
+
+class Sample:
+    __slots__ = ("endpoint", "status", "latency", "stages")
+
+    def __init__(self, endpoint: str, status: int, latency: float, stages: Dict[str, float]):
+        self.endpoint = endpoint
+        # 0 when the request failed without a response (timeout, connection error)
+        self.status = status
+        self.latency = latency
+        self.stages = stages
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"unknown endpoint {name!r}; expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """
+    Stage durations in milliseconds from a Server-Timing header
+    """
+    stages: Dict[str, float] = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "dur" and name:
+                stages[name] = float(value)
+    return stages
+
+def request_for(endpoint: str, rng: random.Random, trials: int) -> Tuple[str, Dict[str, Any]]:
+    if endpoint == "search":
+        return "/trials/search", {"condition": rng.choice(CONDITIONS), "limit": rng.choice((5, 10, 20))}
+    if endpoint == "filtered":
+        params = {"condition": rng.choice(CONDITIONS), "limit": rng.choice((5, 10, 20)), "age": rng.choice((8, 30, 70))}
+        if rng.random() < 0.5:
+            params["sex"] = rng.choice(("FEMALE", "MALE"))
+        if rng.random() < 0.2:
+            params["healthy_volunteers"] = "true"
+        return "/trials/search", params
+    nct_id = ctgov_stub.nct_id_for(rng.randint(1, trials))
+    if endpoint == "detail":
+        return f"/trials/{nct_id}", {}
+    return f"/trials/{nct_id}/summary", {}
+
+async def _one(client: httpx.AsyncClient, endpoint: str, path: str, params: Dict[str, Any], samples: List[Sample]) -> None:
+    start = time.perf_counter()
+    try:
+        response = await client.get(path, params=params)
+        await response.aread()
+        status, stages = response.status_code, parse_server_timing(response.headers.get("server-timing"))
+    except httpx.HTTPError:
+        status, stages = 0, {}
+    samples.append(Sample(endpoint, status, time.perf_counter() - start, stages))
+
+async def drive(args: argparse.Namespace, base_url: str) -> Dict[str, Any]:
+    """
+    Fire requests on a fixed schedule and collect the samples after the warm-up
+    """
+    rng = random.Random(args.seed)
+    names = list(args.mix)
+    weights = [args.mix[n] for n in names]
+    samples: List[Sample] = []
+    warmup: List[Sample] = []
+    in_flight: set = set()
+    dropped = 0
+    max_lag = 0.0
+
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        total = int((args.warmup + args.duration) * args.rps)
+        warmup_count = int(args.warmup * args.rps)
+        started = time.perf_counter()
+        measured_from = started + args.warmup
+        for i in range(total):
+            due = started + i / args.rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                max_lag = max(max_lag, -delay)
+            endpoint = rng.choices(names, weights)[0]
+            path, params = request_for(endpoint, rng, args.trials)
+            if len(in_flight) >= args.max_in_flight:
+                dropped += i >= warmup_count
+                continue
+            task = asyncio.create_task(_one(client, endpoint, path, params, warmup if i < warmup_count else samples))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        await asyncio.gather(*in_flight)
+        elapsed = time.perf_counter() - measured_from
+
+    return {"samples": samples, "elapsed": elapsed, "dropped": dropped, "max_schedule_lag_ms": round(max_lag * 1000, 1)}
+
+def scrape_stats(base_url: str, prefix: str) -> Dict[str, float]:
+    """
+    The unlabelled <prefix>_* samples from the app's /metrics, keyed by the rest of
+    the name (counters without their _total suffix)
+    """
+    try:
+        text = httpx.get(base_url + "/metrics", timeout=10).text
+    except httpx.HTTPError:
+        return {}
+    values: Dict[str, float] = {}
+    for line in text.splitlines():
+        name, _, value = line.partition(" ")
+        if name.startswith(prefix + "_") and "{" not in name:
+            key = name[len(prefix) + 1:]
+            values[key[:-len("_total")] if key.endswith("_total") else key] = float(value)
+    return values
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Sample]] = {}
+    for s in samples:
+        groups.setdefault(s.endpoint, []).append(s)
+    groups["all"] = samples
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, group in groups.items():
+        ok = [s.latency for s in group if 200 <= s.status < 400]
+        errors: Dict[str, int] = {}
+        for s in group:
+            if not 200 <= s.status < 400:
+                key = str(s.status) if s.status else "no_response"
+                errors[key] = errors.get(key, 0) + 1
+        stage_totals: Dict[str, float] = {}
+        for s in group:
+            for stage, ms in s.stages.items():
+                stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+        out[name] = {
+            "requests": len(group),
+            "ok": len(ok),
+            "throughput_rps": round(len(ok) / elapsed, 2) if elapsed > 0 else 0.0,
+            "error_rate": round(1 - len(ok) / len(group), 4) if group else 0.0,
+            "errors": errors,
+            "p50_ms": round(percentile(ok, 50) * 1000, 1),
+            "p90_ms": round(percentile(ok, 90) * 1000, 1),
+            "p99_ms": round(percentile(ok, 99) * 1000, 1),
+            "max_ms": round(max(ok, default=0.0) * 1000, 1),
+            "stages_mean_ms": {k: round(v / len(group), 2) for k, v in stage_totals.items() if k != "total"},
+        }
+    return out
+
+def report(results: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'endpoint':10}{'requests':>10}{'ok/s':>9}{'errors':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        print(
+            f"{name:10}{r['requests']:>10}{r['throughput_rps']:>9.1f}{r['error_rate']:>9.1%}"
+            f"{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}"
+        )
+    for name, r in results.items():
+        if r["errors"]:
+            print(f"{name} errors: " + ", ".join(f"{k}={v}" for k, v in sorted(r["errors"].items())))
+    for name in ENDPOINTS:
+        stages = results.get(name, {}).get("stages_mean_ms")
+        if stages:
+            top = sorted(stages.items(), key=lambda kv: -kv[1])[:6]
+            print(f"{name} stages (mean ms): " + ", ".join(f"{k}={v:.1f}" for k, v in top))
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    print(f"\ncompared with {baseline['meta']['commit']}")
+    print(f"{'endpoint':10}{'metric':>12}{'before':>12}{'after':>12}{'delta':>10}")
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p99_ms", "error_rate"):
+            before, after = old[metric], result[metric]
+            delta = f"{after / before - 1:>+10.1%}" if before else f"{'':>10}"
+            print(f"{name:10}{metric:>12}{before:>12}{after:>12}{delta}")
+
+def start_app(port: int):
+    """
+    Serve app.main on a uvicorn thread; settings must already be in the environment
+    """
+    import uvicorn
+    from app.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError(f"uvicorn failed to start on port {port}")
+        time.sleep(0.05)
+    return server, thread
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Load an already running instance instead of starting the app and stand-ins")
+    parser.add_argument("--rps", type=float, default=20.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load before measuring")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("search=6,detail=3,summary=1"), help="Endpoint weights")
+    parser.add_argument("--trials", type=int, default=500, help="Size of the NCT ID pool")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Requests beyond this are dropped and counted")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8780, help="App port; the stand-ins use the next two")
+    parser.add_argument("--cache-dir", help="Keep the trial cache and summary store here (default: fresh temp dir)")
+    parser.add_argument("--ctgov-delay", type=float, default=0.05)
+    parser.add_argument("--ctgov-jitter", type=float, default=0.05)
+    parser.add_argument("--ctgov-error-rate", type=float, default=0.0)
+    parser.add_argument("--ctgov-error-status", type=int, default=503)
+    parser.add_argument("--recorded", action="store_true", help="Serve the recorded study corpus instead of synthetic studies")
+    parser.add_argument("--llm-delay", type=float, default=0.3, help="Stand-in time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--llm-rps", type=float, default=0.0, help="Stand-in request rate limit (0 = none)")
+    parser.add_argument("--llm-tail-rate", type=float, default=0.0, help="Fraction of completions that stall")
+    parser.add_argument("--llm-tail-delay", type=float, default=0.0, help="Extra seconds a stalled completion takes")
+    parser.add_argument("--output", help="Where to save results (default benchmarks/results/load-<commit>.json)")
+    parser.add_argument("--compare", help="Saved load results to compare against")
+    args = parser.parse_args()
+
+    servers = []
+    app_server = app_thread = None
+    tmp = None
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            recorded = list(load_corpus(huge_sites=0).values()) if args.recorded else None
+            ctgov = ctgov_stub.serve(args.port + 1, ctgov_stub.StubConfig(
+                delay=args.ctgov_delay,
+                jitter=args.ctgov_jitter,
+                error_rate=args.ctgov_error_rate,
+                error_status=args.ctgov_error_status,
+                recorded=recorded,
+                total_studies=args.trials,
+            ))
+            llm = mistral_stub.serve(args.port + 2, mistral_stub.LLMStubConfig(
+                delay=args.llm_delay,
+                tokens_per_second=args.llm_tokens_per_second,
+                requests_per_second=args.llm_rps,
+                tail_rate=args.llm_tail_rate,
+                tail_delay=args.llm_tail_delay,
+                retry_after=0.5,
+            ))
+            servers = [ctgov, llm]
+            if args.cache_dir:
+                cache_dir = Path(args.cache_dir)
+            else:
+                tmp = tempfile.TemporaryDirectory(prefix="triallens-load-")
+                cache_dir = Path(tmp.name)
+            os.environ.update({
+                "CLINICAL_TRIAL_BASE_URL": ctgov_stub.base_url(ctgov),
+                "MISTRAL_SERVER_URL": mistral_stub.server_url(llm),
+                "TRIAL_CACHE_PATH": str(cache_dir / "trials.sqlite3"),
+                "SUMMARY_STORE_PATH": str(cache_dir / "summaries.sqlite3"),
+            })
+            app_server, app_thread = start_app(args.port)
+            base_url = f"http://127.0.0.1:{args.port}"
+
+        print(f"target={base_url} rps={args.rps} duration={args.duration}s warmup={args.warmup}s mix={args.mix}")
+        outcome = asyncio.run(drive(args, base_url))
+        eligibility = scrape_stats(base_url, "triallens_eligibility_filter") if "filtered" in args.mix else {}
+    finally:
+        if app_server is not None:
+            app_server.should_exit = True
+            app_thread.join(timeout=10)
+        for server in servers:
+            server.shutdown()
+
+    results = summarize(outcome["samples"], outcome["elapsed"])
+    report(results)
+    print(f"dropped (over --max-in-flight): {outcome['dropped']}, max schedule lag: {outcome['max_schedule_lag_ms']} ms")
+    if eligibility:
+        print(
+            f"filtered searches: {eligibility.get('searches', 0):.0f}, pages/search: {eligibility.get('pages_per_search', 0)}, "
+            f"wasted-fetch ratio: {eligibility.get('wasted_fetch_ratio', 0)}"
+        )
+
+    commit = git_commit()
+    run = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "dropped": outcome["dropped"],
+            "max_schedule_lag_ms": outcome["max_schedule_lag_ms"],
+            "eligibility_filter": eligibility,
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run, indent=2), encoding="utf-8")
+    print(f"\nsaved {output}")
+
+    if args.compare:
+        compare(run, json.loads(Path(args.compare).read_text(encoding="utf-8")))
+    if tmp is not None:
+        tmp.cleanup()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
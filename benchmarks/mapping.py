@@ -0,0 +1,140 @@
+"""
+Mapping and prompt-building throughput over the recorded study corpus.
+
+    python -m benchmarks.mapping                       # run, save benchmarks/results/<commit>.json
+    python -m benchmarks.mapping --compare benchmarks/results/abc1234.json --fail-on-regression
+
+Reports per-function latency percentiles, records per second and peak
+allocation per call for every corpus entry (small, typical, huge, plus any
+recorded studies), and microbenchmarks of the Pydantic models in
+app/domain/trial.py.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from benchmarks import RESULTS_DIR, git_commit, percentile
+from benchmarks.corpus import load_corpus
+from app.domain.trial import Trial, TrialLocation
+from app.llm.budget import fit_to_budget
+from app.llm.input_builders import build_summary_input
+from app.llm.prompts import build_summary_prompt
+from app.services.clinicaltrials import map_study_to_card, map_study_to_trial, to_trial_card
+
+def measure(fn: Callable[[], Any], min_time: float, max_iterations: int) -> Dict[str, float]:
+    """
+    Time repeated calls of fn, then trace one call for its peak allocation
+    """
+    fn()  # warm up
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_iterations and (len(samples) < 5 or time.perf_counter() < deadline):
+        start = time.perf_counter_ns()
+        fn()
+        samples.append((time.perf_counter_ns() - start) / 1000)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mean_us = sum(samples) / len(samples)
+    return {
+        "iterations": len(samples),
+        "p50_us": round(percentile(samples, 50), 2),
+        "p95_us": round(percentile(samples, 95), 2),
+        "p99_us": round(percentile(samples, 99), 2),
+        "per_second": round(1_000_000 / mean_us, 1) if mean_us else 0.0,
+        "peak_alloc_kib": round(peak / 1024, 1),
+    }
+
+def cases(corpus: Dict[str, Dict[str, Any]]) -> Dict[str, Callable[[], Any]]:
+    out: Dict[str, Callable[[], Any]] = {}
+    for name, study in corpus.items():
+        trial = map_study_to_trial(study)
+        payload = build_summary_input(trial)
+        trial_dump = trial.model_dump()
+        out[f"{name}/map_study_to_trial"] = lambda s=study: map_study_to_trial(s)
+        out[f"{name}/map_study_to_card"] = lambda s=study: map_study_to_card(s, max_locations=20)
+        out[f"{name}/to_trial_card"] = lambda t=trial: to_trial_card(t, max_locations=20)
+        out[f"{name}/build_summary_input"] = lambda t=trial: build_summary_input(t)
+        out[f"{name}/fit_to_budget"] = lambda p=payload: fit_to_budget(p, 2000)
+        out[f"{name}/build_summary_prompt"] = lambda p=payload: build_summary_prompt(p)
+        out[f"{name}/Trial.model_validate"] = lambda d=trial_dump: Trial.model_validate(d)
+        out[f"{name}/Trial.model_dump"] = lambda t=trial: t.model_dump()
+
+    loc = {"facility": "Mayo Clinic", "status": "RECRUITING", "city": "Rochester", "state": "Minnesota", "country": "United States"}
+    out["model/TrialLocation(**kwargs)"] = lambda: TrialLocation(**loc)
+    out["model/TrialLocation.model_construct"] = lambda: TrialLocation.model_construct(**loc)
+    out["model/dict(location)"] = lambda: dict(loc)
+    return out
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    Print p50 deltas against a saved run and return the names that regressed beyond threshold
+    """
+    regressions = []
+    print(f"\ncompared with {baseline['meta']['commit']} (threshold {threshold:.0%} on p50)")
+    for name, result in current["results"].items():
+        old = baseline["results"].get(name)
+        if not old or not old["p50_us"]:
+            continue
+        delta = result["p50_us"] / old["p50_us"] - 1
+        flag = ""
+        if delta > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:48}{old['p50_us']:>12.1f}{result['p50_us']:>12.1f}{delta:>+9.1%}{flag}")
+    return regressions
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to sample each case")
+    parser.add_argument("--max-iterations", type=int, default=5000)
+    parser.add_argument("--filter", default="", help="Only run cases containing this text")
+    parser.add_argument("--output", help="Where to save results (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="Saved results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative p50 slowdown counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'case':48}{'p50 us':>12}{'p95 us':>12}{'p99 us':>12}{'per s':>12}{'peak KiB':>10}")
+    for name, fn in cases(corpus).items():
+        if args.filter not in name:
+            continue
+        r = results[name] = measure(fn, args.min_time, args.max_iterations)
+        print(f"{name:48}{r['p50_us']:>12.1f}{r['p95_us']:>12.1f}{r['p99_us']:>12.1f}{r['per_second']:>12.1f}{r['peak_alloc_kib']:>10.1f}")
+
+    commit = git_commit()
+    run = {
+        "meta": {
+            "commit": commit,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": {name: len(json.dumps(study)) for name, study in corpus.items()},
+        },
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run, indent=2), encoding="utf-8")
+    print(f"\nsaved {output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(run, baseline, args.threshold)
+        if regressions and args.fail_on_regression:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+Sync the local mirror from the ClinicalTrials.gov stand-in, then time lookups.
+
+    python -m benchmarks.mirror --studies 5000 --sites 40
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import Callable, List
+
+from benchmarks import percentile
+from benchmarks.ctgov_stub import StubConfig, base_url, nct_id_for, serve
+from app.core.config import settings
+from app.services.mirror import TrialMirror
+
+def _time(fn: Callable[[], object], n: int) -> List[float]:
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--studies", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--sites", type=int, default=3, help="Sites per study")
+    parser.add_argument("--port", type=int, default=8767)
+    args = parser.parse_args()
+
+    server = serve(args.port, StubConfig(total_studies=args.studies, locations=args.sites))
+    settings.clinical_trial_base_url = base_url(server)
+    with tempfile.TemporaryDirectory() as tmp:
+        mirror = TrialMirror(os.path.join(tmp, "mirror.sqlite3"))
+        result = mirror.sync()
+        print(f"full sync: {result}")
+        print(f"sync throughput: {result['stored'] / result['elapsed_s']:.0f} studies/s")
+        print(f"incremental sync: {mirror.sync()}")
+
+        ids = [nct_id_for(random.randint(1, args.studies)) for _ in range(args.lookups)]
+        it = iter(ids)
+        gets = _time(lambda: mirror.get(next(it)), args.lookups)
+        searches = _time(lambda: mirror.search_page("condition", ["RECRUITING"], 10), 200)
+        points = iter([(random.uniform(-60, 60), random.uniform(-170, 170)) for _ in range(args.lookups)])
+        nearby = _time(lambda: mirror.nearby(*next(points), 50, 20, ["RECRUITING"]), args.lookups)
+        print(f"indexed sites: {mirror.stats()['sites']}")
+        for label, samples in (("get_trial", gets), ("search 10", searches), ("nearby 50 km", nearby)):
+            print(f"{label}: p50 {percentile(samples, 50):.3f} ms  p99 {percentile(samples, 99):.3f} ms")
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+Local stand-in for the Mistral chat completions API.
+
+Answers POST /v1/chat/completions, blocking or streamed (SSE), with a valid
+TrialSummary for the NCT ID found in the prompt. It can enforce a concurrency
+limit and a requests-per-second limit, answering 429 with Retry-After like
+the real service, so rate limiting and retries can be exercised offline.
+With ``tokens_per_second`` set, completions take as long as a model generating
+at that rate would (streamed chunks are paced the same way); ``model_tokens_per_second``
+gives individual models their own speed, and ``tail_rate`` / ``tail_delay`` stall a
+fraction of completions to produce a latency tail.
+"""
+from __future__ import annotations
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+_NCT = re.compile(r'"nct_id":\s*"(NCT\d{8})"')
+_REASK_FIELD = re.compile(r'^  "(\w+)":', re.MULTILINE)
+
+def malform(content: str, how: str) -> str:
+    """
+    Damage a JSON completion the way real models do
+    """
+    if how == "fence":
+        return f"```json\n{content}\n```"
+    if how == "trailing_comma":
+        return content[:-1] + ",}"
+    if how == "newlines":
+        return content.replace("This study", "This\nstudy")
+    if how == "truncate":
+        return content[: len(content) * 2 // 3]
+    if how == "missing":
+        data = json.loads(content)
+        data.pop("plain_english_summary")
+        data.pop("eligibility")
+        return json.dumps(data)
+    return content
+
+def summary_for(nct_id: str) -> Dict[str, Any]:
+    return {
+        "nct_id": nct_id,
+        "source_url": f"https://clinicaltrials.gov/study/{nct_id}",
+        "plain_english_summary": f"This study ({nct_id}) tests Drug X in adults with the condition.",
+        "key_facts": ["Phase 3", "Recruiting", "Adults 18 and over"],
+        "eligibility": {
+            "likely_eligible_if": ["You are 18 or older", "You have the condition"],
+            "likely_not_eligible_if": ["You are pregnant"],
+            "unknown_or_unclear": [],
+        },
+        "participation": {
+            "what_it_involves": ["Taking the study drug", "Regular clinic visits"],
+            "time_commitment": None,
+            "location_notes": None,
+            "costs_and_compensation": None,
+        },
+        "questions_to_ask_your_doctor": ["Is this study a good fit for me?"],
+        "limitations": ["Visit schedule not stated"],
+    }
+
+class LLMStubConfig:
+    """
+    Mutable knobs shared by all handler threads
+    """
+    def __init__(
+        self,
+        delay: float = 0.0,
+        max_concurrent: int = 0,
+        requests_per_second: float = 0.0,
+        retry_after: float = 1.0,
+        chunk_size: int = 40,
+        chunk_delay: float = 0.0,
+        malformed: str = "",
+        tokens_per_second: float = 0.0,
+        model_tokens_per_second: Optional[Dict[str, float]] = None,
+        tail_rate: float = 0.0,
+        tail_delay: float = 0.0,
+    ):
+        self.delay = delay
+        # 0 disables the corresponding limit
+        self.max_concurrent = max_concurrent
+        self.requests_per_second = requests_per_second
+        self.retry_after = retry_after
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        # fence | trailing_comma | newlines | truncate | missing; re-asks are always answered cleanly
+        self.malformed = malformed
+        # simulated generation speed; 0 returns the completion at once
+        self.tokens_per_second = tokens_per_second
+        self.model_tokens_per_second = dict(model_tokens_per_second or {})
+        # fraction of completions that stall for an extra tail_delay seconds
+        self.tail_rate = tail_rate
+        self.tail_delay = tail_delay
+        self.requests = 0
+        self.rejected = 0
+        self.active = 0
+        self.peak_active = 0
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._lock = threading.Lock()
+
+    def admit(self) -> bool:
+        with self._lock:
+            self.requests += 1
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_count = now, 0
+            over_rate = self.requests_per_second and self._window_count >= self.requests_per_second
+            over_concurrency = self.max_concurrent and self.active >= self.max_concurrent
+            if over_rate or over_concurrency:
+                self.rejected += 1
+                return False
+            self._window_count += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            return True
+
+    def done(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def generation_time(self, text: str, model: Optional[str] = None) -> float:
+        """
+        Seconds to "generate" text at the model's tokens per second, counting 4 characters per token
+        """
+        tps = self.model_tokens_per_second.get(model, self.tokens_per_second)
+        return len(text) / 4 / tps if tps else 0.0
+
+    def stall(self) -> float:
+        return self.tail_delay if self.tail_rate and random.random() < self.tail_rate else 0.0
+
+def _handler(config: LLMStubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, model: str, content: str) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            chunk_id = uuid.uuid4().hex
+            for i in range(0, len(content), config.chunk_size):
+                chunk = {
+                    "id": chunk_id,
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "delta": {"content": content[i:i + config.chunk_size]}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                pause = config.chunk_delay + config.generation_time(content[i:i + config.chunk_size], model)
+                if pause:
+                    time.sleep(pause)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self._send(404, {"message": "not found"})
+                return
+            if not config.admit():
+                self._send(429, {"message": "Requests rate limit exceeded"}, {"Retry-After": str(config.retry_after)})
+                return
+            try:
+                time.sleep(config.delay + config.stall())
+                prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+                match = _NCT.search(prompt)
+                summary = summary_for(match.group(1) if match else "NCT00000000")
+                head = prompt.split("INPUT_JSON:")[0]
+                if "exactly these fields" in head:
+                    content = json.dumps({k: summary[k] for k in _REASK_FIELD.findall(head) if k in summary})
+                else:
+                    content = malform(json.dumps(summary), config.malformed)
+                model = body.get("model", "mistral-stub")
+                if body.get("stream"):
+                    self._stream(model, content)
+                    return
+                time.sleep(config.generation_time(content, model))
+                self._send(200, {
+                    "id": uuid.uuid4().hex,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4},
+                })
+            finally:
+                config.done()
+
+        def do_GET(self):
+            if self.path.rstrip("/") == "/v1/models":
+                self._send(200, {"object": "list", "data": [{"id": "mistral-stub", "object": "model"}]})
+                return
+            self._send(404, {"message": "not found"})
+
+    return Handler
+
+def serve(port: int = 8766, config: Optional[LLMStubConfig] = None) -> ThreadingHTTPServer:
+    """
+    Start the stand-in on a daemon thread and return the server
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", port), _handler(config or LLMStubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
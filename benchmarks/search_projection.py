@@ -0,0 +1,58 @@
+"""
+Bytes, mapping time and peak memory of a search page with and without the
+TrialCard field projection.
+
+    python -m benchmarks.search_projection --results 50 --locations 40
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from benchmarks.ctgov_stub import make_study, nct_id_for, project
+from app.services.clinicaltrials import CARD_FIELDS, map_study_to_card, map_study_to_trial, to_trial_card
+
+def _full(studies: List[Dict[str, Any]], max_locations: int):
+    return [to_trial_card(map_study_to_trial(s), max_locations=max_locations) for s in studies]
+
+def _projected(studies: List[Dict[str, Any]], max_locations: int):
+    return [map_study_to_card(s, max_locations=max_locations) for s in studies]
+
+def _measure(body: str, mapper: Callable, max_locations: int, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        mapper(json.loads(body)["studies"], max_locations)
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    mapper(json.loads(body)["studies"], max_locations)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"bytes": len(body.encode("utf-8")), "ms": statistics.median(timings) * 1000, "peak_kib": peak / 1024}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--results", type=int, default=50)
+    parser.add_argument("--locations", type=int, default=40, help="Sites per study")
+    parser.add_argument("--max-locations", type=int, default=20, help="Location preview size on each card")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    studies = [make_study(nct_id_for(i + 1), locations=args.locations) for i in range(args.results)]
+    full_body = json.dumps({"studies": studies})
+    projected_body = json.dumps({"studies": [project(s, CARD_FIELDS) for s in studies]})
+
+    assert _full(studies, args.max_locations) == _projected(json.loads(projected_body)["studies"], args.max_locations)
+
+    full = _measure(full_body, _full, args.max_locations, args.repeat)
+    proj = _measure(projected_body, _projected, args.max_locations, args.repeat)
+    print(f"{args.results} results x {args.locations} sites (includes json.loads of the page)")
+    print(f"{'':12}{'full':>12}{'projected':>12}{'reduction':>12}")
+    for key, label in (("bytes", "bytes"), ("ms", "map ms"), ("peak_kib", "peak KiB")):
+        print(f"{label:12}{full[key]:>12.1f}{proj[key]:>12.1f}{1 - proj[key] / full[key]:>11.0%}")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
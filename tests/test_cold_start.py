@@ -0,0 +1,54 @@
+"""
+Cold-start regression gate: a fresh worker with LLM_STARTUP=lazy must serve
+trials without importing the LLM SDK, within generous time budgets.
+
+Runs benchmarks.cold_start's worker in a subprocess against the local
+ClinicalTrials.gov and Mistral stand-ins.
+"""
+import os
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from benchmarks import ctgov_stub, mistral_stub  # noqa: E402
+from benchmarks.cold_start import run  # noqa: E402
+
+# far above what a worker needs here (about 400 ms and 20 ms), so only real regressions trip them
+IMPORT_BUDGET_MS = 3000.0
+FIRST_REQUEST_BUDGET_MS = 1000.0
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@pytest.fixture(scope="module")
+def lazy_worker():
+    ctgov = ctgov_stub.serve(0)
+    llm = mistral_stub.serve(0)
+    env = {
+        "CLINICAL_TRIAL_BASE_URL": ctgov_stub.base_url(ctgov),
+        "MISTRAL_SERVER_URL": mistral_stub.server_url(llm),
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])),
+    }
+    try:
+        yield run("lazy", _free_port(), env)
+    finally:
+        ctgov.shutdown()
+        llm.shutdown()
+
+def test_lazy_worker_serves_trials_without_the_llm_sdk(lazy_worker):
+    assert "mistralai" not in lazy_worker["llm_after_import"]
+    assert "mistralai" not in lazy_worker["llm_after_startup"]
+    assert "mistralai" not in lazy_worker["llm_after_trials"]
+
+def test_lazy_worker_import_time(lazy_worker):
+    assert lazy_worker["import_ms"] < IMPORT_BUDGET_MS
+
+def test_lazy_worker_first_request_time(lazy_worker):
+    assert lazy_worker["first_trial_ms"] < FIRST_REQUEST_BUDGET_MS